@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent))
+sys.path.append(str(Path(__file__).resolve().parent / ".."))
+import config
+import screen
+from misc.pass_catalogue import catalogue
+from utils import equivalence, log, telemetry
+
+REPO = Path(__file__).resolve().parent.parent
+PROJECTS_DIR = REPO / "dt-projects"
+FUZZER_SRC = REPO / "misc" / "fuzzer-main.c"
+REPORT = "build.json"
+# cmake check results (HAVE_..., SIZEOF_...) reused by the configurations disabling a pass
+CMAKE_CHECK = re.compile(r'^([A-Z][A-Z0-9_]*):INTERNAL=([^"\\]*)$')
+
+
+def opt_configs(compiler, opt_levels, custom=False, screening=False, activity=None):
+    """Return the configurations to build, in the form {"name": "-Ox -f... -fno..."}.
+
+    Args:
+        compiler (str): C compiler
+        opt_levels (list): optimization levels (or custom configurations with custom)
+        custom (bool): build only the given levels
+        screening (bool): build only the -standard configurations (pass screening)
+        activity (Path): activity json written by the pass screening, the configurations
+            disabling a pass with no recorded activity are skipped
+
+    Returns:
+        dict: configuration flags by name
+    """
+    compiler_name = Path(compiler).name.split("-")[0]
+    configs = {}
+    for level in opt_levels:
+        if level == "0":
+            configs[f"{level}-standard"] = f"-O{level}"
+        elif not custom:
+            configs[f"{level}-standard"] = f"-O{level}"
+            if screening or compiler_name not in ("gcc", "clang"):
+                continue
+            inactive = screen.inactive(activity, level) if activity is not None else []
+            for disabled_opt in catalogue(compiler, (level,))["levels"][level]:
+                if disabled_opt in inactive:
+                    log.info(f"[SCREEN] -O{level}: skipping {disabled_opt}, no activity recorded")
+                    continue
+                if compiler_name == "clang":
+                    disabled_opt = f"-mllvm -opt-disable={disabled_opt}"
+                configs[f"{level}{disabled_opt.replace(' ', '')}"] = f"-O{level} {disabled_opt}"
+        else:
+            key = f"{level}-standard" if level in ("0", "1", "2", "3", "g", "s", "z") else level.replace(" ", "")
+            configs[key] = f"-O{level}"
+    return configs
+
+
+def directory_name(project, config_name):
+    """Return the directory name of a configuration and whether it was replaced by a custom id (too long)."""
+    # pass name are in camel case and extra flags are not important in dir name
+    if "-mllvm" in config_name:
+        config_name = config_name.replace("-mllvm", "").replace("-opt-disable=", "-no-").replace(",", "-").lower()
+    name = f"{project}-O{config_name}"
+    if len(name) > 255:
+        return f"{project}-O{config_name[0]}-custom-{random.randrange(32768)}", True
+    return name, False
+
+
+def compiler_shims(wrapper, cc, cxx):
+    """Return compilers with the same names as cc and cxx running through a python wrapper
+    (objcache.py or screen.py), so that the compiler detection of the build systems is unchanged."""
+    shims = Path(tempfile.mkdtemp())
+    for compiler in (cc, cxx):
+        real = shutil.which(compiler) or compiler
+        shim = shims / Path(compiler).name
+        shim.write_text(f'#!/bin/sh\nexec python3 {wrapper} {real} "$@"\n')
+        shim.chmod(0o755)
+    return str(shims / Path(cc).name), str(shims / Path(cxx).name)
+
+
+class Build:
+    """Build of a project with a compiler, following its recipe in config.recipes.
+
+    Every step (clone, configure, build, fuzz targets, ...) is a bash script whose output is printed
+    with the configuration as prefix; its exit code, wall time and attempts are written in build.json
+    and its resources in the telemetry file.
+    """
+
+    def __init__(self, project, cc, cxx, targets, proc=1, parallel_configs=1, retries=1):
+        self.project = project
+        self.recipe = config.recipes[project]
+        self.cc = cc
+        self.cxx = cxx
+        self.targets = targets
+        self.proc = proc
+        self.parallel_configs = parallel_configs
+        self.retries = retries
+        self.base = PROJECTS_DIR / project
+        self.configs_dir = PROJECTS_DIR / ".configs" / f"{project}-{Path(cc).name}"
+        self.lock = threading.Lock()
+        # configure and cmake check results of the configurations configured without a seed, by configuration
+        self.checks = {"configure": {}, "cmake": {}}
+        self.report = {"project": project, "compiler": Path(cc).name, "checkout": [], "configs": {}}
+
+    def output(self, prefix, line):
+        with self.lock:
+            sys.stdout.write(f"[{prefix}] {line}")
+            sys.stdout.flush()
+
+    def step(self, prefix, name, script, cwd, env, retries=None):
+        """Run a step, retrying it on failure. Return its record (name, returncode, wall, attempts)."""
+        retries = self.retries if retries is None else retries
+        record = {"name": name}
+        for attempt in range(retries + 1):
+            self.output(prefix, f"{name}: STARTED\n")
+            start = time.perf_counter()
+            result = telemetry.run_cmd(
+                f"{self.project}-{prefix}-{name}",
+                "build",
+                ["bash", "-c", f"set -ex\n{script}"],
+                on_line=lambda line: self.output(prefix, line),
+                stderr=subprocess.STDOUT,
+                cwd=cwd,
+                env=env,
+            )
+            record.update(returncode=result.returncode, wall=round(time.perf_counter() - start, 3), attempts=attempt + 1)
+            self.output(prefix, f"{name}: {'TERMINATED' if result.returncode == 0 else 'FAILED'} in {record['wall']}s\n")
+            if result.returncode == 0:
+                break
+        return record
+
+    def env(self, **variables):
+        env = dict(
+            os.environ,
+            CC=self.cc,
+            CXX=self.cxx,
+            CXXFLAGS="",
+            REPO=str(REPO),
+            PROJECTS_DIR=str(PROJECTS_DIR),
+            OSS_FUZZ=str(PROJECTS_DIR / "oss-fuzz" / "projects" / self.project),
+            FUZZER_SRC=str(FUZZER_SRC),
+            BASE=str(self.base),
+            NPROC=str(self.proc),
+        )
+        env.update(variables)
+        return env
+
+    def checkout(self):
+        """Clone the project, check out its commit and run the setup commands, from scratch on every attempt."""
+        recipe = self.recipe
+        env = self.env()
+        clone = " ".join(["git clone", *recipe.clone_args, recipe.repository, str(self.base)])
+        steps = [
+            ("clone", f"rm -rf {self.base}\n{clone}", PROJECTS_DIR),
+            ("checkout", f"git checkout {recipe.commit}", self.base),
+            ("setup", recipe.setup, self.base),
+        ]
+        if recipe.packages:
+            steps.insert(0, ("packages", f"sudo apt-get install -y {' '.join(recipe.packages)}", PROJECTS_DIR))
+        PROJECTS_DIR.mkdir(parents=True, exist_ok=True)
+        for attempt in range(self.retries + 1):
+            self.report["checkout"] = []
+            for name, script, cwd in steps:
+                record = self.step("checkout", name, script, cwd, env, retries=0)
+                self.report["checkout"].append(record)
+                if record["returncode"] != 0:
+                    break
+            else:
+                return True
+        return False
+
+    def configure(self, prefix, config_name, build_dir, env, seeded):
+        """Run the configure script, with the cache of the checks that do not depend on the flags (see seed_checks)
+        if seeded, otherwise from scratch, recording its check results (without the flags, ac_cv_env_*)."""
+        cache = self.configs_dir / "config.cache"
+        local = build_dir / "config.cache"
+        seeded = seeded and cache.is_file()
+        if seeded:
+            shutil.copyfile(cache, local)
+        else:
+            local.unlink(missing_ok=True)
+        script = f"$BASE/configure {self.recipe.configure} --cache-file=config.cache"
+        record = self.step(prefix, "configure", script, build_dir, env)
+        if record["returncode"] == 0 and not seeded and local.is_file():
+            checks = [
+                line + "\n"
+                for line in local.read_text(errors="replace").split("\n")
+                if line and not line.startswith("#") and "ac_cv_env_" not in line
+            ]
+            with self.lock:
+                self.checks["configure"][config_name] = checks
+        return record
+
+    def cmake(self, prefix, config_name, build_dir, env, seeded):
+        """Run cmake, seeded with the check results (INTERNAL entries) that do not depend on the flags
+        (see seed_checks) if seeded, otherwise from scratch, recording its check results."""
+        seed = self.configs_dir / "checks.cmake"
+        seeded = seeded and seed.is_file()
+        script = f"cmake {f'-C {seed} ' if seeded else ''}{self.recipe.cmake}"
+        record = self.step(prefix, "cmake", script, build_dir, env)
+        cmake_cache = build_dir / "CMakeCache.txt"
+        if record["returncode"] == 0 and not seeded and cmake_cache.is_file():
+            checks = []
+            for line in cmake_cache.read_text(errors="replace").split("\n"):
+                match = CMAKE_CHECK.match(line)
+                if match and not match.group(1).startswith("CMAKE_"):
+                    checks.append(f'set({match.group(1)} "{match.group(2)}" CACHE INTERNAL "")\n')
+            with self.lock:
+                self.checks["cmake"][config_name] = checks
+        return record
+
+    def seed_checks(self):
+        """Write the seeds of the configurations disabling a pass: the configure and cmake check results
+        that are the same in all the configurations configured without a seed (the -standard ones, at
+        every optimization level). Checks whose result changes with the level depend on the flags and run
+        again in every configuration; a single disabled pass is assumed not to change the others."""
+        for kind, seed in (("configure", "config.cache"), ("cmake", "checks.cmake")):
+            results = list(self.checks[kind].values())
+            if not results:
+                continue
+            common = set(results[0]).intersection(*results[1:])
+            shared = [check for check in results[0] if check in common]
+            tmp = self.configs_dir / f"{seed}.{threading.get_native_id()}"
+            tmp.write_text("".join(shared))
+            tmp.replace(self.configs_dir / seed)
+            log.info(f"[{self.project}] {kind}: {len(shared)}/{len(results[0])} checks reused by the other configurations.")
+
+    def build_config(self, config_name, flags, nproc, seeded=False):
+        """Build the fuzz targets of a configuration. With parallel configurations, the configuration
+        is built in its own copy of the checkout, removed when the configuration is done.
+        If seeded, the configure and cmake checks that do not depend on the flags are not run again."""
+        recipe = self.recipe
+        prefix = f"O{config_name}"
+        tree = self.base
+        if self.parallel_configs > 1:
+            # named after the configuration, so that rebuilds of a configuration use the same directory
+            tree = self.configs_dir / "trees" / hashlib.md5(f"{config_name}\n".encode()).hexdigest()[:16]
+            shutil.rmtree(tree, ignore_errors=True)
+            tree.parent.mkdir(parents=True, exist_ok=True)
+            subprocess.run(["cp", "-a", "--reflink=auto", str(self.base), str(tree)], check=True)
+
+        name, matched = directory_name(self.project, config_name)
+        out = self.targets / self.project / Path(self.cc).name / name
+        out.mkdir(parents=True, exist_ok=True)
+        if matched:
+            log.info(f"[CONFIGURATION ID] {self.project}-O{config_name} MATCHED WITH {name}")
+            (out / "config").write_text(f"-o{config_name}\n")
+
+        build_dir = tree / recipe.build_dir
+        cflags = f"-g {flags} {recipe.cflags}" if recipe.cflags else f"-g {flags}"
+        cxxflags = ""
+        if tree != self.base:
+            # the debug info (and the objcache keys) refer to the checkout, not to its copy removed after the build
+            cxxflags = f"-ffile-prefix-map={tree}={self.base}"
+            cflags = f"{cflags} {cxxflags}"
+        env = self.env(
+            CFLAGS=cflags,
+            CXXFLAGS=cxxflags,
+            BASE=str(tree),
+            NPROC=str(nproc),
+            OUT=str(out),
+            FUZZER_OBJ=str(build_dir / "fuzzer-main.o"),
+            LIB_FUZZING_ENGINE=str(build_dir / "fuzzer-main.o"),
+        )
+        steps = []
+        if recipe.build_dir != ".":
+            shutil.rmtree(build_dir, ignore_errors=True)
+            build_dir.mkdir(parents=True)
+        elif recipe.configure is not None:
+            steps.append(lambda: self.step(prefix, "clean", "make clean || true", build_dir, env, retries=0))
+        if recipe.configure is not None:
+            steps.append(lambda: self.configure(prefix, config_name, build_dir, env, seeded))
+        if recipe.cmake is not None:
+            steps.append(lambda: self.cmake(prefix, config_name, build_dir, env, seeded))
+        steps.append(lambda: self.step(prefix, "build", recipe.build, build_dir, env))
+        steps.append(lambda: self.artifacts(prefix, build_dir))
+        steps.append(lambda: self.step(prefix, "fuzzer-main", "$CC $CFLAGS -c $FUZZER_SRC -o $FUZZER_OBJ", build_dir, env))
+        steps.append(lambda: self.step(prefix, "fuzz-targets", recipe.fuzz_targets, build_dir, env))
+
+        records = []
+        start = time.perf_counter()
+        for step in steps:
+            records.append(step())
+            if records[-1]["returncode"] != 0:
+                break
+        ok = records[-1]["returncode"] == 0
+        with self.lock:
+            self.report["configs"][config_name] = {
+                "directory": name,
+                "flags": flags,
+                "ok": ok,
+                "wall": round(time.perf_counter() - start, 3),
+                "steps": records,
+            }
+        if tree != self.base:
+            shutil.rmtree(tree, ignore_errors=True)
+        return ok
+
+    def artifacts(self, prefix, build_dir):
+        missing = [a for a in self.recipe.artifacts if not (build_dir / a).exists()]
+        if missing:
+            self.output(prefix, f"artifacts: MISSING {' '.join(missing)}\n")
+        return {"name": "artifacts", "returncode": int(bool(missing)), "missing": missing}
+
+    def build_configs(self, configs):
+        """Build the configurations, parallel_configs at a time (sharing the processes): first the -standard
+        ones, configured from scratch, then the others, seeded with the checks that do not depend on the flags."""
+        standard = [name for name in configs if name.endswith("-standard")]
+        others = [name for name in configs if name not in standard]
+        for names, seeded in ((standard, False), (others, True)):
+            if not names:
+                continue
+            nproc = max(self.proc // min(self.parallel_configs, len(names)), 1)
+            with ThreadPoolExecutor(self.parallel_configs) as pool:
+                futures = [pool.submit(self.build_config, name, configs[name], nproc, seeded) for name in names]
+                for future in futures:
+                    future.result()
+            if not seeded:
+                self.seed_checks()
+
+    def write_report(self, target_dir):
+        target_dir.mkdir(parents=True, exist_ok=True)
+        tmp = target_dir / f"{REPORT}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.report, f, indent=2)
+        tmp.replace(target_dir / REPORT)
+
+
+def run(
+    project,
+    cc,
+    cxx,
+    targets,
+    proc=1,
+    opt_levels=("0", "1", "2", "3", "g"),
+    custom=False,
+    parallel_configs=1,
+    objcache=False,
+    prune=False,
+    screening=False,
+    retries=1,
+):
+    """Build the fuzz targets of a project with a compiler, one directory per configuration.
+
+    Args:
+        project (str): project name (key of config.recipes)
+        cc (str): C compiler
+        cxx (str): C++ compiler
+        targets (Path): targets directory (binaries in targets/project/compiler/project-O<config>)
+        proc (int): number of processes
+        opt_levels (list): optimization levels (or custom configurations with custom)
+        custom (bool): build only the given levels
+        parallel_configs (int): number of configurations built at the same time, sharing proc
+        objcache (bool): compile through build-dataset/objcache.py
+        prune (bool): remove the binaries identical to the ones of another configuration
+        screening (bool): build only the -standard configurations through build-dataset/screen.py
+            and write the pass activity (activity.json) instead of the binaries
+        retries (int): number of times a failed step is retried
+
+    Returns:
+        bool: True if the checkout and all the -standard configurations succeeded
+    """
+    target_dir = targets / project / Path(cc).name
+    activity = target_dir / "activity.json"
+    build = Build(project, cc, cxx, targets, proc, parallel_configs, retries)
+    shutil.rmtree(build.configs_dir, ignore_errors=True)
+    build.configs_dir.mkdir(parents=True)
+
+    log.info(f"[{project}] Build: INITIALIZING.")
+    configs = opt_configs(cc, opt_levels, custom, screening, activity if activity.is_file() else None)
+    if screening:
+        # the screening binaries are thrown away, only the pass activity is kept
+        screen_dir = build.configs_dir / "screen"
+        screen_dir.mkdir()
+        os.environ["DT_SCREEN_DIR"] = str(screen_dir)
+        build.targets = build.configs_dir / "targets"
+        build.cc, build.cxx = compiler_shims(Path(__file__).resolve().parent / "screen.py", cc, cxx)
+    elif objcache:
+        build.cc, build.cxx = compiler_shims(Path(__file__).resolve().parent / "objcache.py", cc, cxx)
+
+    if not build.checkout():
+        log.error(f"[{project}] Build: checkout FAILED.")
+        return False
+    build.build_configs(configs)
+
+    failed = [name for name, c in build.report["configs"].items() if not c["ok"]]
+    for name in failed:
+        log.error(f"[{project}-O{name}] Build: FAILED, see {REPORT}.")
+    if screening:
+        screen.collect(screen_dir, shutil.which(cc) or cc, activity)
+        shutil.rmtree(build.targets, ignore_errors=True)
+        shutil.rmtree(screen_dir, ignore_errors=True)
+    else:
+        build.write_report(target_dir)
+        equivalence.run(target_dir, proc, prune)
+    log.info(f"[{project}] Build: TERMINATED ({len(configs) - len(failed)}/{len(configs)} configurations).")
+    return not any(name.endswith("-standard") for name in failed)
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(
+        description="Build the fuzz targets of a project from its recipe in config.py.",
+        formatter_class=ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("-p", "--project", dest="project", type=str, help="Project name", required=True)
+    parser.add_argument(
+        "-t",
+        "--targets",
+        dest="targets",
+        type=Path,
+        help="Targets directory",
+        default=Path(__file__).parent.resolve() / ".." / "dt-targets",
+    )
+    parser.add_argument("-j", "--proc", dest="proc", type=int, help="Number of processes to use", default=1)
+    parser.add_argument(
+        "-P",
+        "--parallel-configs",
+        dest="parallel_configs",
+        type=int,
+        help="Number of configurations built at the same time, in copies of the checkout, sharing the processes",
+        default=1,
+    )
+    parser.add_argument(
+        "-o", "--opts", dest="opts", type=str, help="Optimization levels (or custom configurations with -c)", default="0:1:2:3:g"
+    )
+    parser.add_argument("-c", "--custom", dest="custom", action="store_true", help="Build only the given levels")
+    parser.add_argument(
+        "-C", "--objcache", dest="objcache", action="store_true", help="Reuse the objects compiled by previous builds"
+    )
+    parser.add_argument(
+        "-D",
+        "--prune-duplicates",
+        dest="prune",
+        action="store_true",
+        help="Remove the binaries identical to the ones of another configuration",
+    )
+    parser.add_argument(
+        "-S",
+        "--screen",
+        dest="screening",
+        action="store_true",
+        help="Build only the -standard configurations to record the passes that transform the project",
+    )
+    parser.add_argument("--retries", dest="retries", type=int, help="Number of retries of a failed step", default=1)
+    parser.add_argument(
+        "--debug",
+        dest="debug",
+        action="store_true",
+        help="Enable debug prints",
+        default=False,
+    )
+    args = parser.parse_args()
+
+    log.init(args)
+    if args.project not in config.recipes:
+        log.info(f"Error: no recipe for {args.project}, available projects: {', '.join(config.recipes)}.")
+        exit(1)
+    if not os.environ.get("CC") or not os.environ.get("CXX"):
+        log.info("Error: set the compilers with the CC and CXX env vars.")
+        exit(1)
+    ok = run(
+        args.project,
+        os.environ["CC"],
+        os.environ["CXX"],
+        args.targets.resolve(),
+        args.proc,
+        args.opts.split(":"),
+        args.custom,
+        args.parallel_configs,
+        args.objcache,
+        args.prune,
+        args.screening,
+        args.retries,
+    )
+    exit(0 if ok else 1)
@@ -1,34 +1,213 @@
 #!/usr/bin/env python3
 
+import hashlib
+import json
+import os
+import shutil
 import subprocess
+import tarfile
+import threading
 from pathlib import Path
 from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+from multiprocessing import Pool
 import sys
 
 sys.path.append(str(Path(__file__).resolve().parent / ".."))
+from config import CACHE_DIR
 from utils import log
+from utils.cache import file_digest
 
+# Content-addressed corpus store: the inputs are stored once in objects/<sha256[:2]>/<sha256> and each fuzz
+# target has a manifest (manifests/<project>/<fuzz target>.json) with the sha256 of its inputs
+STORE = CACHE_DIR / "corpus"
+VERSION = 1
 
-def main(args):
-    helper = args.oss_fuzz / "infra" / "helper.py"
+
+def object_path(store, digest):
+    return store / "objects" / digest[:2] / digest
+
+
+def manifest_path(store, project, fuzz_target):
+    return store / "manifests" / project / f"{fuzz_target}.json"
+
+
+def write_atomic(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_native_id()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+    tmp.replace(path)
+
+
+def put(store, data):
+    """Store an input, return its sha256."""
+    digest = hashlib.sha256(data).hexdigest()
+    path = object_path(store, digest)
+    if not path.is_file():
+        write_atomic(path, data)
+    return digest
+
+
+def load_manifest(store, project, fuzz_target):
+    """Return the manifest of a fuzz target, None if it is not in the store."""
+    try:
+        with open(manifest_path(store, project, fuzz_target)) as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    return manifest if manifest.get("version") == VERSION else None
+
+
+def write_manifest(store, project, fuzz_target, inputs, source):
+    manifest = {"version": VERSION, "source": str(source), "inputs": inputs}
+    write_atomic(manifest_path(store, project, fuzz_target), json.dumps(manifest, indent=2, sort_keys=True).encode())
+
+
+def ingest(store, project, fuzz_target, corpus_dir, source):
+    """Add the corpus of a fuzz target (a directory of inputs) to the store.
+
+    Returns:
+        int: number of inputs
+    """
+    inputs = {}
+    for path in sorted(corpus_dir.rglob("*")):
+        if path.is_file():
+            inputs[path.relative_to(corpus_dir).as_posix()] = put(store, path.read_bytes())
+    write_manifest(store, project, fuzz_target, inputs, source)
+    return len(inputs)
+
+
+def import_archive(store, archive):
+    """Add the corpora of an archive with <project>/<fuzz target>/<input> members
+    (e.g. eval-dataset/dt-corpus-min.tar.gz) to the store, reading it as a stream.
+
+    Returns:
+        list: (project, fuzz target) imported
+    """
+    corpora = {}
+    with tarfile.open(archive, "r|*") as tar:
+        for member in tar:
+            parts = Path(member.name).parts
+            if not member.isfile() or len(parts) < 3:
+                continue
+            project, fuzz_target, name = parts[-3:]
+            corpora.setdefault((project, fuzz_target), {})[name] = put(store, tar.extractfile(member).read())
+    for (project, fuzz_target), inputs in corpora.items():
+        write_manifest(store, project, fuzz_target, inputs, archive)
+    return list(corpora)
+
+
+def import_source(source, store=STORE, proc=1):
+    """Add the corpora of a local archive or mirror directory (<project>/<fuzz target>/<inputs>) to the store.
+
+    Args:
+        source (Path): archive or directory
+        store (Path): corpus store directory
+        proc (int): number of processes used for directories
+    """
+    log.info(f"[{source}] Corpus import: STARTING.")
+    if source.is_file():
+        imported = import_archive(store, source)
+    elif source.is_dir():
+        corpora = [(p.name, t.name, t) for p in sorted(source.iterdir()) if p.is_dir() for t in sorted(p.iterdir()) if t.is_dir()]
+        with Pool(proc) as pool:
+            pool.starmap(ingest, [(store, p, t, d, source) for p, t, d in corpora])
+        imported = [(p, t) for p, t, _ in corpora]
+    else:
+        log.info(f"Error: corpus source {source} not found.")
+        exit(1)
+    log.info(f"[{source}] Corpus import: COMPLETED ({len(imported)} fuzz targets).")
+
+
+def provision(store, project, fuzz_target, corpus_dir, verify=True):
+    """Copy the corpus of a fuzz target from the store to corpus_dir/project/fuzz_target (hard links when possible).
+
+    Args:
+        store (Path): corpus store directory
+        project (str): project name
+        fuzz_target (str): fuzz target name
+        corpus_dir (Path): corpus directory
+        verify (bool): check the sha256 of every input
+
+    Returns:
+        bool: False if the fuzz target is not in the store or an input is missing or corrupted
+    """
+    manifest = load_manifest(store, project, fuzz_target)
+    if manifest is None:
+        return False
+
+    dest = corpus_dir / project / fuzz_target
+    tmp = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    for name, digest in manifest["inputs"].items():
+        path = object_path(store, digest)
+        if not path.is_file() or (verify and file_digest(path) != digest):
+            log.info(f"[{project}/{fuzz_target}] Corpus store: input {name} ({digest}) missing or corrupted.")
+            path.unlink(missing_ok=True)
+            shutil.rmtree(tmp)
+            return False
+        (tmp / name).parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(path, tmp / name)
+        except OSError:
+            shutil.copyfile(path, tmp / name)
+    shutil.rmtree(dest, ignore_errors=True)
+    tmp.rename(dest)
+    return True
+
+
+def download(project, fuzz_target, oss_fuzz):
+    """Download the oss-fuzz corpus of a fuzz target in oss_fuzz/build/corpus/project/fuzz_target."""
+    helper = oss_fuzz / "infra" / "helper.py"
     cmd = [
         "python3",
         helper.as_posix(),
         "download_corpora",
         "--public",
-        args.project,
+        project,
         "--fuzz-target",
-        args.fuzz_target,
+        fuzz_target,
     ]
     log.info(" ".join(cmd))
     result = subprocess.run(cmd)
     result.check_returncode()
 
 
+def run(project, fuzz_target, oss_fuzz, store=STORE, offline=False):
+    """Provision the corpus of a fuzz target in oss_fuzz/build/corpus from the corpus store,
+    downloading it from oss-fuzz (and adding it to the store) if it is not there.
+
+    Args:
+        project (str): project name
+        fuzz_target (str): fuzz target name
+        oss_fuzz (Path): path to the oss-fuzz directory
+        store (Path): corpus store directory
+        offline (bool): fail instead of downloading the corpora not in the store
+    """
+    corpus_dir = oss_fuzz / "build" / "corpus"
+    if provision(store, project, fuzz_target, corpus_dir):
+        log.info(f"[{project}/{fuzz_target}] Corpus provisioned from {store}.")
+        return
+    if offline:
+        log.info(f"Error: corpus of {project}/{fuzz_target} not found in {store} (offline).")
+        exit(1)
+    download(project, fuzz_target, oss_fuzz)
+    count = ingest(store, project, fuzz_target, corpus_dir / project / fuzz_target, "oss-fuzz")
+    log.info(f"[{project}/{fuzz_target}] {count} inputs added to {store}.")
+
+
+def main(args):
+    if args.source is not None:
+        import_source(args.source, args.store, args.proc)
+    if args.project is not None:
+        run(args.project, args.fuzz_target, args.oss_fuzz, args.store, args.offline)
+
+
 if __name__ == "__main__":
 
     parser = ArgumentParser(
-        description="Download oss-fuzz corpora for the selected target.",
+        description="Provision oss-fuzz corpora for the selected target from the corpus store, downloading the missing ones.",
         formatter_class=ArgumentDefaultsHelpFormatter,
     )
 
@@ -39,14 +218,29 @@ if __name__ == "__main__":
         help="Path to the oss-fuzz directory",
         default=Path(__file__).parent.resolve() / ".." / "dt-projects" / "oss-fuzz",
     )
-    parser.add_argument("--project", dest="project", type=str, help="Project name", required=True)
+    parser.add_argument("--project", dest="project", type=str, help="Project name")
     parser.add_argument(
         "--fuzz-target",
         dest="fuzz_target",
         type=str,
         help="Fuzz target name",
-        required=True,
     )
+    parser.add_argument("--store", dest="store", type=Path, help="Path to the corpus store", default=STORE)
+    parser.add_argument(
+        "--import",
+        dest="source",
+        type=Path,
+        help="Archive or directory (<project>/<fuzz target>/<inputs>) to add to the corpus store",
+        default=None,
+    )
+    parser.add_argument(
+        "--offline",
+        dest="offline",
+        action="store_true",
+        help="Do not download the corpora not in the corpus store",
+        default=False,
+    )
+    parser.add_argument("--proc", dest="proc", type=int, help="Number of processes to use", default=1)
     parser.add_argument(
         "--debug",
         dest="debug",
@@ -57,4 +251,6 @@ if __name__ == "__main__":
     args = parser.parse_args()
 
     log.init(args)
+    if args.source is None and (args.project is None or args.fuzz_target is None):
+        parser.error("--project and --fuzz-target are required without --import")
     main(args)
@@ -1,16 +1,34 @@
 #!/usr/bin/env python3
 
 import subprocess
+import hashlib
+import heapq
 import json
+import os
 import shutil
+import tempfile
 from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from multiprocessing import Pool
 from time import perf_counter
 import sys
 
 sys.path.append(str(Path(__file__).resolve().parent / ".."))
 from utils import log, tracer
+from utils.cache import file_digest
+from utils.corpus import extracted, has_inputs, input_digests, is_archive
+from utils.memory import MemoryPool
+
+# Maximum number of inputs traced in a debugger session
+BATCH_SIZE = 64
+# Format of the O0 traces cache (minimize-<fuzz target>.json)
+TRACES_VERSION = 2
+# Coverage-based pre-minimization (misc/sancov-cc builds): inputs per run, timeout (seconds) per input
+# and format of the coverage cache (coverage-<fuzz target>.json)
+SANCOV_COMPILER = "sancov-cc"
+SANCOV_BATCH_SIZE = 256
+SANCOV_TIMEOUT = 10
+COVERAGE_VERSION = 1
 
 
 def minimize_cmin(corpus_in, corpus_cmin, binary):
@@ -63,128 +81,448 @@ def get_inputs(input_dir):
     return inputs
 
 
-def compute_traces(binary_O0, inputs, dbg, proc):
-    """Compute and return traces at O0-all for each input
+def compute_traces(binary_O0, inputs, dbg, proc, mem_budget=0, batch_size=BATCH_SIZE):
+    """Compute and return traces at O0-all for each input.
+    The inputs are traced in batches, each in a single debugger session that runs the binary once per input.
 
     Args:
         binary_O0 (Path): path to binary compiled without opts
         inputs (set): input paths set
         dbg (str): debugger
         proc (int): number of processes
+        mem_budget (int): memory budget (MiB) of the debugger sessions, 0 to use only the available memory
+        batch_size (int): maximum number of inputs per debugger session
 
     Returns:
-        dict: traces
+        dict: traces, None for the inputs that failed (timeout, SIGSEGV)
     """
     traces = {}
-    results = {}
-    pool = Pool(processes=proc)
-    for input_filepath in inputs:
-
-        input_filename = input_filepath.name
-        traces[input_filename] = {}
+    results = []
+    # Sessions share the peak RSS history of the traces stage (same binary)
+    history = binary_O0.parent.parent / f"peak-rss-{binary_O0.name}.json"
+    pool = MemoryPool(proc, mem_budget * 1024, history)
+
+    # Split the inputs in at least proc batches, so that all the processes are used
+    inputs = sorted(inputs)
+    size = max(1, min(batch_size, -(-len(inputs) // proc)))
+    batches = [inputs[i : i + size] for i in range(0, len(inputs), size)]
+    log.info(f"[Stage 1] {len(inputs)} inputs traced in {len(batches)} debugger sessions.")
+    for batch in batches:
         if proc > 1:
-            results[input_filename] = pool.apply_async(func=tracer.get_variables, args=(binary_O0, input_filepath, dbg))
-        else:
-            traces[input_filename]["variables"], traces[input_filename]["functions"] = tracer.get_variables(
-                binary_O0, input_filepath, dbg
+            results.append(
+                pool.apply_async(func=tracer.get_variables_batch, args=(binary_O0, batch, dbg), key=binary_O0.parent.name)
             )
+        else:
+            results.append(tracer.get_variables_batch(binary_O0, batch, dbg))
 
     pool.close()
     pool.join()
 
-    # Add traces to traces dict if proc > 1
-    if proc > 1:
-        for input_filename, trace in results.items():
-            traces[input_filename]["variables"], traces[input_filename]["functions"] = trace.get()
+    for result in results:
+        if proc > 1:
+            result = result.get()
+        for input_filename, input_result in result.items():
+            if input_result is None:
+                traces[input_filename] = None
+                continue
+            variables, functions = input_result
+            traces[input_filename] = {"variables": variables, "functions": functions}
 
     return traces
 
 
-def minimize_traces(traces):
-    """Minimize inputs based on new lines that are stepped and check that
-    on the same line there is the same var status.
-    Return the set of min inputs
+def line_bitsets(traces):
+    """Encode the lines stepped by each input as a bitset over a global line index
+    and check that on the same line there is the same var status.
 
     Args:
         traces (dict): debug traces
 
     Returns:
-        set: min inputs filenames
+        tuple: (bitset of each input, number of lines)
     """
-    main_trace = {}
-    inputs_min = set()
-
-    # order for decrescent number of lines traces, to minimize number of input files
-    ordered = []
-    for i, trace in traces.items():
-        val = 0
-        for source, lines in trace["variables"].items():
-            val += len(lines)
-        ordered.append((i, val))
-    ordered_inputs = list(map(lambda x: x[0], sorted(ordered, key=lambda x: x[1])))
-
-    for i in ordered_inputs:
-        trace = traces[i]
-
-        for source, lines in trace["variables"].items():
-            if source not in main_trace:
-                main_trace[source] = {}
+    index = {}  # (source, line) -> bit
+    statuses = {}  # bit -> status of the first input stepping on the line
+    positions = {}
+
+    for i in sorted(traces):
+        positions[i] = []
+        for source, lines in traces[i]["variables"].items():
             for line, status in lines.items():
-                if line not in main_trace[source]:
-                    # if the current input allow to step on a new line it has to be added to the minimum set
-                    inputs_min.add(i)
-                    main_trace[source][line] = status
-                elif status != main_trace[source][line]:
+                bit = index.setdefault((source, line), len(index))
+                positions[i].append(bit)
+                if bit not in statuses:
+                    statuses[bit] = status
+                elif status != statuses[bit]:
                     # on the same line the status has to be the same
                     log.info(
-                        f"[{i}] Consistency check failed {source}:{line} - main trace: {main_trace[source][line]} - current trace: {status}"
+                        f"[{i}] Consistency check failed {source}:{line} - main trace: {statuses[bit]} - current trace: {status}"
                     )
 
+    return pack_bitsets(positions, len(index)), len(index)
+
+
+def pack_bitsets(positions, size):
+    """Pack the bit positions of each input in a bitset (a python int), once the index is complete
+    (or-ing single bits into a large int copies it every time).
+
+    Args:
+        positions (dict): bit positions of each input
+        size (int): number of bits
+
+    Returns:
+        dict: bitset of each input
+    """
+    bitsets = {}
+    for i, bits in positions.items():
+        packed = bytearray((size + 7) // 8)
+        for bit in bits:
+            packed[bit >> 3] |= 1 << (bit & 7)
+        bitsets[i] = int.from_bytes(packed, "little")
+    return bitsets
+
+
+def popcount(bits):
+    return bin(bits).count("1")
+
+
+if hasattr(int, "bit_count"):  # python >= 3.10
+    popcount = int.bit_count
+
+
+def set_cover(bitsets, size, weights=None):
+    """Select the inputs covering all the bits set by the whole set (greedy weighted set cover).
+
+    Args:
+        bitsets (dict): bitset of each input
+        size (int): number of bits
+        weights (dict): cost of each input (e.g. its size), 1 if None
+
+    Returns:
+        tuple: (selected inputs, number of bits covered)
+    """
+    weights = weights or {}
+    selected = set()
+    uncovered = (1 << size) - 1
+
+    # Lazy greedy: the gains only decrease as bits are covered, so an input whose updated
+    # gain is still the best in the heap is the best choice
+    heap = [(-popcount(bits) / max(1, weights.get(i, 1)), i) for i, bits in bitsets.items() if bits]
+    heapq.heapify(heap)
+    while heap:
+        _, i = heapq.heappop(heap)
+        gain = popcount(bitsets[i] & uncovered)
+        if not gain:
+            continue
+        ratio = -gain / max(1, weights.get(i, 1))
+        if heap and ratio > heap[0][0]:
+            heapq.heappush(heap, (ratio, i))
+            continue
+        selected.add(i)
+        uncovered &= ~bitsets[i]
+
+    return selected, size - popcount(uncovered)
+
+
+def minimize_traces(traces, weights=None):
+    """Minimize inputs so that the min set steps on all the lines stepped by the whole set (greedy weighted set cover).
+    Return the set of min inputs
+
+    Args:
+        traces (dict): debug traces
+        weights (dict): cost of each input (e.g. its size), 1 if None
+
+    Returns:
+        set: min inputs filenames
+    """
+    bitsets, total = line_bitsets(traces)
+    weights = weights or {}
+    inputs_min, coverage = set_cover(bitsets, total, weights)
+    log.info(
+        f"[Stage 1] Set cover: {len(inputs_min)} inputs (weight {sum(weights.get(i, 1) for i in inputs_min)}) "
+        f"step on {coverage}/{total} lines ({100 * coverage / max(1, total):.1f}%)."
+    )
     return inputs_min
 
 
-def main(args):
-    log.info(f"[project:{args.project}, fuzz-target:{args.fuzz_target}] Input minimization: STARTING.")
+def run_sancov(binary, inputs, timeout=SANCOV_TIMEOUT):
+    """Run a SanitizerCoverage binary (misc/sancov-cc) on a batch of inputs and return the pcs covered by each one.
+    When an input crashes or hangs, the binary is run again on the inputs after it.
+
+    Args:
+        binary (Path): path to the binary built with sancov-cc
+        inputs (list): input paths
+        timeout (int): timeout (seconds) of each input
+
+    Returns:
+        dict: {<input filename>: [<pc offset>]}, None for the inputs that crashed or hung
+    """
+    coverage = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        out = Path(tmpdir) / "coverage"
+        while inputs:
+            cmd = [binary.as_posix()] + [input_filepath.as_posix() for input_filepath in inputs]
+            try:
+                subprocess.run(
+                    cmd,
+                    env={**os.environ, "DT_SANCOV_OUT": out.as_posix()},
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    timeout=timeout * len(inputs),
+                )
+            except subprocess.TimeoutExpired:
+                pass
+            done = 0
+            if out.is_file():
+                for line in out.read_text(errors="replace").splitlines():
+                    # a line is written only after its input has been run (the last one can be incomplete)
+                    if "\t" not in line or done == len(inputs) or line.split("\t")[0] != inputs[done].as_posix():
+                        break
+                    coverage[inputs[done].name] = line.split("\t")[1].split()
+                    done += 1
+                out.unlink()
+            if done < len(inputs):
+                log.debug(f"[{binary}] {inputs[done].name}: crash or timeout")
+                coverage[inputs[done].name] = None
+                done += 1
+            inputs = inputs[done:]
+    return coverage
+
+
+def collect_coverage(binary, inputs, proc, batch_size=SANCOV_BATCH_SIZE):
+    """Collect the coverage of the inputs running batches of inputs in parallel.
+
+    Args:
+        binary (Path): path to the binary built with sancov-cc
+        inputs (set): input paths
+        proc (int): number of processes
+        batch_size (int): maximum number of inputs per run
+
+    Returns:
+        dict: {<input filename>: [<pc offset>]}, None for the inputs that crashed or hung
+    """
+    inputs = sorted(inputs)
+    size = max(1, min(batch_size, -(-len(inputs) // proc)))
+    batches = [inputs[i : i + size] for i in range(0, len(inputs), size)]
+    coverage = {}
+    with ThreadPoolExecutor(max_workers=proc) as executor:
+        for result in executor.map(lambda batch: run_sancov(binary, batch), batches):
+            coverage.update(result)
+    return coverage
+
+
+def minimize_coverage(coverage, weights=None):
+    """Select the inputs covering all the pcs covered by the whole set (greedy weighted set cover).
+
+    Args:
+        coverage (dict): pcs covered by each input
+        weights (dict): cost of each input (e.g. its size), 1 if None
+
+    Returns:
+        set: min inputs filenames
+    """
+    index = {}
+    positions = {i: [index.setdefault(pc, len(index)) for pc in pcs] for i, pcs in coverage.items()}
+    weights = weights or {}
+    inputs_min, covered = set_cover(pack_bitsets(positions, len(index)), len(index), weights)
+    log.info(
+        f"[Stage 0] Set cover: {len(inputs_min)} inputs (weight {sum(weights.get(i, 1) for i in inputs_min)}) "
+        f"cover {covered}/{len(index)} pcs ({100 * covered / max(1, len(index)):.1f}%)."
+    )
+    return inputs_min
+
+
+def minimize_sancov(corpus_in, corpus_cmin, binary, coverage_json, proc):
+    """Minimize the input corpus with the coverage of a SanitizerCoverage binary (misc/sancov-cc), without AFL++.
+    The coverage of each input is cached by input content (sha256), only the new inputs are run.
+
+    Args:
+        corpus_in (Path): path to input corpus
+        corpus_cmin (Path): path to corpus-cmin
+        binary (Path): path to the binary built with sancov-cc
+        coverage_json (Path): coverage cache filepath
+        proc (int): number of processes
+    """
+    inputs = get_inputs(corpus_in)
+    digests = {input_filepath: file_digest(input_filepath) for input_filepath in inputs}
+    key = {"binary": file_digest(binary)}
+    cached = {}
+    try:
+        with open(coverage_json) as f:
+            data = json.load(f)
+        if data.get("version") == COVERAGE_VERSION and data.get("binary") == key["binary"]:
+            cached = data["coverage"]
+    except (OSError, json.JSONDecodeError):
+        pass
+
+    new_inputs = {input_filepath for input_filepath, digest in digests.items() if digest not in cached}
+    log.info(f"[Stage 0] Coverage collection ({len(new_inputs)} new, {len(inputs) - len(new_inputs)} cached): STARTING.")
+    coverage = collect_coverage(binary, new_inputs, proc)
+    for input_filepath in new_inputs:
+        cached[digests[input_filepath]] = coverage[input_filepath.name]
+    log.info(f"[Stage 0] Coverage collection: COMPLETED.")
+
+    # crashing and hanging inputs are discarded, as afl-cmin does
+    coverage = {p.name: cached[digest] for p, digest in digests.items() if cached[digest] is not None}
+    log.info(f"[Stage 0] {len(inputs) - len(coverage)} inputs discarded (crash or timeout).")
+    inputs_min = minimize_coverage(coverage, {p.name: p.stat().st_size for p in inputs})
+
+    corpus_cmin.mkdir(parents=True, exist_ok=True)
+    for input_filename in inputs_min:
+        shutil.copy(corpus_in / input_filename, corpus_cmin / input_filename)
+
+    coverage_json.parent.mkdir(parents=True, exist_ok=True)
+    tmp = coverage_json.with_name(f"{coverage_json.name}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump({"version": COVERAGE_VERSION, **key, "coverage": {d: cached[d] for d in digests.values()}}, f)
+    tmp.replace(coverage_json)
+
+
+def corpus_digest(corpus, project, fuzz_target):
+    """Return a digest of the names and contents of the inputs of a fuzz target."""
+    digests = sorted(input_digests(corpus, project, fuzz_target).items())
+    return hashlib.sha256(json.dumps(digests).encode()).hexdigest()
+
+
+def load_trace_cache(traces_json, binary_O0):
+    """Load the O0 traces cached by input sha256, valid only for the same binary, tracer (and collectors) and breakpoint mode.
+
+    Args:
+        traces_json (Path): traces filepath
+        binary_O0 (Path): path to binary compiled without opts
+
+    Returns:
+        tuple: (cache key, {<input sha256>: trace}, digest of the corpus minimized with the traces)
+    """
+    key = {
+        "binary": file_digest(binary_O0),
+        "tracer": file_digest(Path(tracer.__file__)),
+        "collectors": [file_digest(tracer.GDB_COLLECTOR), file_digest(tracer.LLDB_COLLECTOR)],
+        "breakpoints": tracer.breakpoint_mode(),
+    }
+    try:
+        with open(traces_json) as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return key, {}, None
+    if data.get("version") != TRACES_VERSION or any(data.get(k) != v for k, v in key.items()):
+        log.info(f"[Stage 1] O0 traces in {traces_json} are outdated.")
+        return key, {}, None
+    return key, data["traces"], data.get("corpus")
+
+
+def write_trace_cache(traces_json, key, traces, corpus_state):
+    tmp = traces_json.with_name(f"{traces_json.name}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump({"version": TRACES_VERSION, **key, "corpus": corpus_state, "traces": traces}, f)
+    tmp.replace(traces_json)
+
+
+def run(
+    project,
+    fuzz_target,
+    compiler,
+    cc_version,
+    targets,
+    corpus,
+    corpus_cmin,
+    corpus_min,
+    afl_compiler,
+    proc=1,
+    mem_budget=0,
+    batch_size=BATCH_SIZE,
+    cmin_backend="auto",
+):
+    """Minimize the corpus of a fuzz target and store the minimized inputs in corpus_min.
+
+    Args:
+        project (str): project name
+        fuzz_target (str): fuzz target name
+        compiler (str): compiler used to build target
+        cc_version (str): compiler version
+        targets (Path): path to targets directory
+        corpus (Path): path to the corpus directory or archive
+        corpus_cmin (Path): path to the cmin corpus directory
+        corpus_min (Path): path to the output minimized corpus directory (or archive, to skip the fuzz targets in it)
+        afl_compiler (str): AFL++ compiler used to build target
+        proc (int): number of processes
+        mem_budget (int): memory budget (MiB) of the debugger sessions, 0 to use only the available memory
+        batch_size (int): maximum number of inputs per debugger session
+        cmin_backend (str): stage 0 backend: afl (afl-cmin), sancov (coverage of the sancov-cc build), none,
+            or auto (the first one whose binary is available)
+    """
+    # The input corpus can be an archive: the inputs of the fuzz target are extracted for the minimization
+    if is_archive(corpus) and not (is_archive(corpus_min) and has_inputs(corpus_min, project, fuzz_target)):
+        with extracted(corpus, project, fuzz_target) as corpus_dir:
+            args = (compiler, cc_version, targets, corpus_dir, corpus_cmin, corpus_min, afl_compiler, proc, mem_budget)
+            return run(project, fuzz_target, *args, batch_size, cmin_backend)
+
+    log.info(f"[project:{project}, fuzz-target:{fuzz_target}] Input minimization: STARTING.")
 
     # Get compiler version and initialize debugger
-    compiler = args.compiler if not args.cc_version else f"{args.compiler}{args.cc_version}"
+    compiler = compiler if not cc_version else f"{compiler}-{cc_version}"
     dbg = ["gdb", "lldb"]["clang" in compiler]
 
-    # Initialize paths and perform the initial checks
-    corpus_in = args.corpus / args.project / args.fuzz_target
-    corpus_cmin = args.corpus_cmin / args.project / args.fuzz_target
-    corpus_min = args.corpus_min / args.project / args.fuzz_target
-    binary_cmin = args.targets / args.project / args.afl_compiler / f"{args.project}-O0-standard" / args.fuzz_target
-    binary_O0 = args.targets / args.project / compiler / f"{args.project}-O0-standard" / args.fuzz_target
-
-    if corpus_min.is_dir() and any(corpus_min.iterdir()):
-        log.info(f"[Init] Found not empty output corpus directory {corpus_min.as_posix()}. Exiting...")
-        exit(0)
+    # Initialize paths and perform the initial checks (the minimized corpus can be an archive, e.g. the evaluation dataset)
+    if is_archive(corpus_min):
+        if has_inputs(corpus_min, project, fuzz_target):
+            log.info(f"[Init] Found {project}/{fuzz_target} in output corpus {corpus_min.as_posix()}. Exiting...")
+            exit(0)
+        log.info(f"[Init] Error: output corpus {corpus_min.as_posix()} is an archive without {project}/{fuzz_target}.")
+        exit(1)
+    corpus_state = corpus_digest(corpus, project, fuzz_target)
+    cmin_stamp = corpus_cmin / project / f".{fuzz_target}.corpus"
+    corpus_in = corpus / project / fuzz_target
+    corpus_cmin = corpus_cmin / project / fuzz_target
+    corpus_min = corpus_min / project / fuzz_target
+    binary_cmin = targets / project / afl_compiler / f"{project}-O0-standard" / fuzz_target
+    binary_O0 = targets / project / compiler / f"{project}-O0-standard" / fuzz_target
+    traces_O0_json = targets / project / compiler / f"minimize-{fuzz_target}.json"
+
+    binary_sancov = targets / project / SANCOV_COMPILER / f"{project}-O0-standard" / fuzz_target
+    coverage_json = targets / project / SANCOV_COMPILER / f"coverage-{fuzz_target}.json"
 
-    skip_stage_0 = False
     if not corpus_in.is_dir():
         log.info(f"[Init] Error: input corpus directory {corpus_in.as_posix()} not found.")
         exit(1)
-    if not binary_cmin.is_file():
+    # Stage 0 backend: afl-cmin (afl build), coverage set cover (sancov-cc build) or none (the whole corpus is traced)
+    if cmin_backend == "auto":
+        cmin_backend = "afl" if binary_cmin.is_file() else "sancov" if binary_sancov.is_file() else "none"
+    if cmin_backend == "afl" and not binary_cmin.is_file():
         log.info(f"[Init] Error: binary instrumented for afl-cmin {binary_cmin.as_posix()} not found.")
-        skip_stage_0 = True
+        cmin_backend = "none"
+    if cmin_backend == "sancov" and not binary_sancov.is_file():
+        log.info(f"[Init] Error: binary instrumented with SanitizerCoverage {binary_sancov.as_posix()} not found.")
+        cmin_backend = "none"
     if not binary_O0.is_file():
         log.info(f"[Init] Error: binary at O0-all {binary_O0.as_posix()} not found.")
         exit(1)
 
-    # Stage 0 - cmin
-    if not skip_stage_0:
-        if corpus_cmin.exists():
-            log.info(f"[Stage 0] Found corpus cmin directory {corpus_cmin.as_posix()}. Skipping afl-cmin minimization.")
-        else:
+    key, cached_traces, cached_corpus = load_trace_cache(traces_O0_json, binary_O0)
+    if corpus_min.is_dir() and any(corpus_min.iterdir()) and cached_corpus == corpus_state:
+        log.info(f"[Init] Output corpus {corpus_min.as_posix()} is up to date with the input corpus. Exiting...")
+        exit(0)
+
+    # Stage 0 - cmin (run again only if the input corpus changed)
+    cmin_up_to_date = corpus_cmin.exists() and cmin_stamp.is_file() and cmin_stamp.read_text() == corpus_state
+    if cmin_up_to_date:
+        log.info(f"[Stage 0] Found corpus cmin directory {corpus_cmin.as_posix()}. Skipping cmin minimization.")
+    else:
+        shutil.rmtree(corpus_cmin, ignore_errors=True)
+        if cmin_backend == "afl":
             log.info(f"[Stage 0] afl-cmin minimization: STARTING.")
             rm_regressions_cmd = ["rm", "-rf", (corpus_in / "regressions").as_posix()]
             log.info(" ".join(rm_regressions_cmd))
             subprocess.run(rm_regressions_cmd)
             minimize_cmin(corpus_in.as_posix(), corpus_cmin.as_posix(), binary_cmin.as_posix())
             log.info(f"[Stage 0] afl-cmin minimization: COMPLETED.")
-    else:
-        shutil.copytree(corpus_in.as_posix(), corpus_cmin.as_posix())
+        elif cmin_backend == "sancov":
+            log.info(f"[Stage 0] SanitizerCoverage minimization: STARTING.")
+            minimize_sancov(corpus_in, corpus_cmin, binary_sancov, coverage_json, proc)
+            log.info(f"[Stage 0] SanitizerCoverage minimization: COMPLETED.")
+        else:
+            shutil.copytree(corpus_in.as_posix(), corpus_cmin.as_posix())
+        cmin_stamp.write_text(corpus_state)
 
     # Get inputs filepaths for stage 1
     inputs_stage1 = get_inputs(corpus_cmin)
@@ -193,47 +531,75 @@ def main(args):
         exit(1)
 
     # Stage 1 - minimization with traces
-    # if traces with at O0-all have already been computed: compute directly the min set
-    # else: compute the traces and then use them to compute the min set
-    traces_O0_json = args.targets / args.project / compiler / f"minimize-{args.fuzz_target}.json"
-    if traces_O0_json.is_file():
-        with open(traces_O0_json) as f:
-            traces = json.load(f)
-        if len(traces) == len(inputs_stage1):
-            log.info(f"[Stage 1] Found O0 traces in {traces_O0_json}. Skipping traces computation.")
-        else:
-            log.info(f"[Stage 1] Error: Found O0 traces in {traces_O0_json} but with a different inputs set.")
-            exit(1)
+    # O0 traces are cached by input content: only the new inputs are traced and the removed ones are dropped
+    digests = {input_filepath: file_digest(input_filepath) for input_filepath in inputs_stage1}
+    new_inputs = {input_filepath for input_filepath, digest in digests.items() if digest not in cached_traces}
+    if new_inputs:
+        log.info(f"[Stage 1] O0 traces computation ({len(new_inputs)} new, {len(inputs_stage1) - len(new_inputs)} cached): STARTING.")
+        new_traces = compute_traces(binary_O0, new_inputs, dbg, proc, mem_budget, batch_size)
+        # Failed (timeout, SIGSEGV) and empty traces are not cached, so that their inputs are traced again
+        # in the next run instead of being left out of the minimized corpus forever
+        failed = 0
+        for input_filepath in new_inputs:
+            trace = new_traces[input_filepath.name]
+            if trace is None or not trace["variables"]:
+                failed += 1
+                continue
+            cached_traces[digests[input_filepath]] = trace
+        log.info(f"[Stage 1] O0 traces computation: COMPLETED ({failed} failed or empty, not cached).")
     else:
-        log.info(f"[Stage 1] O0 traces computation: STARTING.")
-        traces = compute_traces(binary_O0, inputs_stage1, dbg, args.proc)
-        log.info(f"[Stage 1] O0 traces computation: COMPLETED.")
-
-        # Write traces in json
-        with open(traces_O0_json, "w") as f:
-            json.dump(traces, f)
+        log.info(f"[Stage 1] Found O0 traces of all inputs in {traces_O0_json}. Skipping traces computation.")
+    empty = {"variables": {}, "functions": {}}
+    traces = {input_filepath.name: cached_traces.get(digest, empty) for input_filepath, digest in digests.items()}
 
-    # Extract minimum inputs set
-    inputs_stage2 = minimize_traces(traces)
+    # Extract minimum inputs set, weighting the inputs by size (smaller inputs are cheaper to trace)
+    inputs_stage2 = minimize_traces(traces, {p.name: p.stat().st_size for p in inputs_stage1})
     log.info(f"[Stage 1] Input set len reduced from {len(inputs_stage1)} to {len(inputs_stage2)}.")
     inputs_min = inputs_stage2
 
-    # Copy min input set in corpus-min dir
+    # Update the min input set in corpus-min dir
     corpus_min.mkdir(parents=True, exist_ok=True)
-    log.info(f"{corpus_min} directory created.")
+    for path in corpus_min.iterdir():
+        if path.name not in inputs_min:
+            path.unlink()
+            log.debug(f"rm {path}")
     for input_filename in inputs_min:
-        src_path = corpus_in / input_filename
+        src_path = corpus_cmin / input_filename
         dest_path = corpus_min / input_filename
         shutil.copy(src_path, dest_path)
         log.debug(f"cp {src_path} {dest_path}")
 
-    log.info(f"[project:{args.project}, fuzz-target:{args.fuzz_target}] Input minimization: COMPLETED.")
+    # Write the traces of the current inputs in json, with the corpus they minimize
+    # (none if some inputs have no trace, so that the next run traces them again)
+    current_traces = {digest: cached_traces[digest] for digest in digests.values() if digest in cached_traces}
+    complete = len(current_traces) == len(set(digests.values()))
+    write_trace_cache(traces_O0_json, key, current_traces, corpus_state if complete else None)
+
+    log.info(f"[project:{project}, fuzz-target:{fuzz_target}] Input minimization: COMPLETED.")
+
+
+def main(args):
+    run(
+        args.project,
+        args.fuzz_target,
+        args.compiler,
+        args.cc_version,
+        args.targets,
+        args.corpus,
+        args.corpus_cmin,
+        args.corpus_min,
+        args.afl_compiler,
+        args.proc,
+        args.mem_budget,
+        args.batch_size,
+        args.cmin_backend,
+    )
 
 
 if __name__ == "__main__":
 
     parser = ArgumentParser(
-        description="Minimize corpora in 3 stages: afl-cmin -> traces -> k-means.",
+        description="Minimize corpora in 3 stages: afl-cmin (or SanitizerCoverage) -> traces -> k-means.",
         formatter_class=ArgumentDefaultsHelpFormatter,
     )
 
@@ -279,7 +645,7 @@ if __name__ == "__main__":
         "--corpus",
         dest="corpus",
         type=Path,
-        help="Path to the corpus directory",
+        help="Path to the corpus directory or archive",
         default=Path(__file__).parent.resolve() / ".." / "dt-projects" / "oss-fuzz" / "build" / "corpus",
     )
     parser.add_argument(
@@ -293,10 +659,32 @@ if __name__ == "__main__":
         "--corpus-min",
         dest="corpus_min",
         type=Path,
-        help="Path to the output minimized corpus directory",
+        help="Path to the output minimized corpus directory (or archive, to skip the fuzz targets in it)",
         default=Path(__file__).parent.resolve() / ".." / "dt-corpus-min",
     )
     parser.add_argument("--proc", dest="proc", type=int, help="Number of processes to use", default=1)
+    parser.add_argument(
+        "--mem-budget",
+        dest="mem_budget",
+        type=int,
+        help="Memory budget (MiB) of the debugger sessions, 0 to use only the available memory",
+        default=0,
+    )
+    parser.add_argument(
+        "--batch-size",
+        dest="batch_size",
+        type=int,
+        help="Maximum number of inputs traced in a debugger session",
+        default=BATCH_SIZE,
+    )
+    parser.add_argument(
+        "--cmin-backend",
+        dest="cmin_backend",
+        choices=["auto", "afl", "sancov", "none"],
+        type=str,
+        help="Stage 0 minimization: afl-cmin, coverage of the sancov-cc build (misc/sancov-cc), none, or the first available",
+        default="auto",
+    )
     parser.add_argument(
         "--debug",
         dest="debug",
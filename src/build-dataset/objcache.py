@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent / ".."))
+from config import CACHE_DIR
+
+SOURCE_SUFFIXES = (".c", ".cc", ".cpp", ".cxx", ".c++", ".C")
+# Options that generate the dependency files, with the number of values they take
+DEPENDENCY_OPTIONS = {"-MD": 0, "-MMD": 0, "-MP": 0, "-MF": 1, "-MT": 1, "-MQ": 1}
+# Pass names are transformed as in builder.py (opt_configs)
+PASS_NAME_TRANS = str.maketrans({c: "_" for c in " <>/()-"})
+BISECT_PATTERN = re.compile(r"BISECT: running pass \(\d+\) (.*) on ")
+
+
+def parse_args(args):
+    """Return the source, the output and the position of -o of a single-source compilation (-c), None otherwise."""
+    if "-c" not in args or any(a in ("-E", "-S", "-", "-save-temps") or a.startswith("-save-temps=") for a in args):
+        return None
+    sources = [
+        i
+        for i, a in enumerate(args)
+        if a.endswith(SOURCE_SUFFIXES) and (i == 0 or args[i - 1] not in ("-o", "-MF", "-MT", "-MQ", "-include"))
+    ]
+    if len(sources) != 1 or args.count("-o") > 1:
+        return None
+    source = args[sources[0]]
+    if "-o" in args:
+        out_idx = args.index("-o") + 1
+        if out_idx >= len(args):
+            return None
+        output = args[out_idx]
+    else:
+        out_idx = None
+        output = f"{Path(source).stem}.o"
+    return source, output, out_idx
+
+
+def strip_dependency_options(args):
+    stripped = []
+    skip = 0
+    for a in args:
+        if skip:
+            skip -= 1
+        elif a in DEPENDENCY_OPTIONS:
+            skip = DEPENDENCY_OPTIONS[a]
+        else:
+            stripped.append(a)
+    return stripped
+
+
+def disabled_passes(args):
+    """Return the clang passes disabled with -mllvm -opt-disable and the arguments without them."""
+    passes = []
+    rest = []
+    i = 0
+    while i < len(args):
+        if args[i] == "-mllvm" and i + 1 < len(args) and args[i + 1].startswith("-opt-disable="):
+            passes += args[i + 1].split("=", 1)[1].split(",")
+            i += 2
+            continue
+        rest.append(args[i])
+        i += 1
+    return passes, rest
+
+
+def prefix_maps(args):
+    """Return the (old, new) path prefixes of the -ffile-prefix-map options."""
+    maps = []
+    for a in args:
+        if a.startswith("-ffile-prefix-map=") and "=" in a[len("-ffile-prefix-map=") :]:
+            maps.append(tuple(a[len("-ffile-prefix-map=") :].split("=", 1)))
+    return maps
+
+
+def compiler_identity(compiler):
+    path = Path(shutil.which(compiler) or compiler).resolve()
+    st = path.stat()
+    return f"{path}:{st.st_size}:{st.st_mtime_ns}"
+
+
+class ObjectCache:
+    """Compiled objects stored by the hash of preprocessed source, flags, working directory and compiler.
+
+    The working directory and the source path are part of the key since they are recorded in the debug info.
+    Paths are hashed as remapped by the -ffile-prefix-map options (which the line markers of the preprocessed
+    source do not follow), so the copies of the checkout of parallel configurations (builder.py -P), compiled
+    with -ffile-prefix-map=<copy>=<checkout>, share their objects.
+    For clang, objects built with -mllvm -opt-disable=<pass> are shared with the configuration without
+    the flag when the pass never runs on the translation unit: the passes run when building that
+    configuration are recorded with -opt-bisect-limit=-1 (which does not change the output).
+    With gcc the flags are recorded in DW_AT_producer, so every configuration has its own objects.
+
+    Args:
+        root (Path): cache directory
+        compiler (str): real compiler
+    """
+
+    def __init__(self, root, compiler):
+        self.root = Path(root)
+        self.compiler = compiler
+        self.identity = compiler_identity(compiler)
+        self.clang = "clang" in Path(compiler).name
+
+    def key(self, args, source, preprocessed):
+        maps = prefix_maps(args)
+
+        def remap(text):
+            for old, new in maps:
+                text = text.replace(old, new)
+            return text
+
+        h = hashlib.sha256()
+        h.update(remap(f"{self.identity}\n{os.getcwd()}\n{source}\n").encode())
+        h.update(remap("\0".join(strip_dependency_options(args))).encode())
+        for old, new in maps:
+            preprocessed = preprocessed.replace(old.encode(), new.encode())
+        h.update(preprocessed)
+        return h.hexdigest()
+
+    def entry(self, key):
+        return self.root / key[:2] / key
+
+    def lookup(self, key):
+        entry = self.entry(key)
+        try:
+            with open(f"{entry}.json") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def store(self, key, obj, meta):
+        entry = self.entry(key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp = f"{entry}.{os.getpid()}.tmp"
+        shutil.copyfile(obj, tmp)
+        os.replace(tmp, f"{entry}.o")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, f"{entry}.json")
+
+    def restore(self, key, output):
+        tmp = f"{output}.{os.getpid()}.tmp"
+        shutil.copyfile(f"{self.entry(key)}.o", tmp)
+        os.replace(tmp, output)
+
+    def compile(self, args, key, output, record_passes=False):
+        """Compile and store the object. Return the compiler exit code."""
+        if record_passes:
+            args = args + ["-mllvm", "-opt-bisect-limit=-1"]
+            result = subprocess.run([self.compiler] + args, stderr=subprocess.PIPE)
+            stderr = result.stderr.decode(errors="replace")
+            # forward the diagnostics, not the passes
+            sys.stderr.write("".join(l for l in stderr.splitlines(True) if not l.startswith("BISECT:")))
+            passes = sorted({m.translate(PASS_NAME_TRANS) for m in BISECT_PATTERN.findall(stderr)})
+        else:
+            result = subprocess.run([self.compiler] + args)
+            passes = None
+        if result.returncode == 0:
+            self.store(key, output, {"passes": passes})
+        return result.returncode
+
+
+def run(compiler, args):
+    """Compile as compiler would, using the object cache for single-source compilations.
+
+    Args:
+        compiler (str): real compiler
+        args (list): compiler arguments
+
+    Returns:
+        int: exit code
+    """
+    parsed = parse_args(args)
+    if parsed is None or os.environ.get("DT_OBJCACHE_DISABLE"):
+        return subprocess.run([compiler] + args).returncode
+    source, output, out_idx = parsed
+    cache = ObjectCache(CACHE_DIR / "objects", compiler)
+
+    # Preprocess as the compilation would (also writing the dependency file, if requested)
+    pp_args = ["-E" if a == "-c" else a for a in args]
+    if out_idx is None:
+        pp_args += ["-o", output]
+    result = subprocess.run([compiler] + pp_args, stderr=subprocess.DEVNULL)
+    if result.returncode != 0:
+        return subprocess.run([compiler] + args).returncode
+    with open(output, "rb") as f:
+        preprocessed = f.read()
+
+    # clang: reuse the object of the configuration without -opt-disable if the disabled passes never run
+    passes, base_args = disabled_passes(args)
+    if cache.clang and passes:
+        base_key = cache.key(base_args, source, preprocessed)
+        meta = cache.lookup(base_key)
+        if meta is None or meta["passes"] is None:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                base_output = Path(tmpdir) / Path(output).name
+                base_compile = strip_dependency_options(base_args)
+                if out_idx is None:
+                    base_compile += ["-o", str(base_output)]
+                else:
+                    base_compile[base_compile.index("-o") + 1] = str(base_output)
+                if cache.compile(base_compile, base_key, base_output, record_passes=True) == 0:
+                    meta = cache.lookup(base_key)
+        if meta is not None and meta["passes"] is not None and not set(passes) & set(meta["passes"]):
+            cache.restore(base_key, output)
+            return 0
+
+    key = cache.key(args, source, preprocessed)
+    if cache.lookup(key) is not None:
+        cache.restore(key, output)
+        return 0
+    return cache.compile(args, key, output, record_passes=cache.clang and not passes)
+
+
+if __name__ == "__main__":
+    # Usage: objcache.py <compiler> <compiler arguments>
+    # builder.py -C runs the builds through shims named as the compilers that call this script
+    if len(sys.argv) < 2:
+        print(f"Usage: {sys.argv[0]} <compiler> [args...]", file=sys.stderr)
+        exit(1)
+    exit(run(sys.argv[1], sys.argv[2:]))
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent / ".."))
+from misc.pass_catalogue import PASS_NAME_TRANS, catalogue
+from objcache import parse_args
+
+# clang: passes run (opt-bisect) and passes that changed the IR (print-changed, new pass manager only)
+BISECT_PATTERN = re.compile(r"BISECT: running pass \(\d+\) (.*) on ")
+CHANGED_PATTERN = re.compile(r"^\*\*\* IR Dump After (.*) on .* \*\*\*$")
+DIAGNOSTIC_PATTERN = re.compile(r"(^|: )(error|warning|note): ")
+# gcc: -fdump-statistics lines are "<pass number> <pass> "<counter>" <value>".
+# Counters matching BOOKKEEPING are recorded even when the pass does not transform anything
+STATISTICS_PATTERN = re.compile(r'^\d+ (\S+) "(.*)" (\d+)$')
+BOOKKEEPING = re.compile(r"^RPO | == |^Incremental SSA update$| times$")
+# gcc flags that only gate passes whose transformations are counted in the statistics.
+# Other flags (and passes that never appear in the statistics) are never considered inactive
+GCC_FLAG_PASSES = {
+    "-fno-tree-pre": ("pre",),
+    "-fno-tree-fre": ("fre",),
+    "-fno-tree-ccp": ("ccp",),
+    "-fno-tree-copy-prop": ("copyprop",),
+    "-fno-tree-dce": ("dce", "cddce"),
+    "-fno-tree-vrp": ("vrp", "evrp"),
+}
+
+
+def opt_level(args):
+    levels = [a[2:] or "1" for a in args if a.startswith("-O")]
+    return levels[-1] if levels else "0"
+
+
+def screen_clang(compiler, args):
+    cmd = [compiler] + args + ["-mllvm", "-opt-bisect-limit=-1", "-mllvm", "-print-changed=quiet"]
+    ran = set()
+    changed = set()
+    # the IR dumps can be large, only the headers are kept
+    with subprocess.Popen(cmd, stderr=subprocess.PIPE, errors="replace") as p:
+        for line in p.stderr:
+            match = BISECT_PATTERN.search(line)
+            if match:
+                ran.add(match.group(1).translate(PASS_NAME_TRANS))
+                continue
+            match = CHANGED_PATTERN.match(line)
+            if match:
+                changed.add(match.group(1).translate(PASS_NAME_TRANS))
+            elif DIAGNOSTIC_PATTERN.search(line):
+                sys.stderr.write(line)
+    return p.returncode, ran, changed
+
+
+def screen_gcc(compiler, args):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        statistics = Path(tmpdir) / "statistics"
+        returncode = subprocess.run([compiler] + args + [f"-fdump-statistics-stats={statistics}"]).returncode
+        ran = set()
+        changed = set()
+        if statistics.is_file():
+            for line in statistics.read_text(errors="replace").split("\n"):
+                match = STATISTICS_PATTERN.match(line)
+                if not match:
+                    continue
+                ran.add(match.group(1))
+                if int(match.group(3)) > 0 and not BOOKKEEPING.search(match.group(2)):
+                    changed.add(match.group(1))
+    return returncode, ran, changed
+
+
+def run(compiler, args):
+    """Compile as compiler would, recording the passes run and the passes that transformed code
+    in a json file in the DT_SCREEN_DIR directory.
+
+    Args:
+        compiler (str): real compiler
+        args (list): compiler arguments
+
+    Returns:
+        int: exit code
+    """
+    if parse_args(args) is None:
+        return subprocess.run([compiler] + args).returncode
+    screen = screen_clang if "clang" in Path(compiler).name else screen_gcc
+    returncode, ran, changed = screen(compiler, args)
+    if returncode == 0:
+        record = Path(os.environ["DT_SCREEN_DIR"]) / f"{uuid.uuid4().hex}.json"
+        with open(record, "w") as f:
+            json.dump({"level": opt_level(args), "ran": sorted(ran), "changed": sorted(changed)}, f)
+    return returncode
+
+
+def collect(records_dir, compiler, output):
+    """Merge the records of a screening build in the activity file of the project.
+
+    A clang pass is inactive at a level if it never ran or, for passes of the new pass manager
+    (names without spaces, reported by print-changed), if it never changed the IR.
+    A gcc flag is inactive if all the passes it gates ran without transforming anything.
+
+    Args:
+        records_dir (Path): directory with the records written by run()
+        compiler (str): real compiler
+        output (Path): activity json filepath
+    """
+    levels = {}
+    for record in Path(records_dir).glob("*.json"):
+        with open(record) as f:
+            record = json.load(f)
+        level = levels.setdefault(record["level"], {"ran": set(), "changed": set()})
+        level["ran"].update(record["ran"])
+        level["changed"].update(record["changed"])
+
+    data = catalogue(compiler, tuple(levels))
+    activity = {"compiler": data["compiler"], "levels": {}}
+    for opt_level, level in levels.items():
+        inactive = []
+        for opt in data["levels"][opt_level]:
+            if "clang" in Path(compiler).name:
+                name = data["passes"].get(opt, opt)
+                if opt not in level["ran"] or (" " not in name and opt not in level["changed"]):
+                    inactive.append(opt)
+            elif opt in GCC_FLAG_PASSES:
+                if all(p in level["ran"] and p not in level["changed"] for p in GCC_FLAG_PASSES[opt]):
+                    inactive.append(opt)
+        activity["levels"][opt_level] = {
+            "ran": sorted(level["ran"]),
+            "changed": sorted(level["changed"]),
+            "inactive": inactive,
+        }
+        print(f"[screen] -O{opt_level}: {len(inactive)} inactive of {len(data['levels'][opt_level])}")
+
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output.with_name(f"{output.name}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(activity, f, indent=2)
+    tmp.replace(output)
+
+
+def inactive(activity, opt_level):
+    """Return the flags (gcc) or passes (clang) with no recorded activity at opt_level."""
+    try:
+        with open(activity) as f:
+            return json.load(f)["levels"][opt_level]["inactive"]
+    except (OSError, KeyError, json.JSONDecodeError):
+        return []
+
+
+if __name__ == "__main__":
+    # Usage: screen.py <compiler> <compiler arguments>    (compiler wrapper, see builder.py -S)
+    #        screen.py collect <records directory> <compiler> <activity json>
+    #        screen.py inactive <activity json> <level>
+    if len(sys.argv) < 2:
+        print(f"Usage: {sys.argv[0]} <compiler> [args...]", file=sys.stderr)
+        exit(1)
+    if sys.argv[1] == "collect":
+        collect(*sys.argv[2:5])
+    elif sys.argv[1] == "inactive":
+        # space-separated list
+        print(" ".join(inactive(*sys.argv[2:4])))
+    else:
+        exit(run(sys.argv[1], sys.argv[2:]))
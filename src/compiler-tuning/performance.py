@@ -11,27 +11,35 @@ from utils import log
 from misc.clang_pass_names import get_pass_arg
 
 
-def main(args):
+def run(compiler, cc_version, targets, perfdir):
+    """Construct the performance evaluation scripts from the rankings.
+
+    Args:
+        compiler (str): compiler used to build target
+        cc_version (str): compiler version
+        targets (Path): path to targets directory
+        perfdir (Path): path to output perf scripts
+    """
     log.info(f"[debugtuner] Constructing performance scripts: INITIALIZING.")
 
-    compiler = args.compiler if not args.cc_version else f"{args.compiler}-{args.cc_version}"
-    rankings_json = args.targets / f"rankings-{compiler}.json"
+    full_compiler = compiler if not cc_version else f"{compiler}-{cc_version}"
+    rankings_json = targets / f"rankings-{full_compiler}.json"
 
-    template_file = Path(__file__).resolve().parent / f"run_spec_template_{args.compiler}.sh"
+    template_file = Path(__file__).resolve().parent / f"run_spec_template_{compiler}.sh"
     template = open(template_file).read()
 
-    if not args.perfdir.exists():
-        os.mkdir(args.perfdir)
+    if not perfdir.exists():
+        os.mkdir(perfdir)
 
     rankings = {}
     with open(rankings_json) as f:
         rankings = json.load(f)
 
-    template = template.replace("PERFORMANCE_DIR_TEMPLATE", f"{args.perfdir.resolve()}")
+    template = template.replace("PERFORMANCE_DIR_TEMPLATE", f"{perfdir.resolve()}")
 
     configurations = []
     for opt_level in rankings:
-        if args.compiler == "gcc":
+        if compiler == "gcc":
             ranks = list(filter(lambda x: x[0] != "inline", rankings[opt_level]))
             for name, count in [("std", 0), ("d3", 3), ("d5", 5), ("d7", 7), ("d9", 9)]:
                 configs = " ".join(list(map(lambda x: f"-fno-{x[0]}", ranks[:count])))
@@ -48,12 +56,12 @@ def main(args):
 
     template = template.replace("CONFIGURATIONS_TEMPLATE", "\n".join(configurations))
 
-    with open(f"{args.perfdir}/run_spec_{args.compiler}.sh", "w") as f:
+    with open(f"{perfdir}/run_spec_{compiler}.sh", "w") as f:
         f.write(template)
 
-    if args.compiler == "clang":
+    if compiler == "clang":
 
-        large_dir = args.perfdir / "largs-workload"
+        large_dir = perfdir / "largs-workload"
         # construct directory
         if not large_dir.exists():
             os.mkdir(large_dir)
@@ -83,6 +91,10 @@ def main(args):
     log.info(f"[debugtuner] Constructing performance scripts: TERMINATED.")
 
 
+def main(args):
+    run(args.compiler, args.cc_version, args.targets, args.perfdir)
+
+
 if __name__ == "__main__":
 
     parser = ArgumentParser(
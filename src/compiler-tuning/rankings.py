@@ -10,21 +10,29 @@ import config
 from utils import log
 
 
-def main(args):
+def run(compiler, cc_version, targets, minimal=False):
+    """Construct the optimization pass rankings and store them in rankings-<compiler>.json.
+
+    Args:
+        compiler (str): compiler used to build target
+        cc_version (str): compiler version
+        targets (Path): path to targets directory
+        minimal (bool): use the minimal workload
+    """
     log.info(f"[debugtuner] Constructing Rankings: INITIALIZING.")
 
     keys = ("availability-variables", "line-coverage")
-    compiler = args.compiler if not args.cc_version else f"{args.compiler}-{args.cc_version}"
+    full_compiler = compiler if not cc_version else f"{compiler}-{cc_version}"
 
     overall_stats = {}
 
-    projects = config.projects[args.compiler]
-    if args.minimal:
-        projects = config.projects_minimal[args.compiler]
+    projects = config.projects[compiler]
+    if minimal:
+        projects = config.projects_minimal[compiler]
 
     for project_name in projects:
 
-        metrics_file = f"{args.targets}/{project_name}/{compiler}/metrics.json"
+        metrics_file = f"{targets}/{project_name}/{full_compiler}/metrics.json"
         metrics = json.load(open(metrics_file))
 
         stats = {}
@@ -88,7 +96,7 @@ def main(args):
 
         final_stats[opt_level] = sorted(final_stats[opt_level], key=lambda x: x[1])
 
-    rankings_json = args.targets / f"rankings-{compiler}.json"
+    rankings_json = targets / f"rankings-{full_compiler}.json"
     rankings = {}
 
     for opt_level in final_stats:
@@ -104,6 +112,10 @@ def main(args):
     log.info(f"[debugtuner] Constructing Rankings: TERMINATED.")
 
 
+def main(args):
+    run(args.compiler, args.cc_version, args.targets, args.minimal)
+
+
 if __name__ == "__main__":
 
     parser = ArgumentParser(
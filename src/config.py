@@ -1,9 +1,13 @@
-from dataclasses import dataclass
+import os
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 TIMEOUT = 4000
 
+# directory with the caches shared by the stages (e.g. compiled objects), can be moved with DT_CACHE
+CACHE_DIR = Path(os.environ.get("DT_CACHE", Path(__file__).resolve().parent / "dt-cache"))
+
 # dict with programs supported and list of fuzz targets to test
 _projects = {}
 
@@ -151,6 +155,264 @@ ast_config["zlib"] = CompilerConfig([], [])
 ast_config["zydis"] = CompilerConfig([], ["ZYDIS_LIBFUZZER"])
 
 
+@dataclass
+class BuildRecipe:
+    """Build of a project run by build-dataset/builder.py for each configuration.
+
+    Commands are bash scripts run with CC, CXX, CFLAGS (-g and the configuration flags), CXXFLAGS, NPROC,
+    BASE (source tree of the configuration), OUT (binaries directory of the configuration), FUZZER_OBJ and
+    LIB_FUZZING_ENGINE (compiled fuzzer-main.c), OSS_FUZZ (oss-fuzz directory of the project) and REPO set.
+    """
+
+    repository: str
+    commit: str
+    # commands building the fuzz targets in $OUT, run in build_dir after build
+    fuzz_targets: str
+    # libraries (relative to build_dir) that must exist before the fuzz targets are built
+    artifacts: List[str] = field(default_factory=list)
+    # apt packages needed by the build
+    packages: List[str] = field(default_factory=list)
+    clone_args: List[str] = field(default_factory=list)
+    # commands run once in the checkout (fuzz targets sources, patches, configure script generation, ...)
+    setup: str = ""
+    # directory where the project is configured and built, recreated for each configuration if not "."
+    build_dir: str = "."
+    # arguments of ./configure (autoconf) or cmake, the checks whose results are the same at every level
+    # are reused by the other configurations
+    configure: Optional[str] = None
+    cmake: Optional[str] = None
+    build: str = "make -j $NPROC"
+    # appended to CFLAGS
+    cflags: str = ""
+
+
+# dict with the build recipe of each project, run by build-dataset/builder.py
+recipes: Dict[str, BuildRecipe] = {}
+recipes["bzip2"] = BuildRecipe(
+    "git://sourceware.org/git/bzip2.git",
+    "fbc4b11da543753b3b803e5546f56e26ec90c2a7",
+    setup="mkdir fuzz && cp $OSS_FUZZ/*.c fuzz/.",
+    build="""
+        SRCL=(blocksort.o huffman.o crctable.o randtable.o compress.o decompress.o bzlib.o)
+        for source in ${SRCL[@]}; do
+            $CC $CFLAGS -c $(basename $source .o).c
+        done
+        rm -f libbz2.a
+        ar cq libbz2.a ${SRCL[@]} && ranlib libbz2.a
+    """,
+    artifacts=["libbz2.a"],
+    fuzz_targets="""
+        for file in fuzz/*.c; do
+            name=$(basename $file .c)
+            $CC $CFLAGS -c -I . fuzz/${name}.c -o $OUT/${name}.o
+            $CXX $CXXFLAGS -o $OUT/${name} $OUT/${name}.o $LIB_FUZZING_ENGINE libbz2.a
+            rm -f $OUT/${name}.o
+        done
+    """,
+)
+recipes["libdwarf"] = BuildRecipe(
+    "https://github.com/davea42/libdwarf-code",
+    "f717ac1",  # v0.8.0 from github
+    packages=["cmake", "make", "zlib1g-dev"],
+    build_dir="build",
+    cmake="..",
+    artifacts=["src/lib/libdwarf/libdwarf.a"],
+    fuzz_targets="""
+        for fuzzFile in $BASE/fuzz/fuzz*.c; do
+            fuzzName=$(basename "$fuzzFile" '.c')
+            $CC $CFLAGS $FUZZER_OBJ -I../src/lib/libdwarf/ \\
+                "$BASE/fuzz/${fuzzName}.c" -o "$OUT/${fuzzName}" ./src/lib/libdwarf/libdwarf.a -lz
+        done
+    """,
+)
+recipes["libexif"] = BuildRecipe(
+    "https://github.com/libexif/libexif",
+    "2f69eacf194dbf3efc805de4ace31df2b76245a2",
+    setup="mkdir fuzz && cp $OSS_FUZZ/*.cc fuzz/. && autoreconf -fiv",
+    configure="--disable-docs --enable-shared=no --prefix=$BASE",
+    build="make -j $NPROC && make install",
+    artifacts=["lib/libexif.a"],
+    fuzz_targets="""
+        for file in fuzz/*.cc; do
+            $CXX $CXXFLAGS -std=c++11 -I"$BASE/include" $file -o $OUT/$(basename -s .cc $file) \\
+                $LIB_FUZZING_ENGINE "$BASE/lib/libexif.a"
+        done
+    """,
+)
+recipes["liblouis"] = BuildRecipe(
+    "https://github.com/liblouis/liblouis",
+    "e09c11b35b78fdf1a5c378180699e107b47c19d2",
+    packages=["make", "autoconf", "automake", "libtool", "pkg-config", "zlib1g-dev", "libpci-dev"],
+    setup="./autogen.sh",
+    configure="",
+    fuzz_targets="""
+        cd tests/fuzzing
+        find ../.. -name "*.o" -exec ar rcs fuzz_lib.a {} \\;
+        for fuzzer in fuzz_translate_generic fuzz_backtranslate; do
+            $CC $CFLAGS -c $fuzzer.c -o $fuzzer.o -I$BASE/liblouis -I$BASE/liblouis/liblouis
+            $CXX $CXXFLAGS $FUZZER_OBJ $fuzzer.o -o $OUT/$fuzzer fuzz_lib.a
+        done
+    """,
+)
+recipes["libmpeg2"] = BuildRecipe(
+    "https://github.com/ittiam-systems/libmpeg2.git",
+    "c8de54c9d18322dad5fe816c36f8500ec93f527d",
+    build_dir="build",
+    cmake="$BASE",
+    build="make -j $NPROC VERBOSE=1",
+    artifacts=["libmpeg2dec.a"],
+    fuzz_targets="""
+        $CXX $CFLAGS -std=c++11 -I. -I../ -I../common \\
+            -I../decoder -Wl,--start-group ../fuzzer/mpeg2_dec_fuzzer.cpp \\
+            -o $OUT/mpeg2_dec_fuzzer ./libmpeg2dec.a $LIB_FUZZING_ENGINE -Wl,--end-group \\
+            -lpthread
+    """,
+)
+recipes["libpcap"] = BuildRecipe(
+    "https://github.com/the-tcpdump-group/libpcap.git",
+    "9de890f43c722af79848d532c1a38b035f578e2d",
+    packages=["make", "cmake", "flex", "bison"],
+    build_dir="build",
+    cmake="..",
+    artifacts=["libpcap.a"],
+    fuzz_targets="""
+        for target in pcap filter both; do
+            $CC $CFLAGS -I.. -c ../testprogs/fuzz/fuzz_$target.c -o fuzz_$target.o
+            $CXX $CXXFLAGS $FUZZER_OBJ fuzz_$target.o -o $OUT/fuzz_$target libpcap.a -ldbus-1
+        done
+    """,
+)
+recipes["libpng"] = BuildRecipe(
+    "https://github.com/pnggroup/libpng.git",
+    "f8e5fa92b0e37ab597616f554bee254157998227",
+    packages=["make", "autoconf", "automake", "libtool", "zlib1g-dev"],
+    # taken from libpng/contrib/oss-fuzz/build.sh: disable logging via library build configuration control
+    setup="""
+        sed -e "s/option STDIO/option STDIO disabled/" \\
+            -e "s/option WARNING /option WARNING disabled/" \\
+            -e "s/option WRITE enables WRITE_INT_FUNCTIONS/option WRITE disabled/" \\
+            scripts/pnglibconf.dfa > scripts/pnglibconf.dfa.temp
+        mv scripts/pnglibconf.dfa.temp scripts/pnglibconf.dfa
+        autoreconf -f -i
+    """,
+    configure="",
+    build="make -j $NPROC libpng16.la",
+    artifacts=[".libs/libpng16.a"],
+    fuzz_targets="""
+        $CXX $CXXFLAGS -std=c++11 $FUZZER_OBJ -I. $BASE/contrib/oss-fuzz/libpng_read_fuzzer.cc \\
+            -o $OUT/libpng_read_fuzzer .libs/libpng16.a -lz
+    """,
+)
+recipes["libssh"] = BuildRecipe(
+    "https://git.libssh.org/projects/libssh.git",
+    "48d474f78c5f68471bf412a7dbf508ef52f7766",
+    setup="cp $REPO/misc/libssh.patch . && git apply libssh.patch",
+    cflags="-lpthread",
+    build_dir="build",
+    cmake="""
+        -DCMAKE_C_COMPILER="$CC" -DCMAKE_CXX_COMPILER="$CXX" \\
+        -DCMAKE_C_FLAGS="$CFLAGS" -DCMAKE_CXX_FLAGS="$CXXFLAGS" \\
+        -DBUILD_SHARED_LIBS=OFF -DWITH_INSECURE_NONE=ON -DWITH_EXEC=OFF \\
+        $BASE
+    """,
+    artifacts=["src/libssh.a"],
+    fuzz_targets="""
+        for file in $BASE/tests/fuzz/*_fuzzer.c; do
+            fuzzerName=$(basename $file .c)
+            $CC $CFLAGS -I$BASE/include/ -I$BASE/src/ -I./ -I./include/ -c $file
+            $CXX $CFLAGS $CXXFLAGS $fuzzerName.o -o "$OUT/$fuzzerName" \\
+                $LIB_FUZZING_ENGINE ./src/libssh.a -Wl,-Bstatic -lcrypto -lz -Wl,-Bdynamic -ldl
+        done
+    """,
+)
+recipes["libyaml"] = BuildRecipe(
+    "https://github.com/yaml/libyaml",
+    "f8f760f7387d2cc56a2fc7b1be313a3bf3f7f58c",
+    packages=["make", "autoconf", "automake", "libtool"],
+    setup="cp $OSS_FUZZ/*.h $OSS_FUZZ/*_fuzzer.c . && ./bootstrap",
+    configure="",
+    artifacts=["src/.libs/libyaml.a"],
+    fuzz_targets="""
+        for fuzzer in $BASE/*_fuzzer.c; do
+            fuzzer_basename=$(basename -s .c $fuzzer)
+            $CC $CFLAGS -I $BASE -Iinclude -c $fuzzer -o $fuzzer_basename.o
+            $CXX $CXXFLAGS -std=c++11 $fuzzer_basename.o $FUZZER_OBJ -o $OUT/$fuzzer_basename src/.libs/libyaml.a
+        done
+    """,
+)
+recipes["lighttpd"] = BuildRecipe(
+    "https://github.com/lighttpd/lighttpd1.4",
+    "b41e5220f7bc9ce558d8436dabccf0f86d3a6034",
+    setup="cp $OSS_FUZZ/fuzz_* . && ./autogen.sh",
+    configure="--without-pcre --enable-static",
+    fuzz_targets="""
+        $CC $CFLAGS -c fuzz_burl.c -Isrc/ -I.
+        $CXX $CXXFLAGS $LIB_FUZZING_ENGINE fuzz_burl.o src/lighttpd-burl.o \\
+            src/lighttpd-buffer.o src/lighttpd-base64.o src/lighttpd-ck.o \\
+            -o $OUT/fuzz_burl
+    """,
+)
+recipes["wasm3"] = BuildRecipe(
+    "https://github.com/wasm3/wasm3",
+    "772f8f4648fcba75f77f894a6050db121e7651a2",
+    packages=["make"],
+    build_dir="build",
+    cmake="-DCMAKE_BUILD_TYPE= -DBUILD_WASI=none $BASE",
+    artifacts=["source/libm3.a"],
+    fuzz_targets="""
+        $CC $CFLAGS -c $BASE/platforms/app_fuzz/fuzzer.c -o fuzzer.o -I$BASE/source
+        $CXX $CXXFLAGS -o $OUT/fuzzer fuzzer.o $FUZZER_OBJ $BASE/build/source/libm3.a
+    """,
+)
+recipes["zlib"] = BuildRecipe(
+    "https://github.com/madler/zlib.git",
+    "09155ea",  # 1.3 from github
+    packages=["make", "autoconf", "automake", "libtool"],
+    setup="cp $OSS_FUZZ/*_fuzzer.cc $OSS_FUZZ/*_fuzzer.c .",
+    # not an autoconf script, the checks are not cached
+    build="""
+        ./configure
+        make -j $NPROC clean
+        make -j $NPROC all
+        make -j $NPROC check
+    """,
+    artifacts=["libz.a"],
+    fuzz_targets="""
+        for f in ./*_fuzzer.cc; do
+            $CXX $CXXFLAGS -std=c++11 -I. $f -o $OUT/$(basename -s .cc $f) $LIB_FUZZING_ENGINE ./libz.a
+        done
+        for f in ./*_fuzzer.c; do
+            b=$(basename -s .c $f)
+            $CC $CFLAGS -I. $f -c -o $b.o
+            $CXX $CXXFLAGS -o $OUT/$b $b.o $LIB_FUZZING_ENGINE ./libz.a
+            rm -f $b.o
+        done
+    """,
+)
+recipes["zydis"] = BuildRecipe(
+    "https://github.com/zyantific/zydis.git",
+    "a6d0c713b71b5009634868389f0ff551871273d6",
+    packages=["make"],
+    clone_args=["--recursive"],
+    build_dir="build",
+    cmake="""
+        -DZYAN_FORCE_ASSERTS=ON -DZYDIS_BUILD_EXAMPLES=OFF -DZYDIS_BUILD_TOOLS=OFF -DCMAKE_BUILD_TYPE= \\
+        "-DCMAKE_C_COMPILER=${CC}" "-DCMAKE_CXX_COMPILER=${CXX}" \\
+        "-DCMAKE_C_FLAGS=${CFLAGS}" "-DCMAKE_CXX_FLAGS=${CXXFLAGS}" \\
+        $BASE
+    """,
+    build="make -j $NPROC VERBOSE=1",
+    artifacts=["libZydis.a"],
+    fuzz_targets="""
+        for fuzzer in ZydisFuzzDecoder ZydisFuzzEncoder ZydisFuzzReEncoding; do
+            $CC $CFLAGS -c ../tools/${fuzzer}.c ../tools/ZydisFuzzShared.c -DZYDIS_LIBFUZZER \\
+                -I . -I ./zycore -I ../include -I ../dependencies/zycore/include
+            $CXX $CXXFLAGS "$fuzzer.o" ZydisFuzzShared.o $FUZZER_OBJ -o "${OUT}/${fuzzer}" ./libZydis.a
+        done
+    """,
+)
+
+
 # function to blacklist files that are making our static analyzer crash
 def blacklisted(source_name, project_dir):
     if "liblouis" in project_dir:
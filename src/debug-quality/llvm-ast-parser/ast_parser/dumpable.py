@@ -1,9 +1,13 @@
 from __future__ import annotations
 from pathlib import Path
+import os
 import pickle
 
 
 class Dumpable:
     def dump(self, fout: Path) -> None:
-        with open(fout, "wb") as f:
+        # write and rename, so that concurrent jobs never load a partial pickle
+        tmp = f"{fout}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
             pickle.dump(self, f)
+        os.replace(tmp, fout)
@@ -8,11 +8,32 @@ from statistics import geometric_mean as mean
 import sys
 
 sys.path.append(str(Path(__file__).resolve().parent / ".."))
-from utils import log
+from utils import log, telemetry
 from config import projects
 
 
-def compute_availability(project_dir, project, compiler, project_stats):
+def load_polished_traces(project_dir, project, compiler):
+    """Return the polished traces of every fuzz target of the project.
+
+    Args:
+        project_dir (Path): path to project targets directory
+        project (str): project name
+        compiler (str): compiler used to build target
+
+    Returns:
+        dict: key = fuzz target, value = polished traces
+    """
+    polished = {}
+    for fuzz_target in projects[compiler.split("-")[0]][project]:
+        filepath = project_dir / f"traces-polished-{fuzz_target}.json"
+        if not filepath.is_file():
+            continue
+        with open(filepath) as f:
+            polished[fuzz_target] = json.load(f)
+    return polished
+
+
+def compute_availability(polished, project, project_stats):
     global computed_lines_next
     computed_lines_next = {}
 
@@ -25,13 +46,8 @@ def compute_availability(project_dir, project, compiler, project_stats):
     project_lines_standard = {}
     project_lines_singles = {}
 
-    for fuzz_target in projects[compiler.split("-")[0]][project]:
+    for fuzz_target, categorized_total in polished.items():
         log.info(f"Computing availability of variables for target {project}-{fuzz_target}")
-        filepath = project_dir / f"traces-polished-{fuzz_target}.json"
-        if not filepath.is_file():
-            continue
-
-        categorized_total = json.load(open(filepath))
         categorized = categorized_total["vars"]
         categorized_lines = categorized_total["lines"]
 
@@ -181,20 +197,15 @@ def compute_availability(project_dir, project, compiler, project_stats):
             )
 
 
-def compute_line_coverage(project_dir, project, compiler, project_stats):
+def compute_line_coverage(polished, project, project_stats):
     key = "line-coverage"
     project_stats[key] = {}
 
     project_lines_standard = {}
     project_lines_singles = {}
 
-    for fuzz_target in projects[compiler.split("-")[0]][project]:
+    for fuzz_target, categorized_total in polished.items():
         log.info(f"Computing line coverage for target {project}-{fuzz_target}")
-        filepath = project_dir / f"traces-polished-{fuzz_target}.json"
-        if not filepath.is_file():
-            continue
-
-        categorized_total = json.load(open(filepath))
         categorized = categorized_total["lines"]
 
         for opt_level in categorized:
@@ -229,29 +240,45 @@ def compute_line_coverage(project_dir, project, compiler, project_stats):
             project_stats[key][f"{opt_level}{disabled_opt}"] = value
 
 
-def main(args):
-    log.info(f"[project:{args.project}] Debuggability computation: STARTING.")
+def run(project, compiler, cc_version, targets):
+    """Compute the debuggability metrics of a project and store them in metrics.json.
 
-    compiler = args.compiler if not args.cc_version else f"{args.compiler}-{args.cc_version}"
-    project_dir = args.targets / args.project / compiler
-    metrics_file = args.targets / args.project / compiler / "metrics.json"
+    Args:
+        project (str): project name
+        compiler (str): compiler used to build target
+        cc_version (str): compiler version
+        targets (Path): path to targets directory
+    """
+    log.info(f"[project:{project}] Debuggability computation: STARTING.")
+
+    if project not in projects[compiler]:
+        log.info(f"[Init] Error: project{project} not found.")
+        exit(1)
+
+    compiler = compiler if not cc_version else f"{compiler}-{cc_version}"
+    project_dir = targets / project / compiler
+    metrics_file = targets / project / compiler / "metrics.json"
 
     if not project_dir.is_dir():
         log.info(f"[Init] Error: project directory {project_dir.as_posix()} not found.")
         exit(1)
 
-    if args.project not in projects[args.compiler]:
-        log.info(f"[Init] Error: project{args.project} not found.")
-        exit(1)
+    with telemetry.span(project, "metrics") as counters:
+        polished = load_polished_traces(project_dir, project, compiler)
 
-    project_stats = {}
-    compute_availability(project_dir, args.project, compiler, project_stats)
-    compute_line_coverage(project_dir, args.project, compiler, project_stats)
+        project_stats = {}
+        compute_availability(polished, project, project_stats)
+        compute_line_coverage(polished, project, project_stats)
+        counters["fuzz_targets"] = len(polished)
 
     with open(metrics_file, "w") as f:
         json.dump(project_stats, f)
 
-    log.info(f"[project:{args.project}] Debuggability computation: COMPLETED.")
+    log.info(f"[project:{project}] Debuggability computation: COMPLETED.")
+
+
+def main(args):
+    run(args.project, args.compiler, args.cc_version, args.targets)
 
 
 if __name__ == "__main__":
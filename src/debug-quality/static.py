@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 
+import hashlib
 import json
-import os
 import re
 from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
 from pathlib import Path
@@ -14,7 +14,7 @@ import ast_parser as ap
 import llvm_ast_parser as llvm_ap
 
 sys.path.append(str(Path(__file__).resolve().parent / ".."))
-from utils import log
+from utils import log, telemetry
 from config import ast_config, blacklisted
 
 
@@ -92,17 +92,22 @@ def polish_traces(traces, compiler, config, pickle_dir: Path, project_dir: Path)
                     log.debug(f"Source filename: {source}")
                     source_code[source] = remove_strings_and_comments(source_code[source]).splitlines()
 
-                    ast_pickle = pickle_dir / f"{source_filepath.name}.pickle"
-                    if not ast_pickle.exists():
-                        source_ast = llvm_ap.parse_ast(
-                            source_filepath,
-                            project_dir,
-                            ast_pickle,
-                            config.include,
-                            config.preproc,
-                        )
-                    else:
-                        source_ast = ap.ast.AST.load(ast_pickle.as_posix())
+                    # The pickle is keyed by the source content and the parser configuration,
+                    # so that stale ASTs are never loaded after the source or the config change
+                    ast_key = hashlib.sha256(source_filepath.read_bytes())
+                    ast_key.update(repr((config.include, config.preproc)).encode())
+                    ast_pickle = pickle_dir / f"{source_filepath.name}-{ast_key.hexdigest()[:16]}.pickle"
+                    with telemetry.span(source_filepath.name, "ast", cached=ast_pickle.exists()):
+                        if not ast_pickle.exists():
+                            source_ast = llvm_ap.parse_ast(
+                                source_filepath,
+                                project_dir,
+                                ast_pickle,
+                                config.include,
+                                config.preproc,
+                            )
+                        else:
+                            source_ast = ap.ast.AST.load(ast_pickle.as_posix())
 
                     if source_ast is None:
                         continue
@@ -221,21 +226,30 @@ def search_file(filename, search_path):
     return file_path, count
 
 
-def main(args):
-    log.info(f"[project:{args.project}, fuzz-target:{args.fuzz_target}] Polishing traces: STARTING.")
+def run(project, fuzz_target, compiler, cc_version, targets, projects):
+    """Polish the debug traces of a fuzz target and store them in traces-polished-<fuzz_target>.json.
+
+    Args:
+        project (str): project name
+        fuzz_target (str): fuzz target name
+        compiler (str): compiler used to build target
+        cc_version (str): compiler version
+        targets (Path): path to targets directory
+        projects (Path): path to projects directory
+    """
+    log.info(f"[project:{project}, fuzz-target:{fuzz_target}] Polishing traces: STARTING.")
 
     # Get compiler version and initialize debugger
-    compiler = args.compiler if not args.cc_version else f"{args.compiler}-{args.cc_version}"
+    compiler = compiler if not cc_version else f"{compiler}-{cc_version}"
 
     # Initialize paths and perform the initial checks
-    project_dir = args.projects / args.project
-    traces_json = args.targets / args.project / compiler / f"traces-{args.fuzz_target}.json"
-    pickle_dir = args.targets / args.project / "pickles"
+    project_dir = projects / project
+    traces_json = targets / project / compiler / f"traces-{fuzz_target}.json"
+    pickle_dir = targets / project / "pickles"
 
-    if not pickle_dir.exists():
-        os.mkdir(pickle_dir)
+    pickle_dir.mkdir(exist_ok=True)
 
-    traces_polished_json = args.targets / args.project / compiler / f"traces-polished-{args.fuzz_target}.json"
+    traces_polished_json = targets / project / compiler / f"traces-polished-{fuzz_target}.json"
 
     if not project_dir.is_dir():
         log.info(f"[Init] Error: project directory {project_dir.as_posix()} not found.")
@@ -249,11 +263,17 @@ def main(args):
         traces = json.load(f)
 
     # For each opt pass, check which variables are optimized
-    traces_polished = polish_traces(traces, compiler, ast_config[args.project], pickle_dir, project_dir)
+    with telemetry.span(f"{project}/{fuzz_target}", "polish") as counters:
+        traces_polished = polish_traces(traces, compiler, ast_config[project], pickle_dir, project_dir)
+        counters["configs"] = sum(len(t) - 1 for t in traces_polished["lines"].values())
     with open(traces_polished_json, "w") as f:
         json.dump(traces_polished, f)
 
-    log.info(f"[project:{args.project}, fuzz-target:{args.fuzz_target}] Polishing traces: COMPLETED.")
+    log.info(f"[project:{project}, fuzz-target:{fuzz_target}] Polishing traces: COMPLETED.")
+
+
+def main(args):
+    run(args.project, args.fuzz_target, args.compiler, args.cc_version, args.targets, args.projects)
 
 
 if __name__ == "__main__":
@@ -6,13 +6,17 @@ import re
 from pathlib import Path
 from time import perf_counter
 from elftools.elf.elffile import ELFFile
-from multiprocessing import Pool
 from subprocess import *
 from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
 import sys
 
 sys.path.append(str(Path(__file__).resolve().parent / ".."))
-from utils import log, tracer
+from utils import equivalence, log, tracer
+from utils.cache import file_digest
+from utils.checkpoint import Checkpoint
+from utils.corpus import extracted, input_digests
+from utils.jobqueue import JobQueue
+from utils.memory import MemoryPool
 
 
 def get_inputs(input_dir):
@@ -106,21 +110,23 @@ def merge_functions(traces):
     return output
 
 
-def compute_single_trace(binary_filepath, opt_level, disabled_opt, compiler, inputs):
+def compute_single_trace(binary_filepath, opt_level, disabled_opt, compiler, inputs, mode=None):
     # Initialize debugger
     dbg = ["gdb", "lldb"]["clang" in compiler]
 
     log.info(f"[-O{opt_level} {disabled_opt}] Debug traces computation: STARTING")
 
     input_paths = " ".join(map(lambda x: str(x), inputs))
-    variables, functions = tracer.get_variables(binary_filepath, input_paths, dbg)
+    variables, functions = tracer.get_variables(binary_filepath, input_paths, dbg, mode=mode)
 
     log.info(f"[-O{opt_level} {disabled_opt}] Debug traces computation: COMPLETED")
 
     return variables, functions
 
 
-def compute_traces(target_info, target_dir, compiler, inputs, target, proc):
+def compute_traces(
+    target_info, target_dir, compiler, inputs, target, proc, checkpoint=None, resume=False, queue=None, mem_budget=0
+):
     """Compute traces and remove inconsistencies. Traces are stored in target_info.
 
     Args:
@@ -129,12 +135,42 @@ def compute_traces(target_info, target_dir, compiler, inputs, target, proc):
         compiler (str): compiler used to build target
         inputs (set): input filepaths
         target (str): target binary filename
+        checkpoint (Checkpoint): if set, the result of each debugger session is saved as soon as it completes
+        resume (bool): restore the sessions saved by an interrupted run
+        queue (Path): if set, the debugger sessions that can run in parallel are submitted to the
+            shared job queue in this directory (run by debugtuner.py worker) instead of a local pool
+        mem_budget (int): memory budget (MiB) of the local debugger sessions, 0 to use only the available memory
     """
 
     traces = {}
+    target_key = (target_dir / target).as_posix()
+    # Hashes and duplicate binaries found by the build stage
+    index = equivalence.load(target_dir)
+    processed = {}
+    aliases = {}
+
+    def save_session(config, binary_hash):
+        def save(result):
+            if checkpoint is not None:
+                checkpoint.save_session(target_key, config, binary_hash, target_info["inputs_hash"], *result)
+
+        return save
 
     # Iterate over target_dir to load one binary per time
-    pool = Pool(processes=proc)
+    # Local sessions are started only if their peak RSS (measured in previous runs) fits in memory
+    if queue is None:
+        pool = MemoryPool(proc, mem_budget * 1024, target_dir / f"peak-rss-{target}.json")
+    else:
+        pool = JobQueue(queue)
+    parallel = proc > 1 or queue is not None
+    # the breakpoint mode of this run is sent with every session, queue workers do not read it from their environment
+    mode = tracer.breakpoint_mode()
+
+    def compute_session(binary_filepath, opt_level, disabled_opt, key):
+        args = (binary_filepath, opt_level, disabled_opt, compiler, inputs, mode)
+        if queue is None:
+            return pool.apply(compute_single_trace, args, key=key)
+        return compute_single_trace(*args)
 
     for binary_dir in sorted(target_dir.iterdir(), key=sort_by_priority):
 
@@ -144,9 +180,10 @@ def compute_traces(target_info, target_dir, compiler, inputs, target, proc):
         else:
             continue
 
-        # Check if binary exists
+        # Check if binary exists (binaries pruned by the build stage are duplicates of another configuration)
         binary_filepath = binary_dir / target
-        if not binary_filepath.is_file():
+        entry = equivalence.lookup(index, target, binary_dir.name, binary_filepath)
+        if not binary_filepath.is_file() and entry is None:
             log.info(f"Error: binary {binary_filepath} not found.")
             continue
 
@@ -158,7 +195,7 @@ def compute_traces(target_info, target_dir, compiler, inputs, target, proc):
             target_info["traces"][compiler][opt_level][disabled_opt]["functions"] = {}
 
         # Compute .text hash and skip debug traces if equal to standard .text
-        text_section_hash = get_text_section_hash(binary_filepath)
+        text_section_hash = entry["text"] if entry is not None else get_text_section_hash(binary_filepath)
         target_info["traces"][compiler][opt_level][disabled_opt][".text_hash"] = text_section_hash
         if (
             "-O0-all" not in binary_dir.name
@@ -169,41 +206,83 @@ def compute_traces(target_info, target_dir, compiler, inputs, target, proc):
             target_info["traces"][compiler][opt_level][disabled_opt]["variables"] = "standard"
             continue
 
-        # Check if main debug trace for current binary has already been computed
-        if "main" in target_info["traces"][compiler][opt_level][disabled_opt]["variables"]:
+        # Binaries identical (.text and debug sections) to a configuration already processed share its trace
+        binary_hash = entry["sha256"] if entry is not None else file_digest(binary_filepath)
+        trace = target_info["traces"][compiler][opt_level][disabled_opt]
+        if entry is not None and entry["class"] != binary_dir.name and entry["class"] in processed:
+            log.info(f"[-O{opt_level}{disabled_opt}] skipped: same binary as {entry['class']}")
+            aliases[(opt_level, disabled_opt)] = processed[entry["class"]]
+            trace["binary_hash"] = binary_hash
+            continue
+        if not binary_filepath.is_file():
+            log.info(f"Error: binary {binary_filepath} not found.")
+            continue
+        processed[binary_dir.name] = (opt_level, disabled_opt)
+
+        # Check if main debug trace for current binary has already been computed (and the binary did not change)
+        if trace.get("binary_hash") == binary_hash and "main" in trace["variables"]:
             log.info(f"[-O{opt_level}{disabled_opt}] Main trace already computed")
             continue
+        if trace["variables"] == "standard":
+            trace["variables"] = {}
+        trace["variables"].pop("main", None)
+        trace.setdefault("functions", {})
+        trace["binary_hash"] = binary_hash
+
+        # Check if the debugger session was completed by an interrupted run
+        if checkpoint is not None and resume:
+            session = checkpoint.load_session(target_key, binary_dir.name, binary_hash, target_info["inputs_hash"])
+            if session is not None:
+                log.info(f"[-O{opt_level}{disabled_opt}] Main trace restored from checkpoint")
+                trace["variables"]["main"], trace["functions"]["main"] = session
+                continue
+        save = save_session(binary_dir.name, binary_hash)
 
         # All -all and -standard binaries must be computed separately so that hashes are ready when needed
         # TODO: this can also be done in parallel ideally, maybe in another pool? Or busy waiting
         if "-all" in binary_dir.name or "-standard" in binary_dir.name:
+            result = compute_session(binary_filepath, opt_level, disabled_opt, binary_dir.name)
+            save(result)
             (
                 target_info["traces"][compiler][opt_level][disabled_opt]["variables"]["main"],
                 target_info["traces"][compiler][opt_level][disabled_opt]["functions"]["main"],
-            ) = compute_single_trace(binary_filepath, opt_level, disabled_opt, compiler, inputs)
+            ) = result
         # All the binaries with disabled opt can be computed in parallel
         else:
-            if proc > 1:
+            if parallel:
                 traces[(opt_level, disabled_opt)] = pool.apply_async(
                     func=compute_single_trace,
-                    args=(binary_filepath, opt_level, disabled_opt, compiler, inputs),
+                    args=(binary_filepath, opt_level, disabled_opt, compiler, inputs, mode),
+                    callback=save,
+                    key=binary_dir.name,
                 )
             else:
+                result = compute_session(binary_filepath, opt_level, disabled_opt, binary_dir.name)
+                save(result)
                 (
                     target_info["traces"][compiler][opt_level][disabled_opt]["variables"]["main"],
                     target_info["traces"][compiler][opt_level][disabled_opt]["functions"]["main"],
-                ) = compute_single_trace(binary_filepath, opt_level, disabled_opt, compiler, inputs)
+                ) = result
 
     pool.close()
     pool.join()
 
-    if proc > 1:
+    if parallel:
         for (opt_level, disabled_opt), trace in traces.items():
             (
                 target_info["traces"][compiler][opt_level][disabled_opt]["variables"]["main"],
                 target_info["traces"][compiler][opt_level][disabled_opt]["functions"]["main"],
             ) = trace.get()
 
+    for (opt_level, disabled_opt), (source_level, source_opt) in aliases.items():
+        source = target_info["traces"][compiler][source_level][source_opt]
+        trace = target_info["traces"][compiler][opt_level][disabled_opt]
+        if trace["variables"] == "standard":
+            trace["variables"] = {}
+        trace["variables"]["main"] = source["variables"]["main"]
+        if "main" in source.get("functions", {}):
+            trace.setdefault("functions", {})["main"] = source["functions"]["main"]
+
     # Merge functions
     if not "merged" in target_info["functions"]:
         target_info["functions"]["merged"] = merge_functions(target_info["traces"][compiler])
@@ -213,20 +292,34 @@ def compute_traces(target_info, target_dir, compiler, inputs, target, proc):
                 del target_info["traces"][compiler][opt_level][disabled_opt]["functions"]
 
 
-def main(args):
-    log.info(f"[project:{args.project}, fuzz-target:{args.fuzz_target}] Debug traces: INITIALIZING.")
+def run(project, fuzz_target, compiler, cc_version, targets, corpus, proc=1, resume=False, queue=None, mem_budget=0):
+    """Compute the debug traces of a fuzz target and store them in traces-<fuzz_target>.json.
+
+    Args:
+        project (str): project name
+        fuzz_target (str): fuzz target name
+        compiler (str): compiler used to build target
+        cc_version (str): compiler version
+        targets (Path): path to targets directory
+        corpus (Path): path to the (minimized) corpus directory or archive
+        proc (int): number of processes
+        resume (bool): restore the debugger sessions completed by an interrupted run
+        queue (Path): shared job queue directory, None to run the debugger sessions locally
+        mem_budget (int): memory budget (MiB) of the debugger sessions, 0 to use only the available memory
+    """
+    log.info(f"[project:{project}, fuzz-target:{fuzz_target}] Debug traces: INITIALIZING.")
 
     # Get compiler version
-    compiler = args.compiler if not args.cc_version else f"{args.compiler}-{args.cc_version}"
+    compiler = compiler if not cc_version else f"{compiler}-{cc_version}"
 
     # Check if targets/project/compiler/ exists
-    target_dir = args.targets / args.project / compiler
+    target_dir = targets / project / compiler
     if not target_dir.is_dir():
         log.info(f"Error: target directory {target_dir.as_posix()} not found.")
         exit(1)
 
     # Load target json (if exists)
-    target_json = target_dir / f"traces-{args.fuzz_target}.json"
+    target_json = target_dir / f"traces-{fuzz_target}.json"
     if target_json.is_file():
         log.info(f"Found {target_json}. Reading traces...")
         with open(target_json, "r") as f:
@@ -241,21 +334,57 @@ def main(args):
     if compiler not in target_info["traces"]:
         target_info["traces"][compiler] = {}
 
-    # Get inputs from corpus/project/fuzz-target directory
-    inputs = get_inputs(args.corpus / args.project / args.fuzz_target)
-    log.info(f"Found {len(inputs)} inputs to be injected.")
-    if len(inputs) == 0:
+    # Get inputs from corpus/project/fuzz-target (directory or archive, see utils/corpus.py)
+    digests = input_digests(corpus, project, fuzz_target)
+    log.info(f"Found {len(digests)} inputs to be injected.")
+    if len(digests) == 0:
         exit(1)
-    target_info["inputs"] = len(inputs)
 
-    # Compute traces (removing inconsistencies)
-    compute_traces(target_info, target_dir, compiler, inputs, args.fuzz_target, args.proc)
+    # Traces computed on a different set of inputs cannot be reused
+    inputs_hash = hashlib.sha256("".join(sorted(digests.values())).encode()).hexdigest()
+    if target_info.get("inputs_hash") != inputs_hash:
+        if target_info["traces"][compiler]:
+            log.info("Inputs changed. Computing all traces again...")
+        target_info["traces"] = {compiler: {}}
+        target_info["functions"] = {}
+    target_info["inputs"] = len(digests)
+    target_info["inputs_hash"] = inputs_hash
+
+    # Debugger sessions are saved in the checkpoint database until the traces json is written
+    checkpoint = Checkpoint(targets / "checkpoint.db")
+    target_key = (target_dir / fuzz_target).as_posix()
+    if not resume:
+        checkpoint.clear_sessions(target_key)
+
+    # Compute traces (removing inconsistencies). The inputs of archives are extracted only for the debugger
+    # sessions, in the job queue directory if the sessions run on other hosts
+    with extracted(corpus, project, fuzz_target, queue / "inputs" if queue is not None else None) as corpus_dir:
+        inputs = get_inputs(corpus_dir / project / fuzz_target)
+        compute_traces(target_info, target_dir, compiler, inputs, fuzz_target, proc, checkpoint, resume, queue, mem_budget)
 
     # Write traces in json
-    with open(target_json, "w") as f:
+    tmp_json = target_json.with_suffix(".json.tmp")
+    with open(tmp_json, "w") as f:
         json.dump(target_info, f)
+    tmp_json.replace(target_json)
+    checkpoint.clear_sessions(target_key)
+
+    log.info(f"[project:{project}, fuzz-target:{fuzz_target}] Debug traces: TERMINATED.")
 
-    log.info(f"[project:{args.project}, fuzz-target:{args.fuzz_target}] Debug traces: TERMINATED.")
+
+def main(args):
+    run(
+        args.project,
+        args.fuzz_target,
+        args.compiler,
+        args.cc_version,
+        args.targets,
+        args.corpus,
+        args.proc,
+        args.resume,
+        args.queue,
+        args.mem_budget,
+    )
 
 
 if __name__ == "__main__":
@@ -273,6 +402,27 @@ if __name__ == "__main__":
         default=Path(__file__).parent.resolve() / ".." / "dt-targets",
     )
     parser.add_argument("--proc", dest="proc", type=int, help="Number of processes to use", default=1)
+    parser.add_argument(
+        "--mem-budget",
+        dest="mem_budget",
+        type=int,
+        help="Memory budget (MiB) of the debugger sessions, 0 to use only the available memory",
+        default=0,
+    )
+    parser.add_argument(
+        "--queue",
+        dest="queue",
+        type=Path,
+        help="Shared job queue directory: debugger sessions are run by debugtuner.py worker processes",
+        default=None,
+    )
+    parser.add_argument(
+        "--resume",
+        dest="resume",
+        action="store_true",
+        help="Restore the debugger sessions completed by an interrupted run",
+        default=False,
+    )
     parser.add_argument(
         "--compiler",
         dest="compiler",
@@ -299,7 +449,7 @@ if __name__ == "__main__":
         "--corpus",
         dest="corpus",
         type=Path,
-        help="Path to the corpus directory",
+        help="Path to the corpus directory or archive (e.g. eval-dataset/dt-corpus-min.tar.gz)",
         default=Path(__file__).parent.resolve() / ".." / "dt-corpus-min",
     )
     parser.add_argument("--fuzz-target", dest="fuzz_target", type=str, help="Fuzz target", required=True)
@@ -1,35 +1,97 @@
 #!/usr/bin/env python3
 
 import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from time import perf_counter
 from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
 from pathlib import Path
 from datetime import datetime
 import os
+import shutil
+import sys
 
 import config
-from utils import log
+from utils import log, telemetry
+from utils.scheduler import Job, Scheduler
+from utils.cache import Manifest, tool_version
+from utils.checkpoint import Checkpoint
+from utils.corpus import is_archive
+from utils import jobqueue
 
+sys.path.append(str(Path(__file__).resolve().parent / "build-dataset"))
+sys.path.append(str(Path(__file__).resolve().parent / "debug-quality"))
+sys.path.append(str(Path(__file__).resolve().parent / "compiler-tuning"))
+import corpora
+import minimize
+import traces
+import static
+import metrics
+import rankings
+import performance
 
-def run_cmd(cmd, log_file, env=None):
+STAGE_MODULES = ["corpora", "minimize", "traces", "static", "metrics", "rankings", "performance"]
+
+
+def timestamped(log_file):
+    return Path(str(log_file).replace(".log", f"-{datetime.now().strftime('%Y%m%d-%H%M%S')}.log"))
+
+
+def run_cmd(name, cmd, log_file, env=None, log_options=None):
     log.info(" ".join(cmd))
 
-    log_file = Path(str(log_file).replace(".log", f"-{datetime.now().strftime('%Y%m%d-%H%M%S')}.log"))
+    log_file = timestamped(log_file)
 
     run_env = os.environ.copy()
     if env is not None:
         for key in env:
             run_env[key] = env[key]
 
+    # Lines are written as they arrive, removing seed and date from logs
+    sink = log.LogSink(log_file, strip_prefix=True, **(log_options or {}))
     start = perf_counter()
-    with open(log_file, "w") as f:
-        result = subprocess.run(cmd, stderr=subprocess.STDOUT, stdout=f, env=run_env)
+    try:
+        result = telemetry.run_cmd(name, "job", cmd, on_line=sink.write, stderr=subprocess.STDOUT, env=run_env)
+    finally:
+        sink.close()
     end = perf_counter()
     log.info(f"{end - start} seconds")
     result.check_returncode()
 
-    # Remove seed and date from logs
-    subprocess.run(["sed", "-i", "s/\[[^]]*\] //", log_file])
+
+def stage_worker(name, func, kwargs, log_file, debug, log_options):
+    """Run a stage function inside a pipeline worker, logging to log_file."""
+    with log.to_file(log_file, debug, **log_options), telemetry.span(name, "job"):
+        try:
+            func(**kwargs)
+        except SystemExit as e:
+            # stages exit on errors when run as scripts
+            if e.code not in (None, 0):
+                raise RuntimeError(f"{func.__module__} exited with code {e.code}") from None
+
+
+def run_stage(name, executor, func, kwargs, log_file, debug, log_options):
+    log.info(f"{func.__module__}.{func.__name__}({', '.join(f'{k}={v}' for k, v in kwargs.items())})")
+
+    start = perf_counter()
+    executor.submit(stage_worker, name, func, kwargs, timestamped(log_file), debug, log_options).result()
+    end = perf_counter()
+    log.info(f"{end - start} seconds")
+
+
+STAGES = [
+    "screen",
+    "build",
+    "build-afl",
+    "build-sancov",
+    "corpora",
+    "minimize",
+    "traces",
+    "static",
+    "metrics",
+    "rankings",
+    "performance",
+]
 
 
 def main(args):
@@ -50,218 +112,514 @@ def main(args):
     if compiler == "clang" and "g" in full_opts:
         full_opts = full_opts.replace(":g", "")
 
-    # 0. Build targets
-    if args.all_stages or "build" in args.stages:
+    # Each stage is split in jobs (one per project or per fuzz target) that are run by the scheduler
+    # as soon as the jobs they depend on are completed, e.g. the static stage of a fuzz target starts
+    # right after its traces are computed. Jobs of stages not selected are not part of the DAG.
+    job_proc = args.job_proc if args.job_proc else args.proc
+    # the screen stage builds every project once more, so --all-stages runs it only with --screen
+    stages = [s for s in STAGES if s != "screen" or args.screen] if args.all_stages else args.stages
+
+    # Jobs are skipped when the fingerprint of their inputs (binaries, corpora, tool versions,
+    # configuration entries, stage sources) matches the one recorded when they last completed
+    args.targets.mkdir(parents=True, exist_ok=True)
+    manifest = Manifest(args.targets / f"manifest-{compiler}.json")
+    if args.force:
+        manifest.jobs = {}
+
+    # The status of every job (and of every debugger session of the traces stage) is stored in the
+    # checkpoint database, so that an interrupted run can be continued with --resume
+    checkpoint = Checkpoint(args.targets / "checkpoint.db")
+    if args.resume:
+        log.info(f"Resuming from {checkpoint.path}: {checkpoint.summary()}")
+    scheduler = Scheduler(args.proc, manifest, checkpoint, args.resume)
+
+    # Resource usage of jobs, build configurations, debugger sessions, ... (see utils/telemetry.py)
+    if not telemetry.enabled():
+        telemetry.enable(args.log / f"telemetry-{compiler}.jsonl")
+    dbg = ["gdb", "lldb"]["clang" in compiler]
+
+    def inputs(*items):
+        """Return a function computing the fingerprint of items once the job is ready.
+        Callable items are evaluated lazily and may return a list of inputs."""
+
+        def fingerprint():
+            values = []
+            for item in items:
+                item = item() if callable(item) else item
+                values += item if isinstance(item, list) else [item]
+            return manifest.fingerprint(*values)
+
+        return fingerprint
+
+    # Job logs are rotated every --log-max-size MiB (if set) and optionally gzipped while they are written
+    log_options = {"max_size": args.log_max_size * 2**20, "compress": args.log_compress}
+
+    # The debugger sessions (utils/tracer.py) read the breakpoint mode from the environment, inherited by the workers;
+    # the traces stage sends it with the sessions submitted to the job queue
+    os.environ["DT_BREAKPOINTS"] = args.breakpoints
+
+    # Python stages run in long-lived workers, so modules are imported once and not for every job
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(STAGE_MODULES)
+    executor = ProcessPoolExecutor(max_workers=args.proc, mp_context=context)
+
+    def add_job(stage, name, cmd, log_file, deps=(), env=None, cpus=1, fingerprint=None, outputs=()):
+        scheduler.add(
+            Job(
+                name,
+                run_cmd,
+                args=(name, cmd, log_file, env, log_options),
+                deps=deps,
+                cpus=cpus,
+                priority=STAGES.index(stage),
+                fingerprint=fingerprint,
+                outputs=outputs,
+            )
+        )
+
+    def add_stage_job(stage, name, func, kwargs, log_file, deps=(), cpus=1, fingerprint=None, outputs=()):
+        scheduler.add(
+            Job(
+                name,
+                run_stage,
+                args=(name, executor, func, kwargs, log_file, args.debug, log_options),
+                deps=deps,
+                cpus=cpus,
+                priority=STAGES.index(stage),
+                fingerprint=fingerprint,
+                outputs=outputs,
+            )
+        )
+
+    if args.compiler_path is not None:
+        compiler_env = args.compiler_path / compiler
+        cpp_compiler_env = args.compiler_path / cpp_compiler
+    else:
+        compiler_env = compiler
+        cpp_compiler_env = cpp_compiler
+
+    # the projects are built from their recipe in config.recipes by the build engine
+    builder = base / "build-dataset" / "builder.py"
+
+    # 0. Screen the passes: build the -standard configurations through build-dataset/screen.py, recording
+    # the passes that transform each project (activity.json), so that the build skips the configurations
+    # disabling a pass that never fires. Not needed with custom configurations
+    if "screen" in stages and not args.custom:
+        for p, targets in projects.items():
+            screen_cmd = [
+                builder.as_posix(),
+                "-S",
+                "-t",
+                args.targets.as_posix(),
+                "-p",
+                p,
+                "-j",
+                str(job_proc),
+                "-o",
+                full_opts,
+            ]
+            add_job(
+                "screen",
+                f"screen-{compiler}-{p}",
+                screen_cmd,
+                args.log / f"screen-{compiler}-{p}.log",
+                env={"CC": compiler_env, "CXX": cpp_compiler_env},
+                cpus=job_proc,
+                fingerprint=inputs(
+                    builder,
+                    repr(config.recipes.get(p)),
+                    base / "build-dataset" / "screen.py",
+                    base / "misc",
+                    full_opts,
+                    str(compiler_env),
+                    lambda cc=compiler_env: tool_version(cc),
+                ),
+                outputs=[args.targets / p / compiler / "activity.json"],
+            )
+
+    # 0.25. Build targets
+    if "build" in stages:
         for p, targets in projects.items():
 
-            log.debug(f"Building {p} with {compiler}...")
             build_cmd = [
-                (base / "build-dataset" / "build.sh").as_posix(),
+                builder.as_posix(),
                 "-t",
                 args.targets.as_posix(),
                 "-p",
                 p,
                 "-j",
-                str(args.proc),
+                str(job_proc),
                 "-o",
                 full_opts,
-                "-c" if args.custom else "",
             ]
+            if args.custom:
+                build_cmd.append("-c")
+            if args.objcache:
+                build_cmd.insert(1, "-C")
+            if args.parallel_configs > 1:
+                build_cmd[1:1] = ["-P", str(args.parallel_configs)]
+            if args.prune_duplicates:
+                build_cmd.insert(1, "-D")
             log_file = args.log / f"build-{compiler}-{p}.log"
 
-            if args.compiler_path is not None:
-                compiler_env = args.compiler_path / compiler
-                cpp_compiler_env = args.compiler_path / cpp_compiler
-            else:
-                compiler_env = compiler
-                cpp_compiler_env = cpp_compiler
-
-            run_cmd(build_cmd, log_file, env={"CC": compiler_env, "CXX": cpp_compiler_env})
+            add_job(
+                "build",
+                f"build-{compiler}-{p}",
+                build_cmd,
+                log_file,
+                deps=[f"screen-{compiler}-{p}"],
+                env={"CC": compiler_env, "CXX": cpp_compiler_env},
+                cpus=job_proc,
+                fingerprint=inputs(
+                    builder,
+                    repr(config.recipes.get(p)),
+                    base / "misc",
+                    args.targets / p / compiler / "activity.json",
+                    full_opts,
+                    args.custom,
+                    str(compiler_env),
+                    lambda cc=compiler_env: tool_version(cc),
+                    str(cpp_compiler_env),
+                    lambda cxx=cpp_compiler_env: tool_version(cxx),
+                ),
+                outputs=[args.targets / p / compiler],
+            )
 
     # 0.5. Build targets with afl
-    if args.all_stages or "build-afl" in args.stages:
+    if "build-afl" in stages:
         for p, targets in projects.items():
             project_dir_afl = args.targets / p / args.afl_compiler
             if not project_dir_afl.is_dir():
                 log.debug(f"Directory {project_dir_afl} not found. Building {p} with {args.afl_compiler}...")
                 build_afl_cmd = [
-                    (base / "build-dataset" / "build.sh").as_posix(),
+                    builder.as_posix(),
                     "-t",
                     args.targets.as_posix(),
                     "-p",
                     p,
                     "-j",
-                    str(args.proc),
+                    str(job_proc),
                     "-c",
                     "-o",
                     "0",
                 ]
 
                 log_file = args.log / f"build-afl-{p}.log"
-                run_cmd(
+                # the afl build shares the project checkout with the compiler build
+                add_job(
+                    "build-afl",
+                    f"build-afl-{p}",
                     build_afl_cmd,
                     log_file,
+                    deps=[f"build-{compiler}-{p}"],
                     env={"CC": args.afl_compiler, "CXX": args.aflpp_compiler},
+                    cpus=job_proc,
+                    fingerprint=inputs(
+                        builder,
+                        repr(config.recipes.get(p)),
+                        base / "misc",
+                        lambda: tool_version(args.afl_compiler),
+                        lambda: tool_version(args.aflpp_compiler),
+                    ),
+                    outputs=[project_dir_afl],
                 )
 
-    # 1. Download corpora
-    if args.all_stages or "corpora" in args.stages:
+    # 0.75. Build targets with SanitizerCoverage (misc/sancov-cc), for the stage 0 of the minimization without AFL++.
+    # Only needed with --cmin-backend sancov, or auto if the AFL++ compiler is not available
+    sancov = args.cmin_backend == "sancov" or (args.cmin_backend == "auto" and shutil.which(args.afl_compiler) is None)
+    if "build-sancov" in stages and sancov:
+        for p, targets in projects.items():
+            build_sancov_cmd = [
+                builder.as_posix(),
+                "-t",
+                args.targets.as_posix(),
+                "-p",
+                p,
+                "-j",
+                str(job_proc),
+                "-c",
+                "-o",
+                "0",
+            ]
+            add_job(
+                "build-sancov",
+                f"build-sancov-{p}",
+                build_sancov_cmd,
+                args.log / f"build-sancov-{p}.log",
+                # the checkout is shared with the compiler and afl builds
+                deps=[f"build-{compiler}-{p}", f"build-afl-{p}"],
+                env={
+                    "CC": (base / "misc" / minimize.SANCOV_COMPILER).as_posix(),
+                    "CXX": (base / "misc" / "sancov-c++").as_posix(),
+                    "SANCOV_CC": str(compiler_env),
+                    "SANCOV_CXX": str(cpp_compiler_env),
+                },
+                cpus=job_proc,
+                fingerprint=inputs(
+                    builder,
+                    repr(config.recipes.get(p)),
+                    base / "misc",
+                    str(compiler_env),
+                    lambda cc=compiler_env: tool_version(cc),
+                ),
+                outputs=[args.targets / p / minimize.SANCOV_COMPILER],
+            )
+
+    # 1. Provision corpora from the corpus store (dt-cache/corpus), filled from --corpus-source
+    # (archive or mirror directory) or by downloading the corpora not in the store yet
+    if "corpora" in stages:
+        if args.corpus_source is not None:
+            kwargs = {"source": args.corpus_source, "proc": job_proc}
+            log_file = args.log / "corpora-import.log"
+            add_stage_job(
+                "corpora",
+                "corpora-import",
+                corpora.import_source,
+                kwargs,
+                log_file,
+                cpus=job_proc,
+                fingerprint=inputs(args.corpus_source, base / "build-dataset" / "corpora.py"),
+                outputs=[corpora.STORE / "manifests"],
+            )
         for p, targets in projects.items():
             for t in targets:
-                cmd = [
-                    "python3",
-                    (base / "build-dataset" / "corpora.py").as_posix(),
-                    "--project",
-                    p,
-                    "--fuzz-target",
-                    t,
-                ]
+                kwargs = {
+                    "project": p,
+                    "fuzz_target": t,
+                    "oss_fuzz": base / "dt-projects" / "oss-fuzz",
+                    "offline": args.offline,
+                }
                 log_file = args.log / f"corpora-{p}-{t}.log"
-                run_cmd(cmd, log_file)
+                add_stage_job("corpora", f"corpora-{p}-{t}", corpora.run, kwargs, log_file, deps=["corpora-import"])
+
+    def corpus_input(corpus, p, t):
+        # the minimized corpus can be an archive (utils/corpus.py), read without extracting it
+        return corpus if is_archive(corpus) else corpus / p / t
 
     # 2. Input minimization
-    if args.all_stages or "minimize" in args.stages:
+    if "minimize" in stages:
         for p, targets in projects.items():
             for t in targets:
-                cmd = [
-                    "python3",
-                    (base / "build-dataset" / "minimize.py").as_posix(),
-                    "--targets",
-                    args.targets.as_posix(),
-                    "--project",
-                    p,
-                    "--fuzz-target",
-                    t,
-                    "--proc",
-                    str(args.proc),
-                    "--compiler",
-                    args.compiler,
-                    "--cc-version",
-                    args.cc_version,
-                ]
-
-                if args.debug:
-                    cmd.append("--debug")
-
+                kwargs = {
+                    "project": p,
+                    "fuzz_target": t,
+                    "compiler": args.compiler,
+                    "cc_version": args.cc_version,
+                    "targets": args.targets,
+                    "corpus": base / "dt-projects" / "oss-fuzz" / "build" / "corpus",
+                    "corpus_cmin": base / "dt-corpus-cmin",
+                    "corpus_min": args.corpus_min,
+                    "afl_compiler": args.afl_compiler,
+                    "proc": job_proc,
+                    "mem_budget": args.mem_budget,
+                    "cmin_backend": args.cmin_backend,
+                }
                 log_file = args.log / f"minimize-{compiler}-{p}-{t}.log"
-                run_cmd(cmd, log_file)
+                add_stage_job(
+                    "minimize",
+                    f"minimize-{compiler}-{p}-{t}",
+                    minimize.run,
+                    kwargs,
+                    log_file,
+                    deps=[f"build-{compiler}-{p}", f"build-afl-{p}", f"build-sancov-{p}", f"corpora-{p}-{t}"],
+                    cpus=job_proc,
+                    fingerprint=inputs(
+                        kwargs["corpus"] / p / t,
+                        args.targets / p / compiler / f"{p}-O0-standard" / t,
+                        args.targets / p / args.afl_compiler / f"{p}-O0-standard" / t,
+                        args.targets / p / minimize.SANCOV_COMPILER / f"{p}-O0-standard" / t,
+                        args.cmin_backend,
+                        lambda: tool_version(dbg),
+                        base / "build-dataset" / "minimize.py",
+                        base / "utils" / "tracer.py",
+                        base / "utils" / "gdb_collector.py",
+                        base / "utils" / "lldb_collector.py",
+                        args.breakpoints,
+                    ),
+                    outputs=[corpus_input(kwargs["corpus_min"], p, t)],
+                )
 
     # 3. Debug traces computation
-    if args.all_stages or "traces" in args.stages:
+    if "traces" in stages:
         for p, targets in projects.items():
             for t in targets:
-                cmd = [
-                    "python3",
-                    (base / "debug-quality" / "traces.py").as_posix(),
-                    "--targets",
-                    args.targets.as_posix(),
-                    "--project",
-                    p,
-                    "--fuzz-target",
-                    t,
-                    "--proc",
-                    str(args.proc),
-                    "--compiler",
-                    args.compiler,
-                    "--cc-version",
-                    args.cc_version,
-                ]
-
-                if args.debug:
-                    cmd.append("--debug")
-
+                kwargs = {
+                    "project": p,
+                    "fuzz_target": t,
+                    "compiler": args.compiler,
+                    "cc_version": args.cc_version,
+                    "targets": args.targets,
+                    "corpus": args.corpus_min,
+                    "proc": job_proc,
+                    "resume": args.resume,
+                    "queue": args.queue,
+                    "mem_budget": args.mem_budget,
+                }
                 log_file = args.log / f"traces-{compiler}-{p}-{t}.log"
-                run_cmd(cmd, log_file)
+                add_stage_job(
+                    "traces",
+                    f"traces-{compiler}-{p}-{t}",
+                    traces.run,
+                    kwargs,
+                    log_file,
+                    deps=[f"build-{compiler}-{p}", f"minimize-{compiler}-{p}-{t}"],
+                    cpus=job_proc,
+                    fingerprint=inputs(
+                        lambda d=args.targets / p / compiler, t=t: sorted(d.glob(f"*/{t}")),
+                        corpus_input(kwargs["corpus"], p, t),
+                        lambda: tool_version(dbg),
+                        base / "debug-quality" / "traces.py",
+                        base / "utils" / "tracer.py",
+                        base / "utils" / "gdb_collector.py",
+                        base / "utils" / "lldb_collector.py",
+                        args.breakpoints,
+                    ),
+                    outputs=[args.targets / p / compiler / f"traces-{t}.json"],
+                )
 
     # 6. Polishing traces
-    if args.all_stages or "static" in args.stages:
+    if "static" in stages:
         for p, targets in projects.items():
             for t in targets:
-                cmd = [
-                    "python3",
-                    (base / "debug-quality" / "static.py").as_posix(),
-                    "--targets",
-                    args.targets.as_posix(),
-                    "--project",
-                    p,
-                    "--fuzz-target",
-                    t,
-                    "--compiler",
-                    args.compiler,
-                    "--cc-version",
-                    args.cc_version,
-                ]
-
-                if args.debug:
-                    cmd.append("--debug")
-
+                kwargs = {
+                    "project": p,
+                    "fuzz_target": t,
+                    "compiler": args.compiler,
+                    "cc_version": args.cc_version,
+                    "targets": args.targets,
+                    "projects": base / "dt-projects",
+                }
                 log_file = args.log / f"static-{compiler}-{p}-{t}.log"
-                run_cmd(cmd, log_file)
+                add_stage_job(
+                    "static",
+                    f"static-{compiler}-{p}-{t}",
+                    static.run,
+                    kwargs,
+                    log_file,
+                    deps=[f"traces-{compiler}-{p}-{t}"],
+                    fingerprint=inputs(
+                        args.targets / p / compiler / f"traces-{t}.json",
+                        config.ast_config[p],
+                        lambda: tool_version("clang"),
+                        base / "debug-quality" / "static.py",
+                        base / "debug-quality" / "llvm-ast-parser",
+                    ),
+                    outputs=[args.targets / p / compiler / f"traces-polished-{t}.json"],
+                )
 
     # 7. Compute debuggability metrics
-    if args.all_stages or "metrics" in args.stages:
-        for project in projects:
-            cmd = [
-                "python3",
-                (base / "debug-quality" / "metrics.py").as_posix(),
-                "--targets",
-                args.targets.as_posix(),
-                "--project",
-                project,
-                "--compiler",
-                args.compiler,
-                "--cc-version",
-                args.cc_version,
-            ]
-
-            if args.debug:
-                cmd.append("--debug")
-
+    if "metrics" in stages:
+        for project, targets in projects.items():
+            kwargs = {
+                "project": project,
+                "compiler": args.compiler,
+                "cc_version": args.cc_version,
+                "targets": args.targets,
+            }
             log_file = args.log / f"metrics-{compiler}-{project}.log"
-            run_cmd(cmd, log_file)
+            add_stage_job(
+                "metrics",
+                f"metrics-{compiler}-{project}",
+                metrics.run,
+                kwargs,
+                log_file,
+                deps=[f"static-{compiler}-{project}-{t}" for t in targets],
+                fingerprint=inputs(
+                    [args.targets / project / compiler / f"traces-polished-{t}.json" for t in targets],
+                    base / "debug-quality" / "metrics.py",
+                ),
+                outputs=[args.targets / project / compiler / "metrics.json"],
+            )
 
     # 8. Generate rankings
-    if args.all_stages or "rankings" in args.stages:
-        cmd = [
-            "python3",
-            (base / "compiler-tuning" / "rankings.py").as_posix(),
-            "--targets",
-            args.targets.as_posix(),
-            "--compiler",
-            args.compiler,
-            "--cc-version",
-            args.cc_version,
-        ]
-
-        if args.debug:
-            cmd.append("--debug")
-
-        if args.minimal:
-            cmd.append("--minimal")
-
+    if "rankings" in stages:
+        kwargs = {
+            "compiler": args.compiler,
+            "cc_version": args.cc_version,
+            "targets": args.targets,
+            "minimal": args.minimal,
+        }
         log_file = args.log / f"rankings-{compiler}.log"
-        run_cmd(cmd, log_file)
-
-    if args.all_stages or "performance" in args.stages:
-        cmd = [
-            "python3",
-            (base / "compiler-tuning" / "performance.py").as_posix(),
-            "--targets",
-            args.targets.as_posix(),
-            "--compiler",
-            args.compiler,
-            "--cc-version",
-            args.cc_version,
-        ]
-
-        if args.debug:
-            cmd.append("--debug")
-
+        add_stage_job(
+            "rankings",
+            f"rankings-{compiler}",
+            rankings.run,
+            kwargs,
+            log_file,
+            deps=[f"metrics-{compiler}-{project}" for project in projects],
+            fingerprint=inputs(
+                [args.targets / project / compiler / "metrics.json" for project in projects],
+                base / "compiler-tuning" / "rankings.py",
+            ),
+            outputs=[args.targets / f"rankings-{compiler}.json"],
+        )
+
+    if "performance" in stages:
+        kwargs = {
+            "compiler": args.compiler,
+            "cc_version": args.cc_version,
+            "targets": args.targets,
+            "perfdir": base / "dt-performance",
+        }
         log_file = args.log / f"performance-{compiler}.log"
-        run_cmd(cmd, log_file)
+        add_stage_job(
+            "performance",
+            f"performance-{compiler}",
+            performance.run,
+            kwargs,
+            log_file,
+            deps=[f"rankings-{compiler}"],
+            fingerprint=inputs(
+                args.targets / f"rankings-{compiler}.json",
+                base / "compiler-tuning",
+                base / "misc" / "clang_pass_names.py",
+                base / "misc" / "pass_catalogue.py",
+            ),
+            outputs=[kwargs["perfdir"] / f"run_spec_{args.compiler}.sh"],
+        )
+
+    with executor:
+        failed = scheduler.run()
+    if failed:
+        log.info(f"Pipeline not completed. Failed or skipped jobs: {', '.join(failed)}")
+        exit(1)
+
+
+def worker(args):
+    log.info(f"Running {args.proc} workers on queue {args.queue}")
+    jobqueue.start_workers(args.queue, args.proc, args.max_idle)
+
+
+if __name__ == "__main__" and sys.argv[1:2] == ["worker"]:
+
+    # Worker mode: run the jobs submitted to a shared queue by the pipeline on other hosts
+    parser = ArgumentParser(
+        prog=f"{Path(__file__).name} worker",
+        description="Run the debugger sessions submitted to a shared job queue by a pipeline started with --queue.",
+        formatter_class=ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--queue", dest="queue", type=Path, help="Shared job queue directory", required=True)
+    parser.add_argument("--proc", dest="proc", type=int, help="Number of workers", default=1)
+    parser.add_argument(
+        "--max-idle",
+        dest="max_idle",
+        type=int,
+        help="Exit after this number of seconds without jobs (0 to run forever)",
+        default=0,
+    )
+    parser.add_argument(
+        "--debug",
+        dest="debug",
+        action="store_true",
+        help="Enable debug prints",
+        default=False,
+    )
+    args = parser.parse_args(sys.argv[2:])
 
+    log.init(args)
+    worker(args)
 
-if __name__ == "__main__":
+elif __name__ == "__main__":
 
     parser = ArgumentParser(
         description="Framework pipeline. Use the arguments --all or --stages to run the entire pipeline or only one or more specific stages.",
@@ -294,17 +652,7 @@ if __name__ == "__main__":
         "--stages",
         dest="stages",
         nargs="+",
-        choices=[
-            "build",
-            "build-afl",
-            "corpora",
-            "minimize",
-            "traces",
-            "static",
-            "metrics",
-            "rankings",
-            "performance",
-        ],
+        choices=STAGES,
         type=str,
         help="Specify one or more pipeline stage to run.",
         default=[],
@@ -347,6 +695,14 @@ if __name__ == "__main__":
         help="AFL++ compiler used to build target",
         default="afl-clang-fast++",
     )
+    parser.add_argument(
+        "--cmin-backend",
+        dest="cmin_backend",
+        choices=["auto", "afl", "sancov", "none"],
+        type=str,
+        help="Stage 0 of the minimization: afl-cmin, coverage of the build-sancov targets (misc/sancov-cc), none, or auto (afl-cmin if the AFL++ compiler is available)",
+        default="auto",
+    )
     parser.add_argument(
         "--cc-version",
         dest="cc_version",
@@ -369,6 +725,114 @@ if __name__ == "__main__":
         default=False,
     )
     parser.add_argument("--proc", dest="proc", type=int, help="Number of processes to use", default=1)
+    parser.add_argument(
+        "--job-proc",
+        dest="job_proc",
+        type=int,
+        help="Number of processes used by each build, minimize and traces job (0 means --proc). Jobs run concurrently as long as the --proc budget allows it",
+        default=0,
+    )
+    parser.add_argument(
+        "--parallel-configs",
+        dest="parallel_configs",
+        type=int,
+        help="Number of configurations of a project built at the same time by each build job, sharing its --job-proc processes",
+        default=1,
+    )
+    parser.add_argument(
+        "--objcache",
+        dest="objcache",
+        action="store_true",
+        help="Reuse the objects compiled by previous builds with the same source, flags and compiler (builder.py -C)",
+        default=False,
+    )
+    parser.add_argument(
+        "--prune-duplicates",
+        dest="prune_duplicates",
+        action="store_true",
+        help="Remove the built binaries identical to the ones of another configuration (their traces are shared)",
+        default=False,
+    )
+    parser.add_argument(
+        "--screen",
+        dest="screen",
+        action="store_true",
+        help="Run the screen stage with --all-stages: an extra build of the -standard configurations of each project, "
+        "so that the build stage skips the configurations disabling a pass that never transforms it",
+        default=False,
+    )
+    parser.add_argument(
+        "--corpus-source",
+        dest="corpus_source",
+        type=Path,
+        help="Archive or directory (<project>/<fuzz target>/<inputs>) added to the corpus store before the corpora stage, "
+        "e.g. ../eval-dataset/dt-corpus-min.tar.gz",
+        default=None,
+    )
+    parser.add_argument(
+        "--corpus-min",
+        dest="corpus_min",
+        type=Path,
+        help="Minimized corpus directory or archive (e.g. ../eval-dataset/dt-corpus-min.tar.gz, read without extracting it)",
+        default=Path(__file__).parent.resolve() / "dt-corpus-min",
+    )
+    parser.add_argument(
+        "--offline",
+        dest="offline",
+        action="store_true",
+        help="Fail the corpora stage for the fuzz targets not in the corpus store instead of downloading them",
+        default=False,
+    )
+    parser.add_argument(
+        "--log-max-size",
+        dest="log_max_size",
+        type=int,
+        help="Rotate job logs when they exceed this size in MiB (0 to disable rotation)",
+        default=0,
+    )
+    parser.add_argument(
+        "--log-compress",
+        dest="log_compress",
+        action="store_true",
+        help="Gzip job logs while they are written",
+        default=False,
+    )
+    parser.add_argument(
+        "--breakpoints",
+        dest="breakpoints",
+        choices=["line", "address"],
+        type=str,
+        help="Breakpoints of the debugger sessions: file:line linespecs, or the addresses of the DWARF line table (faster session start-up). The sessions run by `debugtuner.py worker` use the mode of the run that submitted them",
+        default=os.environ.get("DT_BREAKPOINTS", "line"),
+    )
+    parser.add_argument(
+        "--mem-budget",
+        dest="mem_budget",
+        type=int,
+        help="Memory budget (MiB) of the debugger sessions of each minimize and traces job, 0 to use only the available memory",
+        default=0,
+    )
+    parser.add_argument(
+        "--queue",
+        dest="queue",
+        type=Path,
+        help="Shared job queue directory: debugger sessions of the traces stage are run by `debugtuner.py worker` processes, possibly on other hosts",
+        default=None,
+    )
+    parser.add_argument(
+        "--resume",
+        dest="resume",
+        action="store_true",
+        help="Continue an interrupted run, skipping the jobs and the debugger sessions already completed",
+        default=False,
+    )
+    parser.add_argument(
+        "--force",
+        dest="force",
+        action="store_true",
+        help="Run all the jobs of the selected stages, even if their inputs did not change since the last run",
+        default=False,
+    )
     parser.add_argument(
         "--minimal",
         dest="minimal",
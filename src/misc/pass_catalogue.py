@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+from functools import lru_cache
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent / ".."))
+from config import CACHE_DIR
+
+FUZZER_SRC = Path(__file__).resolve().parent / "fuzzer-main.c"
+# Increase when the content of the catalogue changes
+FORMAT = 1
+# Passes that cannot be disabled with -opt-disable
+EXCLUDED = ("LCSSAPass", "LoopSimplifyPass", "Instruction Selection")
+# Characters of clang pass names replaced with _ in -opt-disable arguments and directory names (as in builder.py)
+PASS_NAME_TRANS = str.maketrans({c: "_" for c in " <>/()-"})
+
+
+def resolve(compiler):
+    return Path(shutil.which(str(compiler)) or compiler).resolve()
+
+
+def catalogue_path(compiler):
+    """Return the catalogue filepath of a compiler, keyed by its path, its version and the compiled source."""
+    version = subprocess.run([str(compiler), "--version"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT).stdout
+    h = hashlib.sha256(f"{FORMAT}\n{resolve(compiler)}\n".encode())
+    h.update(version)
+    h.update(FUZZER_SRC.read_bytes())
+    return CACHE_DIR / "passes" / f"{Path(compiler).name}-{h.hexdigest()[:16]}.json"
+
+
+def gcc_level(compiler, opt_level):
+    """Return the -fno-* flags disabling the optimizations enabled at opt_level."""
+    result = subprocess.run(
+        [str(compiler), "-Q", f"-O{opt_level}", "--help=optimizers"], stdout=subprocess.PIPE, check=True
+    )
+    flags = []
+    for line in result.stdout.decode().split("\n"):
+        if "[enabled]" not in line:
+            continue
+        # manage particular cases where some opt cannot be disabled
+        flag = line.split()[0].replace("-f", "-fno-", 1).replace("stack-protector-strong", "stack-protector")
+        if flag != "-fno-unroll-completely-grow-size":
+            flags.append(flag)
+    return flags, {}
+
+
+def clang_level(compiler, opt_level):
+    """Return the arguments of -opt-disable for the passes run at opt_level, and their names."""
+    cmd = [str(compiler), f"-O{opt_level}", "-mllvm", "-opt-bisect-limit=-1", str(FUZZER_SRC), "-o", "/dev/null"]
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    args = []
+    passes = {}
+    for line in result.stderr.decode().split("\n"):
+        if not "BISECT" in line:
+            continue
+        name = line.split(") ")[1].split(" on ")[0]
+        arg = name.translate(PASS_NAME_TRANS)
+        passes[arg] = name
+        if arg not in args and not any(e in name for e in EXCLUDED):
+            args.append(arg)
+    return args, passes
+
+
+def catalogue(compiler, levels=("0", "1", "2", "3", "g")):
+    """Return the optimizations of a compiler, computing and caching the levels not in the catalogue yet.
+
+    Args:
+        compiler (str): compiler name or path
+        levels (tuple): optimization levels
+
+    Returns:
+        dict: compiler path, version, "levels" with the flags (gcc) or -opt-disable arguments (clang)
+            of each level and, for clang, "passes" with the name of the pass of each argument
+    """
+    path = catalogue_path(compiler)
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        data = {"compiler": str(resolve(compiler)), "levels": {}, "passes": {}}
+
+    missing = [l for l in levels if l not in data["levels"]]
+    if missing:
+        level = clang_level if "clang" in Path(compiler).name else gcc_level
+        for opt_level in missing:
+            data["levels"][opt_level], passes = level(compiler, opt_level)
+            data["passes"].update(passes)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(data, f, indent=2)
+        tmp.replace(path)
+    return data
+
+
+@lru_cache(maxsize=None)
+def lookup(compiler, levels=("0", "1", "2", "3")):
+    """Return a dict from the lowercase -opt-disable argument (as in directory names) to (argument, pass name)."""
+    passes = catalogue(compiler, levels)["passes"]
+    return {arg.lower(): (arg, name) for arg, name in passes.items()}
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(
+        description="Print the optimizations of a compiler (-fno-* flags for gcc, -opt-disable arguments for clang).",
+        formatter_class=ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("compiler", type=str, help="Compiler name or path")
+    parser.add_argument("--level", dest="level", type=str, help="Optimization level", required=True)
+    args = parser.parse_args()
+
+    # space-separated list
+    print(" ".join(catalogue(args.compiler, (args.level,))["levels"][args.level]))
@@ -0,0 +1,119 @@
+#include <stdio.h>
+#include <stdlib.h>
+#include <stdint.h>
+
+// Fuzzer main of the SanitizerCoverage builds (misc/sancov-cc): runs each input file like fuzzer-main.c and
+// records the code it covers (-fsanitize-coverage=trace-pc). After each input, a line
+// "<input>\t<pc offset> <pc offset> ...\n" is written to the file in DT_SANCOV_OUT (stderr if not set),
+// so that the coverage of the inputs run before a crash is not lost.
+// This file is compiled without instrumentation.
+
+#define TABLE_BITS 20
+#define TABLE_SIZE (1 << TABLE_BITS)
+
+int LLVMFuzzerTestOneInput(const uint8_t *data, size_t size);
+int main(int argc, char *argv[]);
+
+// open addressing set of the pcs (offsets from main + 1, 0 is empty) covered by the current input
+static uint64_t table[TABLE_SIZE];
+static uint32_t used[TABLE_SIZE / 2];
+static size_t n_used;
+
+void __sanitizer_cov_trace_pc(void)
+{
+    uint64_t pc = (uint64_t)(uintptr_t)__builtin_return_address(0) - (uint64_t)(uintptr_t)&main + 1;
+    uint32_t h = (uint32_t)((pc * 0x9E3779B97F4A7C15ULL) >> (64 - TABLE_BITS));
+
+    while (table[h])
+    {
+        if (table[h] == pc)
+        {
+            return;
+        }
+        h = (h + 1) & (TABLE_SIZE - 1);
+    }
+    if (n_used == TABLE_SIZE / 2)
+    {
+        return;
+    }
+    table[h] = pc;
+    used[n_used++] = h;
+}
+
+static void reset_coverage(void)
+{
+    size_t i = 0;
+    for (; i < n_used; i++)
+    {
+        table[used[i]] = 0;
+    }
+    n_used = 0;
+}
+
+static void write_coverage(FILE *out, const char *input)
+{
+    size_t i = 0;
+    fprintf(out, "%s\t", input);
+    for (; i < n_used; i++)
+    {
+        fprintf(out, i ? " %llx" : "%llx", (unsigned long long)table[used[i]]);
+    }
+    fputc('\n', out);
+    fflush(out);
+}
+
+int main(int argc, char *argv[])
+{
+    if (argc < 2)
+    {
+        return 1;
+    }
+
+    FILE *out = stderr;
+    const char *out_path = getenv("DT_SANCOV_OUT");
+    if (out_path != NULL)
+    {
+        out = fopen(out_path, "w");
+        if (out == NULL)
+        {
+            return 1;
+        }
+    }
+
+    int i = 1;
+    for (; i < argc; i++)
+    {
+        FILE *fp = fopen(argv[i], "rb");
+        if (fp == NULL)
+        {
+            continue;
+        }
+
+        fseek(fp, 0L, SEEK_END);
+        size_t file_size = ftell(fp);
+        fseek(fp, 0L, SEEK_SET);
+
+        uint8_t *file_content = (uint8_t *)malloc(file_size);
+        if (file_content == NULL)
+        {
+            fclose(fp);
+            continue;
+        }
+
+        size_t bytes_read = fread(file_content, sizeof(uint8_t), file_size, fp);
+        fclose(fp);
+        if (bytes_read != file_size)
+        {
+            free(file_content);
+            continue;
+        }
+
+        reset_coverage();
+        LLVMFuzzerTestOneInput(file_content, file_size);
+        write_coverage(out, argv[i]);
+
+        free(file_content);
+    }
+
+    return 0;
+}
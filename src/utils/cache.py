@@ -0,0 +1,111 @@
+import json
+import hashlib
+import os
+import subprocess
+from functools import lru_cache
+from pathlib import Path
+from threading import Lock
+
+from utils import log
+
+
+def file_digest(path):
+    """Compute the sha256 of a file.
+
+    Args:
+        path (Path): filepath
+
+    Returns:
+        str: hex digest
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def tool_version(tool):
+    """Return the first line of `<tool> --version`, or "missing" if the tool is not available."""
+    try:
+        result = subprocess.run([str(tool), "--version"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=60)
+    except (OSError, subprocess.TimeoutExpired):
+        return "missing"
+    return result.stdout.decode(errors="replace").strip().split("\n")[0]
+
+
+class Manifest:
+    """Fingerprints of the inputs of the completed stage jobs, stored in a json file.
+
+    A job is up to date when the fingerprint of its inputs (files, tool versions, configuration entries)
+    matches the one recorded when it last completed and all its outputs exist.
+    File digests are memoized by size and modification time, so unchanged files are not read again.
+
+    Args:
+        path (Path): manifest filepath
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = Lock()
+        self.jobs = {}
+        self.files = {}
+        if path.is_file():
+            with open(path) as f:
+                data = json.load(f)
+            self.jobs = data.get("jobs", {})
+            self.files = data.get("files", {})
+
+    def digest(self, path):
+        st = path.stat()
+        key = path.as_posix()
+        with self.lock:
+            memo = self.files.get(key)
+        if memo is not None and memo[0] == st.st_size and memo[1] == st.st_mtime_ns:
+            return memo[2]
+        digest = file_digest(path)
+        with self.lock:
+            self.files[key] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def fingerprint(self, *items):
+        """Compute the fingerprint of a set of inputs.
+
+        Args:
+            items: paths (files or directories, hashed recursively) or any other value (hashed by repr)
+
+        Returns:
+            str: fingerprint
+        """
+        h = hashlib.sha256()
+        for item in items:
+            if isinstance(item, Path):
+                if item.is_file():
+                    h.update(f"{item.as_posix()}:{self.digest(item)}\n".encode())
+                elif item.is_dir():
+                    files = (p for p in item.rglob("*") if p.is_file() and "__pycache__" not in p.parts)
+                    for path in sorted(files):
+                        h.update(f"{path.as_posix()}:{self.digest(path)}\n".encode())
+                else:
+                    h.update(f"{item.as_posix()}:missing\n".encode())
+            else:
+                h.update(f"{item!r}\n".encode())
+        return h.hexdigest()
+
+    def is_fresh(self, name, fingerprint, outputs=()):
+        with self.lock:
+            recorded = self.jobs.get(name)
+        return recorded == fingerprint and all(Path(o).exists() for o in outputs)
+
+    def record(self, name, fingerprint):
+        with self.lock:
+            self.jobs[name] = fingerprint
+            self.save()
+
+    def save(self):
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"jobs": self.jobs, "files": self.files}, f)
+        os.replace(tmp, self.path)
+        log.debug(f"[cache] {self.path} updated.")
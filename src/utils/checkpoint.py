@@ -0,0 +1,108 @@
+import json
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+
+from utils import log
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    name TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    started REAL,
+    finished REAL,
+    outputs TEXT,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    target TEXT NOT NULL,
+    config TEXT NOT NULL,
+    binary_hash TEXT NOT NULL,
+    inputs_hash TEXT NOT NULL,
+    variables TEXT NOT NULL,
+    functions TEXT NOT NULL,
+    PRIMARY KEY (target, config)
+);
+"""
+
+
+class Checkpoint:
+    """Persistent state of the pipeline, stored in a SQLite database.
+
+    The jobs table records the status (running, done, failed) and the outputs of each job,
+    the sessions table the result of each debugger session of the traces stage
+    (one per binary configuration), so that an interrupted run can be resumed
+    without computing completed jobs and sessions again.
+    Every update is committed immediately, so the state survives crashes of the pipeline.
+    The database is shared by the pipeline workers, connections are short-lived.
+
+    Args:
+        path (Path): database filepath
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with closing(self.connect()) as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=600, isolation_level=None)
+
+    def execute(self, query, params=()):
+        with closing(self.connect()) as db:
+            return db.execute(query, params).fetchall()
+
+    def job_status(self, name):
+        rows = self.execute("SELECT status, outputs FROM jobs WHERE name = ?", (name,))
+        if not rows:
+            return None, []
+        return rows[0][0], json.loads(rows[0][1] or "[]")
+
+    def job_started(self, name):
+        self.execute(
+            "INSERT OR REPLACE INTO jobs (name, status, started) VALUES (?, 'running', ?)",
+            (name, time.time()),
+        )
+
+    def job_done(self, name, outputs=()):
+        self.execute(
+            "UPDATE jobs SET status = 'done', finished = ?, outputs = ?, error = NULL WHERE name = ?",
+            (time.time(), json.dumps([str(o) for o in outputs]), name),
+        )
+
+    def job_failed(self, name, error):
+        self.execute(
+            "UPDATE jobs SET status = 'failed', finished = ?, error = ? WHERE name = ?",
+            (time.time(), error, name),
+        )
+
+    def is_done(self, name):
+        """Return True if the job completed in a previous run and its outputs still exist."""
+        status, outputs = self.job_status(name)
+        return status == "done" and all(Path(o).exists() for o in outputs)
+
+    def summary(self):
+        return dict(self.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+
+    def save_session(self, target, config, binary_hash, inputs_hash, variables, functions):
+        self.execute(
+            "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?)",
+            (target, config, binary_hash, inputs_hash, json.dumps(variables), json.dumps(functions)),
+        )
+        log.debug(f"[checkpoint] {target} {config}: session saved.")
+
+    def load_session(self, target, config, binary_hash, inputs_hash):
+        """Return the (variables, functions) of a completed session, None if not found or outdated."""
+        rows = self.execute(
+            "SELECT variables, functions FROM sessions "
+            "WHERE target = ? AND config = ? AND binary_hash = ? AND inputs_hash = ?",
+            (target, config, binary_hash, inputs_hash),
+        )
+        if not rows:
+            return None
+        return json.loads(rows[0][0]), json.loads(rows[0][1])
+
+    def clear_sessions(self, target):
+        self.execute("DELETE FROM sessions WHERE target = ?", (target,))
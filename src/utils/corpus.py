@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+import bz2
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import shutil
+import tarfile
+import tempfile
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parent / ".."))
+from config import CACHE_DIR
+from utils import log
+from utils.cache import file_digest
+
+# Corpora are directories (<corpus>/<project>/<fuzz target>/<inputs>) or tar archives with the same layout
+# (e.g. eval-dataset/dt-corpus-min.tar.gz). Archives are indexed once (offset, size and sha256 of each input in
+# the uncompressed stream) and the inputs of a fuzz target are extracted only when they are used, in SCRATCH.
+INDEX_VERSION = 1
+ARCHIVE_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+SCRATCH = Path(os.environ.get("DT_SCRATCH", "/dev/shm" if Path("/dev/shm").is_dir() else tempfile.gettempdir()))
+
+
+def is_archive(corpus):
+    return corpus.is_file() and corpus.name.endswith(ARCHIVE_SUFFIXES)
+
+
+def index_path(archive):
+    """Return the index filepath of an archive, keyed by its path, size and modification time."""
+    st = archive.stat()
+    key = hashlib.sha256(f"{archive.resolve()}:{st.st_size}:{st.st_mtime_ns}".encode()).hexdigest()[:16]
+    return CACHE_DIR / "corpus-index" / f"{archive.name}-{key}.json"
+
+
+def build_index(archive):
+    """Read an archive once and return the offset, size and sha256 of the inputs of each fuzz target."""
+    targets = {}
+    with tarfile.open(archive, "r|*") as tar:
+        for member in tar:
+            parts = Path(member.name).parts
+            if not member.isfile() or len(parts) < 3:
+                continue
+            project, fuzz_target, name = parts[-3:]
+            digest = hashlib.sha256(tar.extractfile(member).read()).hexdigest()
+            targets.setdefault(f"{project}/{fuzz_target}", {})[name] = [member.offset_data, member.size, digest]
+    return {"version": INDEX_VERSION, "archive": str(archive), "targets": targets}
+
+
+@lru_cache(maxsize=None)
+def load_index(archive):
+    """Return the index of an archive, building it if missing or outdated."""
+    path = index_path(archive)
+    try:
+        with open(path) as f:
+            index = json.load(f)
+        if index.get("version") == INDEX_VERSION:
+            return index
+    except (OSError, json.JSONDecodeError):
+        pass
+    log.info(f"[{archive}] Corpus index: INITIALIZING.")
+    index = build_index(archive)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(index, f)
+    tmp.replace(path)
+    log.info(f"[{archive}] Corpus index: TERMINATED ({len(index['targets'])} fuzz targets).")
+    return index
+
+
+def archive_entries(archive, project, fuzz_target):
+    """Return {input name: [offset, size, sha256]} of a fuzz target, None if it is not in the archive."""
+    return load_index(archive.resolve())["targets"].get(f"{project}/{fuzz_target}")
+
+
+def has_inputs(corpus, project, fuzz_target):
+    """Return True if the corpus has a non empty input set for the fuzz target."""
+    if is_archive(corpus):
+        return bool(archive_entries(corpus, project, fuzz_target))
+    input_dir = corpus / project / fuzz_target
+    return input_dir.is_dir() and any(input_dir.iterdir())
+
+
+def input_digests(corpus, project, fuzz_target):
+    """Return the sha256 of each input of a fuzz target (read from the index for archives).
+
+    Args:
+        corpus (Path): corpus directory or archive
+        project (str): project name
+        fuzz_target (str): fuzz target name
+
+    Returns:
+        dict: sha256 by input name
+    """
+    if is_archive(corpus):
+        entries = archive_entries(corpus, project, fuzz_target) or {}
+        return {name: entry[2] for name, entry in entries.items()}
+    input_dir = corpus / project / fuzz_target
+    if not input_dir.is_dir():
+        return {}
+    return {p.name: file_digest(p) for p in input_dir.iterdir() if p.is_file()}
+
+
+def open_stream(archive):
+    with open(archive, "rb") as f:
+        magic = f.read(6)
+    if magic.startswith(b"\x1f\x8b"):
+        return gzip.open(archive, "rb")
+    if magic.startswith(b"BZh"):
+        return bz2.open(archive, "rb")
+    if magic.startswith(b"\xfd7zXZ"):
+        return lzma.open(archive, "rb")
+    return open(archive, "rb")
+
+
+@contextmanager
+def extracted(corpus, project, fuzz_target, scratch=None):
+    """Yield a corpus directory with the inputs of a fuzz target (in <directory>/<project>/<fuzz target>).
+
+    Directories are used in place. For archives, only the inputs of the fuzz target are extracted
+    to a scratch directory (tmpfs by default), removed on exit.
+
+    Args:
+        corpus (Path): corpus directory or archive
+        project (str): project name
+        fuzz_target (str): fuzz target name
+        scratch (Path): scratch directory, SCRATCH if None (use a shared filesystem if the inputs
+            are read by other hosts)
+
+    Yields:
+        Path: corpus directory
+    """
+    if not is_archive(corpus):
+        yield corpus
+        return
+
+    entries = archive_entries(corpus, project, fuzz_target) or {}
+    scratch = SCRATCH if scratch is None else scratch
+    scratch.mkdir(parents=True, exist_ok=True)
+    root = Path(tempfile.mkdtemp(prefix=f"dt-corpus-{project}-{fuzz_target}-", dir=scratch))
+    try:
+        input_dir = root / project / fuzz_target
+        input_dir.mkdir(parents=True)
+        # inputs are read in stream order, so that the archive is decompressed at most once
+        with open_stream(corpus) as stream:
+            for name, (offset, size, _) in sorted(entries.items(), key=lambda e: e[1][0]):
+                stream.seek(offset)
+                (input_dir / name).write_bytes(stream.read(size))
+        log.debug(f"[{corpus}] {len(entries)} inputs of {project}/{fuzz_target} extracted to {input_dir}.")
+        yield root
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(
+        description="Index a corpus archive and list the fuzz targets and the number of inputs in it.",
+        formatter_class=ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("archive", type=Path, help="Corpus archive (e.g. eval-dataset/dt-corpus-min.tar.gz)")
+    parser.add_argument(
+        "--debug",
+        dest="debug",
+        action="store_true",
+        help="Enable debug prints",
+        default=False,
+    )
+    args = parser.parse_args()
+
+    log.init(args)
+    if not is_archive(args.archive):
+        log.info(f"Error: {args.archive} is not a corpus archive.")
+        exit(1)
+    for target, entries in sorted(load_index(args.archive.resolve())["targets"].items()):
+        print(f"{target}: {len(entries)} inputs")
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+import re
+import sys
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+from multiprocessing import Pool
+from pathlib import Path
+
+from elftools.elf.elffile import ELFFile
+
+sys.path.append(str(Path(__file__).resolve().parent / ".."))
+from utils import log
+from utils.cache import file_digest
+
+INDEX = "equivalence.json"
+VERSION = 1
+# Sections hashed for every binary: code, line table, location lists and ranges.
+# .debug_info and .debug_str also contain DW_AT_producer (with gcc, the full command line),
+# so they are compared through a digest of the DIEs that excludes it, only for the binaries
+# whose other sections are identical.
+SECTIONS = (
+    ".text",
+    ".debug_line",
+    ".debug_line_str",
+    ".debug_loc",
+    ".debug_loclists",
+    ".debug_ranges",
+    ".debug_rnglists",
+    ".debug_addr",
+)
+
+
+def is_elf(path):
+    with open(path, "rb") as f:
+        return f.read(4) == b"\x7fELF"
+
+
+def sections_hash(binary):
+    """Return the hash of the .text section and the hash of the .text and debug sections (except .debug_info)."""
+    with open(binary, "rb") as f:
+        elf = ELFFile(f)
+        text = elf.get_section_by_name(".text")
+        if text is None:
+            return None, None
+        h = hashlib.sha256()
+        for name in SECTIONS:
+            section = elf.get_section_by_name(name)
+            h.update(f"{name}:{section.data_size if section else -1}\n".encode())
+            if section:
+                h.update(section.data())
+        return hashlib.sha256(text.data()).hexdigest(), h.hexdigest()
+
+
+def die_digest(binary):
+    """Return the hash of the DIEs of a binary, without DW_AT_producer."""
+    h = hashlib.sha256()
+    with open(binary, "rb") as f:
+        elf = ELFFile(f)
+        if not elf.has_dwarf_info():
+            return h.hexdigest()
+        for cu in elf.get_dwarf_info().iter_CUs():
+            for die in cu.iter_DIEs():
+                h.update(f"{die.tag}:{die.has_children}\n".encode())
+                for name, attr in die.attributes.items():
+                    if name != "DW_AT_producer":
+                        h.update(f"{name}:{attr.form}:{attr.value!r}\n".encode())
+    return h.hexdigest()
+
+
+def describe(binary):
+    """Return the index entry of a binary (without its equivalence class)."""
+    text, key = sections_hash(binary)
+    if text is None:
+        return None
+    st = binary.stat()
+    return {
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "sha256": file_digest(binary),
+        "text": text,
+        "key": key,
+        "die": None,
+    }
+
+
+def up_to_date(entry, binary):
+    try:
+        st = binary.stat()
+    except OSError:
+        return False
+    return entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns
+
+
+def priority(config):
+    """-O0-all, then -standard, then alphabetically: the first configuration of a class is the canonical one."""
+    if "-O0-all" in config:
+        return (0, config)
+    if re.search(r"-O(0|1|2|3|g|s|z)-standard$", config):
+        return (1, config)
+    return (2, config)
+
+
+def load(target_dir):
+    """Load the equivalence index of a target directory (empty if missing or outdated)."""
+    try:
+        with open(target_dir / INDEX) as f:
+            index = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    return index if index.get("version") == VERSION else {}
+
+
+def lookup(index, target, config, binary):
+    """Return the index entry of a binary, None if it is not indexed or changed after the index was written.
+
+    Args:
+        index (dict): equivalence index
+        target (str): fuzz target name
+        config (str): configuration directory name
+        binary (Path): binary filepath
+
+    Returns:
+        dict: sha256, text (.text hash), hash (.text and debug sections) and class (canonical configuration)
+    """
+    entry = index.get("targets", {}).get(target, {}).get(config)
+    if entry is None:
+        return None
+    if entry.get("pruned") and not binary.exists():
+        return entry
+    return entry if up_to_date(entry, binary) else None
+
+
+def run(target_dir, proc=1, prune=False):
+    """Write the equivalence index (equivalence.json) of the binaries of a project built with a compiler.
+
+    Binaries of the same fuzz target are equivalent if their .text and debug sections are identical,
+    ignoring DW_AT_producer. Each binary is mapped to the first configuration of its class
+    (-O0-all, then -standard, then alphabetically), so that later stages can alias the duplicates.
+    Entries of unchanged binaries are reused from the previous index.
+
+    Args:
+        target_dir (Path): directory with the configuration directories (targets/project/compiler)
+        proc (int): number of processes
+        prune (bool): remove the duplicate binaries (except -all and -standard ones), keeping their index entries
+    """
+    log.info(f"[{target_dir}] Equivalence index: INITIALIZING.")
+    old = load(target_dir).get("targets", {})
+
+    binaries = {}
+    for config_dir in sorted(target_dir.iterdir()):
+        if not config_dir.is_dir() or "-O" not in config_dir.name:
+            continue
+        for binary in config_dir.iterdir():
+            entry = old.get(binary.name, {}).get(config_dir.name)
+            if binary.is_file() and not binary.name.endswith(".o") and is_elf(binary):
+                binaries[(binary.name, config_dir.name)] = (binary, entry)
+        # binaries pruned by a previous run
+        for target, configs in old.items():
+            entry = configs.get(config_dir.name)
+            if entry is not None and entry.get("pruned") and not (config_dir / target).exists():
+                binaries[(target, config_dir.name)] = (config_dir / target, entry)
+
+    index = {}
+    with Pool(proc) as pool:
+        stale = [
+            (k, pool.apply_async(describe, (binary,)))
+            for k, (binary, entry) in binaries.items()
+            if entry is None or not (entry.get("pruned") or up_to_date(entry, binary))
+        ]
+        for (target, config), (binary, entry) in binaries.items():
+            index.setdefault(target, {})[config] = entry
+        for (target, config), result in stale:
+            index[target][config] = result.get()
+            if index[target][config] is None:
+                log.info(f"[{config}/{target}] .text section not found, not indexed.")
+                del index[target][config]
+
+        # binaries with the same sections are compared through their DIEs
+        for target, configs in index.items():
+            groups = {}
+            for config, entry in configs.items():
+                groups.setdefault(entry["key"], []).append(config)
+            digests = [
+                (config, pool.apply_async(die_digest, (target_dir / config / target,)))
+                for group in groups.values()
+                if len(group) > 1
+                for config in group
+                if configs[config]["die"] is None
+            ]
+            for config, result in digests:
+                configs[config]["die"] = result.get()
+
+    duplicates = 0
+    for target, configs in index.items():
+        classes = {}
+        for config in sorted(configs, key=priority):
+            entry = configs[config]
+            entry["hash"] = entry["key"] if entry["die"] is None else hashlib.sha256(
+                f"{entry['key']}{entry['die']}".encode()
+            ).hexdigest()
+            entry["class"] = classes.setdefault(entry["hash"], config)
+            if entry["class"] != config:
+                duplicates += 1
+                log.debug(f"[{config}/{target}] same as {entry['class']}")
+                if prune and priority(config)[0] == 2 and not entry.get("pruned"):
+                    (target_dir / config / target).unlink()
+                    entry["pruned"] = True
+        log.info(f"[{target}] {len(configs)} binaries, {len(classes)} equivalence classes.")
+
+    tmp = target_dir / f"{INDEX}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"version": VERSION, "targets": index}, f, indent=2, sort_keys=True)
+    tmp.replace(target_dir / INDEX)
+    log.info(f"[{target_dir}] Equivalence index: TERMINATED ({duplicates} duplicate binaries{', pruned' if prune else ''}).")
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(
+        description="Write the equivalence index of the binaries built for a project with a compiler.",
+        formatter_class=ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("target_dir", type=Path, help="Target directory (e.g. dt-targets/<project>/<compiler>)")
+    parser.add_argument("--proc", dest="proc", type=int, help="Number of processes to use", default=1)
+    parser.add_argument(
+        "--prune",
+        dest="prune",
+        action="store_true",
+        help="Remove the duplicate binaries (-all and -standard binaries are kept)",
+        default=False,
+    )
+    parser.add_argument(
+        "--debug",
+        dest="debug",
+        action="store_true",
+        help="Enable debug prints",
+        default=False,
+    )
+    args = parser.parse_args()
+
+    log.init(args)
+    if not args.target_dir.is_dir():
+        log.info(f"Error: target directory {args.target_dir} not found.")
+        exit(1)
+    run(args.target_dir, args.proc, args.prune)
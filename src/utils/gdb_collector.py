@@ -0,0 +1,163 @@
+import json
+import re
+
+import gdb
+
+# Breakpoint collector loaded in gdb by the tracer (utils/tracer.py) in place of "info locals":
+#   python import sys; sys.path.insert(0, <utils>); import gdb_collector
+#   python gdb_collector.start(<locations file>, <records file>, <entry point or None>)
+#   python gdb_collector.arm(<input index>)
+#   run <input>
+# or, with address breakpoints, which are set at the addresses where the binary is loaded:
+#   python gdb_collector.arm(<input index>)
+#   starti <input>
+#   python gdb_collector.relocate()
+#   continue
+# At each hit, only the function, the source, the line and whether each local is optimized out are recorded
+# (values are never formatted), as newline-delimited JSON records in the records file:
+#   {"input": <index>}                                        before each run
+#   {"f": <function>, "s": <source>, "l": <line>, "v": {<local>: <0|1 optimized out>}[, "pc": <file address>]}
+#   {"signal": <signal name>}                                 when the inferior is stopped by a signal
+# The breakpoints are set once, when the collector starts (address breakpoints when the first run starts):
+# a breakpoint is disabled after its hit (one record per location and run, as the tbreak of the text scripts)
+# and arm() enables them all again before each run.
+
+records = None
+# entry point (file address) of the binary and load bias, for address breakpoints
+entry = None
+bias = None
+addresses = []
+collectors = []
+# breakpoints hit since the last stop, disabled by their commands (breakpoints cannot be changed in stop())
+hits = []
+
+
+class CollectorBreakpoint(gdb.Breakpoint):
+    def __init__(self, spec):
+        super().__init__(spec, internal=True)
+        # disable the breakpoint and continue, without printing the stop location
+        self.commands = "silent\npython gdb_collector.disable_hits()\ncontinue"
+
+    def stop(self):
+        frame = gdb.selected_frame()
+        sal = frame.find_sal()
+        record = {"f": frame.name(), "s": sal.symtab.fullname() if sal.symtab else None, "l": sal.line, "v": frame_locals(frame)}
+        if bias is not None:
+            record["pc"] = frame.pc() - bias
+        write(record)
+        hits.append(self)
+        return True
+
+
+def disable_hits():
+    for collector in hits:
+        collector.enabled = False
+    hits.clear()
+
+
+def frame_locals(frame):
+    """Return whether each local of a frame is optimized out, with the blocks of "info locals"
+    (from the innermost block to the function block, arguments excluded).
+    As in "info locals", a local is optimized out only if the whole value is (printed as "<optimized out>"):
+    structs and arrays with some optimized out members are available. Shadowed locals are optimized out
+    only if all of them are; values that cannot be read are available, as the "<error: ...>" values.
+
+    Args:
+        frame (gdb.Frame): stopped frame
+
+    Returns:
+        dict: {<local>: <0|1 optimized out>}
+    """
+    variables = {}
+    try:
+        block = frame.block()
+    except RuntimeError:
+        return variables
+    while block is not None:
+        for symbol in block:
+            if not symbol.is_variable:
+                continue
+            optimized_out = 1
+            if symbol.addr_class != gdb.SYMBOL_LOC_OPTIMIZED_OUT:
+                try:
+                    value = symbol.value(frame)
+                    # is_optimized_out is also set when only a part of the value is, only those values are formatted
+                    optimized_out = int(value.is_optimized_out and str(value) == "<optimized out>")
+                except gdb.error:
+                    optimized_out = 0
+            variables[symbol.name] = variables.get(symbol.name, 1) & optimized_out
+        if block.function is not None:
+            break
+        block = block.superblock
+    return variables
+
+
+def write(record):
+    records.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+
+def on_stop(event):
+    if isinstance(event, gdb.SignalEvent):
+        write({"signal": event.stop_signal})
+
+
+def set_breakpoints(locations):
+    for location in locations:
+        try:
+            collectors.append(CollectorBreakpoint(location))
+        except gdb.error:
+            pass
+
+
+def start(locations_path, records_path, entry_point=None):
+    """Open the records file and set a collector breakpoint on each location (one linespec per line),
+    or keep the addresses (one "*<file address>" per line) set by relocate().
+
+    Args:
+        locations_path (str): locations filepath
+        records_path (str): records filepath
+        entry_point (int): entry point (file address) of the binary, for address breakpoints
+            (None for linespecs, the records have no pc)
+    """
+    global records, entry, addresses
+    records = open(records_path, "w", buffering=1)
+    gdb.events.stop.connect(on_stop)
+    with open(locations_path) as f:
+        locations = [location for location in f.read().split("\n") if location]
+    if entry_point is None:
+        set_breakpoints(locations)
+    else:
+        entry = entry_point
+        addresses = [int(location[1:], 16) for location in locations]
+
+
+def relocate():
+    """Set the address breakpoints at the addresses where the binary is loaded, when the process is started
+    (starti): the load bias is the entry point of the process (AT_ENTRY) minus the one of the binary.
+    The breakpoints are set again only if the bias changed since the previous run (address randomization)."""
+    global bias
+    auxv = gdb.execute("info auxv", to_string=True)
+    match = re.search(r"^\d+\s+AT_ENTRY\s.*\s(0x[0-9a-f]+)\s*$", auxv, re.M)
+    if match is None:
+        raise gdb.GdbError("gdb_collector: cannot read the entry point of the process (AT_ENTRY)")
+    load_bias = int(match.group(1), 16) - entry
+    if load_bias == bias:
+        return
+    for collector in collectors:
+        if collector.is_valid():
+            collector.delete()
+    collectors.clear()
+    bias = load_bias
+    set_breakpoints("*0x%x" % (address + bias) for address in addresses)
+
+
+def arm(index):
+    """Enable the breakpoints (again) before the run on an input.
+
+    Args:
+        index (int): input index, recorded before the records of the run
+    """
+    for collector in collectors:
+        collector.enabled = True
+    hits.clear()
+    write({"input": index})
@@ -0,0 +1,221 @@
+import importlib
+import os
+import pickle
+import socket
+import sys
+import threading
+import time
+import traceback
+import uuid
+from multiprocessing import Process
+from pathlib import Path
+
+from utils import log
+
+# Claimed jobs whose heartbeat is older than this (seconds) are put back in the queue
+RECLAIM_TIMEOUT = 300
+HEARTBEAT = 30
+POLL = 1
+
+
+def write_atomic(path, data):
+    tmp = path.parent / f".{path.name}.{socket.gethostname()}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class QueuedResult:
+    """Result of a job submitted to a JobQueue, with the same interface of multiprocessing AsyncResult."""
+
+    def __init__(self, callback=None):
+        self.event = threading.Event()
+        self.callback = callback
+        self.value = None
+
+    def set(self, value):
+        self.value = value
+        if value["ok"] and self.callback is not None:
+            self.callback(value["result"])
+        self.event.set()
+
+    def ready(self):
+        return self.event.is_set()
+
+    def get(self, timeout=None):
+        if not self.event.wait(timeout):
+            raise TimeoutError()
+        if not self.value["ok"]:
+            raise RuntimeError(f"{self.value['worker']}: {self.value['error']}")
+        return self.value["result"]
+
+
+class JobQueue:
+    """Job queue stored in a directory on a filesystem shared by several hosts.
+
+    Jobs are pickled in <queue>/pending. Workers (debugtuner.py worker) claim a job by atomically renaming
+    it to <queue>/claimed, keep touching it while it runs and write its result to <queue>/done.
+    Jobs claimed by workers that stopped updating them (e.g. crashed hosts) are put back in pending.
+    Job functions are referenced by name (e.g. traces.compute_single_trace) and the paths in their arguments
+    must be valid on every host.
+
+    It can replace a multiprocessing Pool: apply_async(), close() and join() have the same semantics.
+
+    Args:
+        root (Path): queue directory
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        for d in ("pending", "claimed", "done"):
+            (self.root / d).mkdir(parents=True, exist_ok=True)
+        self.results = {}
+        self.lock = threading.Lock()
+        self.closed = False
+        self.poller = threading.Thread(target=self.poll, daemon=True)
+        self.poller.start()
+
+    def apply_async(self, func, args=(), callback=None, key=None):
+        job_id = uuid.uuid4().hex
+        result = QueuedResult(callback)
+        with self.lock:
+            self.results[job_id] = result
+        # stage scripts may be run as __main__, workers import them by filename
+        name = f"{Path(sys.modules[func.__module__].__file__).stem}.{func.__qualname__}"
+        write_atomic(self.root / "pending" / f"{job_id}.pickle", {"func": name, "args": args})
+        log.debug(f"[queue] {job_id}: {name} submitted.")
+        return result
+
+    def poll(self):
+        while True:
+            with self.lock:
+                waiting = [(job_id, r) for job_id, r in self.results.items() if not r.ready()]
+            if self.closed and not waiting:
+                return
+            for job_id, result in waiting:
+                path = self.root / "done" / f"{job_id}.pickle"
+                if path.is_file():
+                    with open(path, "rb") as f:
+                        value = pickle.load(f)
+                    path.unlink()
+                    log.debug(f"[queue] {job_id}: completed by {value['worker']}.")
+                    try:
+                        result.set(value)
+                    except Exception as e:
+                        value = {"ok": False, "error": f"callback failed: {e!r}", "worker": value["worker"]}
+                        result.value = value
+                        result.event.set()
+            reclaim(self.root)
+            time.sleep(POLL)
+
+    def close(self):
+        self.closed = True
+
+    def join(self):
+        self.poller.join()
+
+    def terminate(self):
+        self.closed = True
+
+
+def reclaim(root, timeout=RECLAIM_TIMEOUT):
+    """Put back in the queue the claimed jobs whose worker stopped updating them."""
+    now = time.time()
+    for path in (root / "claimed").iterdir():
+        try:
+            if now - path.stat().st_mtime > timeout:
+                job_id = path.name.split(".")[0]
+                os.rename(path, root / "pending" / f"{job_id}.pickle")
+                log.info(f"[queue] {job_id}: worker {path.name.split('.', 1)[1]} timed out, job reclaimed.")
+        except OSError:
+            # already completed or reclaimed by someone else
+            continue
+
+
+def mtime(path):
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return 0
+
+
+def claim(root, worker):
+    """Atomically claim the oldest pending job. Return the claimed job path or None."""
+    for path in sorted((root / "pending").glob("*.pickle"), key=mtime):
+        claimed = root / "claimed" / f"{path.stem}.{worker}"
+        try:
+            os.rename(path, claimed)
+            os.utime(claimed)
+        except OSError:
+            # claimed by another worker
+            continue
+        return claimed
+    return None
+
+
+def heartbeat(path, stop):
+    while not stop.wait(HEARTBEAT):
+        try:
+            os.utime(path)
+        except OSError:
+            return
+
+
+def run_job(root, claimed, worker):
+    job_id = claimed.name.split(".")[0]
+    try:
+        with open(claimed, "rb") as f:
+            job = pickle.load(f)
+    except OSError:
+        # reclaimed before it started
+        return
+
+    stop = threading.Event()
+    threading.Thread(target=heartbeat, args=(claimed, stop), daemon=True).start()
+    log.info(f"[worker {worker}] {job_id}: {job['func']} started.")
+    try:
+        module, func = job["func"].rsplit(".", 1)
+        result = {"ok": True, "result": getattr(importlib.import_module(module), func)(*job["args"])}
+    except (Exception, SystemExit) as e:
+        result = {"ok": False, "error": "".join(traceback.format_exception(type(e), e, e.__traceback__))}
+    finally:
+        stop.set()
+    result["worker"] = worker
+
+    write_atomic(root / "done" / f"{job_id}.pickle", result)
+    try:
+        claimed.unlink()
+    except OSError:
+        pass
+    log.info(f"[worker {worker}] {job_id}: {job['func']} {'completed' if result['ok'] else 'failed'}.")
+
+
+def work(root, max_idle=0):
+    """Claim and run jobs until no job is found for max_idle seconds (0 to run forever)."""
+    worker = f"{socket.gethostname()}-{os.getpid()}"
+    idle = time.time()
+    while True:
+        claimed = claim(root, worker)
+        if claimed is None:
+            if max_idle and time.time() - idle > max_idle:
+                log.info(f"[worker {worker}] idle for {max_idle} seconds, exiting.")
+                return
+            reclaim(root)
+            time.sleep(POLL)
+            continue
+        run_job(root, claimed, worker)
+        idle = time.time()
+
+
+def start_workers(root, proc, max_idle=0):
+    """Run proc workers on this host."""
+    root = Path(root)
+    for d in ("pending", "claimed", "done"):
+        (root / d).mkdir(parents=True, exist_ok=True)
+    workers = [Process(target=work, args=(root, max_idle)) for _ in range(proc)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
@@ -0,0 +1,121 @@
+import json
+
+import lldb
+
+# Breakpoint collector loaded in lldb by the tracer (utils/tracer.py) in place of the breakpoint command lists
+# ("frame var" and the locals type analysis):
+#   command script import <utils>/lldb_collector.py
+#   script lldb_collector.start(lldb.debugger, <locations file>, <records file>, <address breakpoints>)
+#   script lldb_collector.arm(<input index>)
+#   run <input>
+#   script lldb_collector.done()
+# A SB-API callback on every breakpoint reads the variables of the stopped SBFrame (values are never formatted)
+# and streams newline-delimited JSON records to the records file:
+#   {"input": <index>}                                        before each run
+#   {"f": <function>, "s": <source>, "l": <line>, "v": {<variable>: <0 available|1 optimized out|2 not available>}
+#    [, "pc": <file address>]}
+#   {"signal": <signal name>}                                 when the inferior is stopped by a signal
+# The callback disables the breakpoint (one record per location and run), arm() enables them again.
+
+session = None
+records = None
+address_breakpoints = False
+collectors = []
+
+# Error messages of the variables that are not available, as printed by "frame var"
+NOT_AVAILABLE = ("not available", "empty constant data", "could not evaluate")
+
+
+def variable_status(value):
+    """Return the status of a variable from the error of its SBValue (0 available, 1 optimized out, 2 not available)."""
+    error = value.GetError()
+    message = (error.GetCString() or "") if error.Fail() else ""
+    if "optimized out" in message:
+        return 1
+    if any(reason in message for reason in NOT_AVAILABLE):
+        return 2
+    return 0
+
+
+def on_hit(frame, bp_loc, internal_dict):
+    variables = {}
+    # arguments, locals, statics, in scope only
+    for value in frame.GetVariables(True, True, True, True):
+        name = value.GetName()
+        status = variable_status(value)
+        # shadowed variables are available if one of them is
+        variables[name] = min(variables.get(name, status), status)
+
+    line_entry = frame.GetLineEntry()
+    file_spec = line_entry.GetFileSpec()
+    record = {
+        "f": frame.GetFunctionName(),
+        "s": file_spec.fullpath if file_spec.IsValid() else None,
+        "l": line_entry.GetLine(),
+        "v": variables,
+    }
+    if address_breakpoints:
+        record["pc"] = frame.GetPCAddress().GetFileAddress()
+    write(record)
+
+    bp_loc.GetBreakpoint().SetEnabled(False)
+    # do not stop
+    return False
+
+
+def write(record):
+    records.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+
+def start(debugger, locations_path, records_path, addresses=False):
+    """Set a breakpoint with the collector callback on each location and open the records file.
+
+    Args:
+        debugger (lldb.SBDebugger): debugger of the session
+        locations_path (str): locations filepath, one "<source>:<line>" or "*<file address>" per line
+        records_path (str): records filepath
+        addresses (bool): the locations are file addresses, whose pc is added to the records
+    """
+    global session, records, address_breakpoints
+    session = debugger
+    records = open(records_path, "w", buffering=1)
+    address_breakpoints = addresses
+    target = debugger.GetSelectedTarget()
+    with open(locations_path) as f:
+        for location in f.read().split("\n"):
+            if not location:
+                continue
+            if location.startswith("*"):
+                # section offset address, relocated when the binary is loaded
+                bp = target.BreakpointCreateBySBAddress(target.ResolveFileAddress(int(location[1:], 16)))
+            else:
+                source, line = location.rsplit(":", 1)
+                bp = target.BreakpointCreateByLocation(source, int(line))
+            if bp.IsValid():
+                bp.SetScriptCallbackFunction("lldb_collector.on_hit")
+                collectors.append(bp)
+
+
+def arm(index):
+    """Enable the breakpoints (again) before the run on an input.
+
+    Args:
+        index (int): input index, recorded before the records of the run
+    """
+    for bp in collectors:
+        bp.SetEnabled(True)
+    write({"input": index})
+
+
+def done():
+    """Record the signal that stopped the last run, if any, and kill its process."""
+    process = session.GetSelectedTarget().GetProcess()
+    if not process.IsValid():
+        return
+    if process.GetState() == lldb.eStateStopped:
+        for thread in process:
+            if thread.GetStopReason() == lldb.eStopReasonSignal:
+                signal = thread.GetStopReasonDataAtIndex(0)
+                write({"signal": process.GetUnixSignals().GetSignalAsCString(signal)})
+                break
+    process.Kill()
@@ -1,4 +1,13 @@
+import gzip
 import logging
+import logging.handlers
+import multiprocessing
+import re
+from contextlib import contextmanager
+from pathlib import Path
+
+# Prefix added by init() to the messages of the stages run as commands, e.g. "[1234|2024-01-01 10:00:00,000] "
+PREFIX = re.compile(r"\[[^]]*\] ")
 
 
 def init(args):
@@ -6,6 +15,108 @@ def init(args):
     logging.basicConfig(format="[%(process)d|%(asctime)s] %(message)s", level=level)
 
 
+class LogSink:
+    """Write log lines to a file as they are produced.
+
+    When the file exceeds max_size bytes (uncompressed), it is rotated: <log>.1, <log>.2, ... are the older parts.
+    With compression, each part is gzipped while it is written (<log>.gz, <log>.1.gz, ...),
+    so the log is never read or rewritten a second time.
+
+    Args:
+        path (Path): log filepath
+        max_size (int): rotation size in bytes, 0 to disable rotation
+        compress (bool): gzip the log
+        strip_prefix (bool): remove the first "[...] " from each line (seed and date of the stages run as commands)
+    """
+
+    def __init__(self, path, max_size=0, compress=False, strip_prefix=False):
+        self.path = Path(path)
+        self.max_size = max_size
+        self.compress = compress
+        self.strip_prefix = strip_prefix
+        self.parts = 0
+        self.file = self.open(self.part_path(None))
+
+    def part_path(self, part):
+        name = self.path.name if part is None else f"{self.path.name}.{part}"
+        return self.path.with_name(f"{name}.gz" if self.compress else name)
+
+    def open(self, path):
+        self.size = 0
+        if self.compress:
+            return gzip.open(path, "wt", errors="replace")
+        return open(path, "w", buffering=1, errors="replace")
+
+    def rotate(self):
+        self.file.close()
+        self.parts += 1
+        self.part_path(None).rename(self.part_path(self.parts))
+        self.file = self.open(self.part_path(None))
+
+    def write(self, line):
+        if self.strip_prefix:
+            line = PREFIX.sub("", line, count=1)
+        if self.max_size and self.size and self.size + len(line) > self.max_size:
+            self.rotate()
+        self.file.write(line)
+        self.size += len(line)
+
+    def close(self):
+        self.file.close()
+
+
+class SinkHandler(logging.Handler):
+    """Logging handler writing the formatted records to a LogSink."""
+
+    def __init__(self, sink):
+        super().__init__()
+        self.sink = sink
+
+    def emit(self, record):
+        try:
+            self.sink.write(self.format(record) + "\n")
+        except Exception:
+            self.handleError(record)
+
+
+@contextmanager
+def to_file(log_file, debug=False, max_size=0, compress=False):
+    """Redirect the log messages of the current process to log_file.
+
+    Used when a stage runs inside a pipeline worker instead of a dedicated process,
+    seed and date are not written, like in the logs of the stages run as commands.
+    Records are sent through a queue to a single writer, so that the processes forked
+    by the stage (e.g. the pool computing the traces) log to the same file.
+
+    Args:
+        log_file (Path): log filepath
+        debug (bool): enable debug prints
+        max_size (int): rotation size in bytes, 0 to disable rotation
+        compress (bool): gzip the log
+    """
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+
+    sink = LogSink(log_file, max_size, compress)
+    handler = SinkHandler(sink)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    queue = multiprocessing.Queue()
+    listener = logging.handlers.QueueListener(queue, handler)
+    listener.start()
+
+    root.handlers = [logging.handlers.QueueHandler(queue)]
+    root.setLevel([logging.INFO, logging.DEBUG][debug])
+    try:
+        yield
+    finally:
+        root.handlers = handlers
+        root.setLevel(level)
+        listener.stop()
+        queue.close()
+        queue.join_thread()
+        sink.close()
+
+
 def debug(message):
     logging.debug(message)
 
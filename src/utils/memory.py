@@ -0,0 +1,269 @@
+import json
+import os
+import resource
+import threading
+from collections import deque
+from multiprocessing import Pool, SimpleQueue
+from pathlib import Path
+
+from utils import log
+
+# Memory (kB) left to the system when admitting a new session
+RESERVE = 512 * 1024
+POLL = 5
+# queue of the pool workers, where each task writes its id and the pid of the worker running it
+started = None
+
+
+def mem_available():
+    """Return the memory available for new processes (kB), from /proc/meminfo."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def process_rss(pids):
+    """Return the current RSS (kB) of each process together with its descendants (e.g. a debugger
+    and its inferior), from /proc/<pid>/status.
+
+    Args:
+        pids (dict): {<task id>: <pid>}
+
+    Returns:
+        dict: {<task id>: <RSS>}
+    """
+    children = {}
+    for proc in Path("/proc").iterdir():
+        if not proc.name.isdigit():
+            continue
+        try:
+            ppid = int((proc / "stat").read_text().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(proc.name))
+
+    rss = {}
+    for task_id, pid in pids.items():
+        total = 0
+        stack = [pid]
+        while stack:
+            current = stack.pop()
+            stack.extend(children.get(current, ()))
+            try:
+                with open(f"/proc/{current}/status") as f:
+                    for line in f:
+                        if line.startswith("VmRSS:"):
+                            total += int(line.split()[1])
+                            break
+            except OSError:
+                continue
+        rss[task_id] = total
+    return rss
+
+
+def init_worker(queue):
+    global started
+    started = queue
+
+
+def measure(task_id, func, args):
+    """Run func in a pool worker and return its result and the peak RSS (kB) of the worker and of its children.
+    Pool workers run a single task (maxtasksperchild=1), so the peak refers to this task only."""
+    started.put((task_id, os.getpid()))
+    result = func(*args)
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    return result, peak
+
+
+class MemoryResult:
+    """Result of a task submitted to a MemoryPool, with the same interface of multiprocessing AsyncResult."""
+
+    def __init__(self, callback=None):
+        self.event = threading.Event()
+        self.callback = callback
+        self.value = None
+        self.error = None
+
+    def ready(self):
+        return self.event.is_set()
+
+    def get(self, timeout=None):
+        if not self.event.wait(timeout):
+            raise TimeoutError()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class MemoryPool:
+    """Process pool that starts a new task only if its estimated peak RSS fits in memory.
+
+    A task is admitted when fewer than processes tasks are running and its estimate fits both
+    in the budget (together with the running tasks) and in the memory currently available (MemAvailable)
+    minus the headroom of the running tasks, i.e. the memory they are still expected to use (estimate
+    minus current RSS). The RSS of the running tasks (worker and descendants) is measured live, so a task
+    growing past its estimate counts with its actual RSS. A task is always admitted when nothing else is
+    running, so parallelism goes down instead of the pipeline failing. Estimates are the peaks measured for the same key
+    (e.g. the binary configuration) in previous runs, stored in a json history file; unknown keys
+    use the peak of the -standard configuration of the same optimization level or, if not measured,
+    the largest peak in the history.
+
+    It can replace a multiprocessing Pool: apply_async(), close() and join() have the same semantics.
+
+    Args:
+        processes (int): maximum number of tasks running at the same time
+        budget (int): memory budget in kB, 0 to use only the available memory
+        history (Path): json file with the peak RSS (kB) of each key
+    """
+
+    def __init__(self, processes, budget=0, history=None):
+        self.processes = max(1, processes)
+        self.budget = budget
+        self.history_path = history
+        self.history = {}
+        if history is not None and Path(history).is_file():
+            with open(history) as f:
+                self.history = json.load(f)
+        self.started = SimpleQueue()
+        self.pool = Pool(
+            processes=self.processes, maxtasksperchild=1, initializer=init_worker, initargs=(self.started,)
+        )
+        self.cond = threading.Condition()
+        self.waiting = deque()
+        self.running = {}
+        # pid of the worker running each task, read from the started queue
+        self.pids = {}
+        self.closed = False
+        self.dispatcher = threading.Thread(target=self.dispatch, daemon=True)
+        self.dispatcher.start()
+
+    def estimate(self, key):
+        if key in self.history:
+            return self.history[key]
+        if key is not None and "-O" in key:
+            standard = f"{key.rsplit('-O', 1)[0]}-O{key.rsplit('-O', 1)[1][0]}-standard"
+            if standard in self.history:
+                return self.history[standard]
+        return max(self.history.values(), default=0)
+
+    def admissible(self, estimate):
+        if not self.running:
+            return True
+        if len(self.running) >= self.processes:
+            return False
+        while not self.started.empty():
+            task_id, pid = self.started.get()
+            if task_id in self.running:
+                self.pids[task_id] = pid
+        rss = process_rss({task_id: pid for task_id, pid in self.pids.items() if task_id in self.running})
+        if self.budget and sum(max(e, rss.get(t, 0)) for t, e in self.running.items()) + estimate > self.budget:
+            return False
+        available = mem_available()
+        if available is None:
+            return True
+        # memory the running tasks are still expected to allocate (tasks not started yet count with their estimate)
+        headroom = sum(max(e - rss.get(t, 0), 0) for t, e in self.running.items())
+        return estimate + headroom <= available - RESERVE
+
+    def apply_async(self, func, args=(), callback=None, key=None):
+        result = MemoryResult(callback)
+        with self.cond:
+            self.waiting.append((key, func, args, result))
+            self.cond.notify_all()
+        return result
+
+    def apply(self, func, args=(), key=None):
+        return self.apply_async(func, args, key=key).get()
+
+    def dispatch(self):
+        task_id = 0
+        while True:
+            with self.cond:
+                throttled = False
+                while True:
+                    if self.waiting:
+                        estimate = self.estimate(self.waiting[0][0])
+                        if self.admissible(estimate):
+                            break
+                        if not throttled and len(self.running) < self.processes:
+                            log.info(
+                                f"[memory] {self.waiting[0][0]} (estimate {estimate // 1024} MiB) waiting for memory, "
+                                f"{len(self.running)} tasks running."
+                            )
+                            throttled = True
+                    elif self.closed and not self.running:
+                        return
+                    # re-check periodically, the available memory changes while tasks run
+                    self.cond.wait(POLL)
+                key, func, args, result = self.waiting.popleft()
+                task_id += 1
+                self.running[task_id] = estimate
+                log.debug(f"[memory] {key} admitted (estimate {estimate // 1024} MiB, {len(self.running)} running).")
+
+            self.pool.apply_async(
+                measure,
+                (task_id, func, args),
+                callback=self.completed(task_id, key, result),
+                error_callback=self.failed(task_id, result),
+            )
+
+    def completed(self, task_id, key, result):
+        def callback(value):
+            value, peak = value
+            with self.cond:
+                del self.running[task_id]
+                self.pids.pop(task_id, None)
+                if key is not None:
+                    self.history[key] = peak
+                self.cond.notify_all()
+            try:
+                if result.callback is not None:
+                    result.callback(value)
+                result.value = value
+            except Exception as e:
+                result.error = e
+            result.event.set()
+
+        return callback
+
+    def failed(self, task_id, result):
+        def callback(error):
+            with self.cond:
+                del self.running[task_id]
+                self.pids.pop(task_id, None)
+                self.cond.notify_all()
+            result.error = error
+            result.event.set()
+
+        return callback
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def join(self):
+        self.dispatcher.join()
+        self.pool.close()
+        self.pool.join()
+        self.save()
+
+    def terminate(self):
+        self.close()
+        self.pool.terminate()
+
+    def save(self):
+        if self.history_path is None:
+            return
+        tmp = f"{self.history_path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.history, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.history_path)
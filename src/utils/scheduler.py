@@ -0,0 +1,162 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from utils import log
+
+
+class Job:
+    """A unit of work of the pipeline, e.g. the traces stage of one fuzz target.
+
+    Args:
+        name (str): unique job name
+        func (callable): function executed by the job
+        args (tuple): positional arguments of func
+        deps (list): names of the jobs that must complete before this one
+        cpus (int): number of cpus the job uses
+        priority (int): jobs with higher priority are started first
+        fingerprint (callable): returns the fingerprint of the job inputs, None if the job is always run
+        outputs (list): paths that must exist for the job to be up to date
+    """
+
+    def __init__(self, name, func, args=(), deps=(), cpus=1, priority=0, fingerprint=None, outputs=()):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.deps = list(deps)
+        self.cpus = cpus
+        self.priority = priority
+        self.fingerprint = fingerprint
+        self.outputs = list(outputs)
+
+
+class Scheduler:
+    """Run a DAG of jobs concurrently without exceeding a global cpu budget.
+
+    A job is started as soon as all its dependencies are completed and enough cpus are free.
+    Dependencies on jobs that are not part of the DAG (e.g. stages not selected) are ignored.
+    If a job fails, all the jobs depending on it are skipped, while independent jobs keep running.
+    If a manifest is given, jobs whose inputs did not change since their last completion are not run again.
+    If a checkpoint is given, the status of each job is recorded and, when resuming, jobs completed
+    in a previous run are not run again.
+
+    Args:
+        budget (int): number of cpus available
+        manifest (Manifest): fingerprints of the completed jobs
+        checkpoint (Checkpoint): persistent state of the jobs
+        resume (bool): skip the jobs completed in a previous run
+    """
+
+    def __init__(self, budget, manifest=None, checkpoint=None, resume=False):
+        self.budget = max(1, budget)
+        self.manifest = manifest
+        self.checkpoint = checkpoint
+        self.resume = resume
+        self.jobs = {}
+
+    def add(self, job):
+        if job.name in self.jobs:
+            log.info(f"[scheduler] Error: duplicated job {job.name}.")
+            exit(1)
+        self.jobs[job.name] = job
+        return job
+
+    def run(self):
+        """Run all the jobs and return the names of the failed or skipped ones.
+
+        Returns:
+            list: names of the jobs not completed
+        """
+        deps = {name: {d for d in job.deps if d in self.jobs} for name, job in self.jobs.items()}
+        dependents = {name: [] for name in self.jobs}
+        for name in self.jobs:
+            for d in deps[name]:
+                dependents[d].append(name)
+
+        order = {name: i for i, name in enumerate(self.jobs)}
+        pending = set(self.jobs)
+        running = {}
+        failed = []
+        free = self.budget
+
+        def skip(name):
+            for d in dependents[name]:
+                if d in pending:
+                    log.info(f"[scheduler] {d} skipped: {name} not completed.")
+                    pending.remove(d)
+                    failed.append(d)
+                    skip(d)
+
+        def complete(name):
+            for d in dependents[name]:
+                deps[d].discard(name)
+
+        def execute(job):
+            # The fingerprint hashes the inputs of the job (binaries, corpora, sources), so it is computed
+            # in the worker thread, once the dependencies are completed, without delaying the other jobs
+            fingerprint = None
+            if self.manifest is not None and job.fingerprint is not None:
+                try:
+                    fingerprint = job.fingerprint()
+                except Exception as e:
+                    raise RuntimeError(f"cannot compute fingerprint {e!r}") from e
+                if self.manifest.is_fresh(job.name, fingerprint, job.outputs):
+                    return fingerprint, False
+            if self.checkpoint is not None:
+                self.checkpoint.job_started(job.name)
+            job.func(*job.args)
+            return fingerprint, True
+
+        with ThreadPoolExecutor(max_workers=len(self.jobs) or 1) as executor:
+            while pending or running:
+                ready = sorted(
+                    (name for name in pending if not deps[name]),
+                    key=lambda name: (-self.jobs[name].priority, order[name]),
+                )
+                up_to_date = False
+                for name in ready:
+                    job = self.jobs[name]
+
+                    if self.resume and self.checkpoint is not None and self.checkpoint.is_done(name):
+                        log.info(f"[scheduler] {name} skipped: completed in a previous run.")
+                        pending.remove(name)
+                        complete(name)
+                        up_to_date = True
+                        continue
+
+                    cpus = min(job.cpus, self.budget)
+                    if cpus > free:
+                        continue
+                    free -= cpus
+                    pending.remove(name)
+                    log.debug(f"[scheduler] {name} started ({cpus} cpus).")
+                    running[executor.submit(execute, job)] = (name, cpus)
+
+                if up_to_date:
+                    continue
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, cpus = running.pop(future)
+                    free += cpus
+                    try:
+                        fingerprint, ran = future.result()
+                    except Exception as e:
+                        log.info(f"[scheduler] {name} failed: {e!r}")
+                        if self.checkpoint is not None:
+                            self.checkpoint.job_failed(name, repr(e))
+                        failed.append(name)
+                        skip(name)
+                        continue
+                    if not ran:
+                        log.info(f"[scheduler] {name} skipped: up to date.")
+                        complete(name)
+                        continue
+                    log.debug(f"[scheduler] {name} completed.")
+                    if fingerprint is not None:
+                        self.manifest.record(name, fingerprint)
+                    if self.checkpoint is not None:
+                        self.checkpoint.job_done(name, self.jobs[name].outputs)
+                    complete(name)
+
+        return failed
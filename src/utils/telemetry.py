@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import resource
+import subprocess
+import threading
+import time
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+from contextlib import contextmanager
+from pathlib import Path
+
+# Telemetry records are appended to the JSONL file in this env var (inherited by workers and commands)
+TELEMETRY_ENV = "DT_TELEMETRY"
+
+IO_FIELDS = ("rchar", "wchar", "read_bytes", "write_bytes")
+
+
+def enable(path):
+    """Append the telemetry records of this process and of its children to path."""
+    os.environ[TELEMETRY_ENV] = str(path)
+
+
+def enabled():
+    return bool(os.environ.get(TELEMETRY_ENV))
+
+
+def read_io(pid="self"):
+    """Return the I/O counters of a process. Terminated children waited by the process are included."""
+    counters = dict.fromkeys(IO_FIELDS, 0)
+    try:
+        with open(f"/proc/{pid}/io") as f:
+            for line in f:
+                key, value = line.split(":")
+                if key in counters:
+                    counters[key] = int(value)
+    except OSError:
+        pass
+    return counters
+
+
+def write(record):
+    """Append a record to the telemetry file. Each record is written with a single append."""
+    path = os.environ.get(TELEMETRY_ENV)
+    if not path:
+        return
+    line = json.dumps(record, default=str) + "\n"
+    with open(path, "a") as f:
+        f.write(line)
+
+
+def usage_record(name, cat, start, wall, cpu, maxrss, io, counters):
+    return {
+        "name": name,
+        "cat": cat,
+        "pid": os.getpid(),
+        "tid": threading.get_native_id(),
+        "ts": start,
+        "wall": round(wall, 6),
+        "cpu": round(cpu, 6),
+        "maxrss_kb": maxrss,
+        **io,
+        "counters": counters,
+    }
+
+
+@contextmanager
+def span(name, cat, **counters):
+    """Record the resources used by a block of code.
+
+    The record contains wall time, cpu time (of the process and of the children terminated in the block),
+    peak RSS (of the process and of its terminated children, so far), bytes read and written and the counters
+    set by the block, e.g.
+
+        with telemetry.span("static", "polish", fuzz_target=t) as counters:
+            counters["sources"] = len(sources)
+
+    Spans of the same process are assumed to be sequential (e.g. one stage per worker process),
+    concurrent commands should be run with run_cmd to account their usage precisely.
+
+    Args:
+        name (str): span name, e.g. the job or the binary name
+        cat (str): span category, e.g. job, debugger, ast, polish, metrics
+        counters: initial counters
+
+    Yields:
+        dict: counters recorded with the span
+    """
+    if not enabled():
+        yield counters
+        return
+
+    start = time.time()
+    wall_start = time.perf_counter()
+    self_start = resource.getrusage(resource.RUSAGE_SELF)
+    children_start = resource.getrusage(resource.RUSAGE_CHILDREN)
+    io_start = read_io()
+    try:
+        yield counters
+    finally:
+        wall = time.perf_counter() - wall_start
+        self_end = resource.getrusage(resource.RUSAGE_SELF)
+        children_end = resource.getrusage(resource.RUSAGE_CHILDREN)
+        io_end = read_io()
+        cpu = (
+            self_end.ru_utime
+            + self_end.ru_stime
+            - self_start.ru_utime
+            - self_start.ru_stime
+            + children_end.ru_utime
+            + children_end.ru_stime
+            - children_start.ru_utime
+            - children_start.ru_stime
+        )
+        maxrss = max(self_end.ru_maxrss, children_end.ru_maxrss)
+        io = {key: io_end[key] - io_start[key] for key in IO_FIELDS}
+        write(usage_record(name, cat, start, wall, cpu, maxrss, io, counters))
+
+
+def run_cmd(name, cat, cmd, on_line=None, **kwargs):
+    """Run a command like subprocess.run (without capturing its output) and record its exact resource usage.
+
+    The usage is read from the terminated child before it is reaped, so commands run
+    concurrently by different threads of the same process are accounted separately.
+
+    Args:
+        name (str): span name
+        cat (str): span category
+        cmd (list): command
+        on_line (callable): if set, called with each line of the command stdout as soon as it is written
+        kwargs: arguments of subprocess.Popen
+
+    Returns:
+        subprocess.CompletedProcess: completed process
+    """
+    start = time.time()
+    wall_start = time.perf_counter()
+    if on_line is not None:
+        kwargs.update(stdout=subprocess.PIPE, text=True, errors="replace")
+    with subprocess.Popen(cmd, **kwargs) as process:
+        if on_line is not None:
+            for line in process.stdout:
+                on_line(line)
+        # wait for termination without reaping the child, so that its I/O counters are still readable
+        os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+        io = read_io(process.pid)
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+    wall = time.perf_counter() - wall_start
+
+    cpu = usage.ru_utime + usage.ru_stime
+    write(usage_record(name, cat, start, wall, cpu, usage.ru_maxrss, io, {"returncode": process.returncode}))
+    return subprocess.CompletedProcess(cmd, process.returncode)
+
+
+def load(paths):
+    """Load the telemetry records of one or more JSONL files."""
+    records = []
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # interrupted runs may leave a partial line
+                        continue
+    return records
+
+
+def to_chrome_trace(records):
+    """Convert telemetry records in the Chrome trace-event format (chrome://tracing, Perfetto).
+
+    Args:
+        records (list): telemetry records
+
+    Returns:
+        dict: trace events
+    """
+    events = []
+    for r in records:
+        args = {key: value for key, value in r.items() if key not in ("name", "cat", "pid", "tid", "ts", "wall")}
+        events.append(
+            {
+                "name": r["name"],
+                "cat": r["cat"],
+                "ph": "X",
+                "ts": int(r["ts"] * 1e6),
+                "dur": int(r["wall"] * 1e6),
+                "pid": r["pid"],
+                "tid": r["tid"],
+                "args": args,
+            }
+        )
+    events.sort(key=lambda e: e["ts"])
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def summary(records, top):
+    """Return the per-category totals and the slowest spans of each category.
+
+    Args:
+        records (list): telemetry records
+        top (int): number of spans reported per category
+
+    Returns:
+        str: summary
+    """
+    categories = {}
+    for r in records:
+        categories.setdefault(r["cat"], []).append(r)
+
+    lines = []
+    for cat, spans in sorted(categories.items(), key=lambda c: -sum(r["wall"] for r in c[1])):
+        wall = sum(r["wall"] for r in spans)
+        cpu = sum(r["cpu"] for r in spans)
+        lines.append(f"[{cat}] {len(spans)} spans, wall {wall:.1f} s, cpu {cpu:.1f} s")
+        for r in sorted(spans, key=lambda r: -r["wall"])[:top]:
+            # the peak RSS of build steps is not available
+            maxrss = "n/a" if r["maxrss_kb"] is None else f"{r['maxrss_kb'] / 1024:.0f} MiB"
+            lines.append(
+                f"    {r['name']}: wall {r['wall']:.1f} s, cpu {r['cpu']:.1f} s, "
+                f"maxrss {maxrss}, read {r['rchar'] / 2**20:.0f} MiB, "
+                f"written {r['wchar'] / 2**20:.0f} MiB"
+            )
+    return "\n".join(lines)
+
+
+def main(args):
+    records = load(args.telemetry)
+    if args.chrome is not None:
+        with open(args.chrome, "w") as f:
+            json.dump(to_chrome_trace(records), f)
+    print(summary(records, args.top))
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser(
+        description="Summarize telemetry records and export them in the Chrome trace-event format.",
+        formatter_class=ArgumentDefaultsHelpFormatter,
+    )
+
+    parser.add_argument("telemetry", type=Path, nargs="+", help="Telemetry JSONL files")
+    parser.add_argument("--chrome", dest="chrome", type=Path, help="Chrome trace output filepath", default=None)
+    parser.add_argument("--top", dest="top", type=int, help="Number of slowest spans per category", default=10)
+
+    args = parser.parse_args()
+    main(args)
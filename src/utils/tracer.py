@@ -1,84 +1,164 @@
+import json
+import linecache
+import os
+import signal
+import subprocess
 import sys
+import threading
+import time
 import random
 import tempfile
-import re
 from pathlib import Path
 
+from elftools.elf.elffile import ELFFile
+
 sys.path.append(str(Path(__file__).resolve().parent / ".."))
-from utils import log, run
+from utils import log, telemetry
+
+from config import CACHE_DIR, TIMEOUT
+from utils.cache import file_digest
 
-from config import TIMEOUT
+# Line tables and breakpoint locations of the traced binaries, by binary sha256 (see cache_entry)
+TRACER_CACHE = CACHE_DIR / "tracer"
+CACHE_VERSION = 5
+cache_lock = threading.Lock()
+digests = {}
+entries = {}
 
 
-# ARGS: binary
-DWARF = "llvm-dwarfdump --debug-line %s"
 # ARGS: dbg_script_path - binary
 GDB = "gdb -q -x %s %s"
 LLDB = "lldb -s %s %s"
+# Interval (s) between the checks of the runs started by a debugger session (see run_dbg)
+RUN_POLL = 1
+
+# Debugger sessions collect the variables at each breakpoint with a Python collector loaded in the debugger
+# (gdb_collector.py, lldb_collector.py), which writes newline-delimited JSON records to a file instead of
+# formatting the variables in the debugger output. The binary runs once per input, the breakpoints are set
+# once per session, disabled after their hit and enabled again before each run.
+GDB_COLLECTOR = Path(__file__).resolve().parent / "gdb_collector.py"
+LLDB_COLLECTOR = Path(__file__).resolve().parent / "lldb_collector.py"
 
 # When pagination is ON, GDB pauses at end of each screenful of its output and asks you whether to continue.
 # Turning pagination off is an alternative to "set height unlimited".
 # Setting width to "unlimited" prevents GDB from wrapping its output.
-# Setting filename-display to absolute prints out the absolute path to the source file
-# ARGS: gdb script, input file
-GDB_SCRIPT_TEMPLATE = """python gdb.events.exited.connect(lambda x : gdb.execute("quit"))
-set pagination off
+# ARGS: collector directory, locations file, records file, entry point (None for linespecs), gdb runs
+GDB_SCRIPT_TEMPLATE = """set pagination off
 set style enabled off
-set filename-display absolute
+set confirm off
+set width unlimited
+python import sys; sys.path.insert(0, %r); import gdb_collector
+python gdb_collector.start(%r, %r, %r)
 
 %s
+quit
+"""
 
-set width unlimited
+# ARGS: input index, input file
+GDB_RUN_TEMPLATE = """python gdb_collector.arm(%d)
 run %s
-quit
 """
 
-# ARGS: break/tbreak, source, line
-GDB_BP_TEMPLATE = """%s %s:%d
-commands
-    info locals
-    continue
-end
+# Address breakpoints are set once the binary is loaded (see gdb_collector.relocate())
+# ARGS: input index, input file
+GDB_ADDRESS_RUN_TEMPLATE = """python gdb_collector.arm(%d)
+starti %s
+python gdb_collector.relocate()
+continue
 """
 
-# Setting the frame-format so that the absolute path to the source file is printed out
-# For some reason, lldb shows ONLY multiple lines with a minimum of 2. The stop line count options set this limit (WTF LLDB)
-# ARGS: lldb script, input file
-# target stop-hook add -o 'script for thread in lldb.process: print("FUCK", thread.GetStopReason())'
+# ARGS: collector, locations file, records file, address breakpoints, lldb runs
 LLDB_SCRIPT_TEMPLATE = """
-settings set frame-format frame #${frame.index}: ${frame.pc}{ ${module.file.basename}{\`${function.name}}}{ at ${line.file.fullpath}:${line.number}}
 settings set target.disable-aslr false
-set set stop-line-count-before 1
-set set stop-line-count-after 0
+settings set auto-confirm true
+command script import %s
+script lldb_collector.start(lldb.debugger, %r, %r, %r)
 
 %s
-
-run %s
-
 quit
 """
-# script import os; os._exit(0)
-
-# The script to print the locals types is here
-# ARGS: break/tbreak, source, line, breakpoint id
-LLDB_BP_TEMPLATE = """%s set --file %s --line %d
-break command add %d
-    frame select
-    frame var
-
-    script locals = {}
-    script for var in list(lldb.frame.arguments) + list(lldb.frame.variables): locals[var.name] = var.type.is_pointer
-    script import json; print(f"[+] Locals type analysis: {json.dumps(locals)}")
-
-    break delete %d
-    continue
-DONE
+
+# ARGS: input index, input file
+LLDB_RUN_TEMPLATE = """script lldb_collector.arm(%d)
+run %s
+script lldb_collector.done()
 """
 
+# Address breakpoints (DT_BREAKPOINTS=address) are set at the addresses of the DWARF line table, so the debugger
+# does not resolve linespecs. The records of the hits have the pc (as a file address), attributed with address_map().
+# lldb relocates file addresses, gdb_collector.py adds the load bias of the binary read when the process starts.
+
+
+def source_path(lineprog, file_index, comp_dir):
+    """Return the absolute path of a file of a line program header (DWARF 2-5).
+
+    Args:
+        lineprog (LineProgram): line program of a CU
+        file_index (int): file register of a row (1-based before DWARF 5, 0-based since DWARF 5)
+        comp_dir (str): DW_AT_comp_dir of the CU
+
+    Returns:
+        str: source path
+    """
+    version = lineprog["version"]
+    files = lineprog["file_entry"]
+    directories = lineprog["include_directory"]
+    file_entry = files[file_index - 1] if version < 5 else files[file_index]
+    name = file_entry.name.decode(errors="replace")
+    if version < 5:
+        # directory 0 is the compilation directory, the others are 1-based
+        directory = comp_dir if file_entry.dir_index == 0 else directories[file_entry.dir_index - 1].decode(errors="replace")
+    else:
+        directory = directories[file_entry.dir_index].decode(errors="replace")
+    return os.path.normpath(os.path.join(comp_dir, directory, name))
+
+
+def line_table(binary):
+    """Decode the .debug_line section of a binary, reading the rows of each CU once.
+    Only statement lines are considered, with the address of the first row of each run of rows of the line.
+
+    Args:
+        binary (Path): binary filepath
+
+    Returns:
+        dict: {<source>: {<line>: [<address>]}}
+    """
+    table = {}
+    with open(binary, "rb") as f:
+        elf = ELFFile(f)
+        if not elf.has_dwarf_info():
+            return table
+        dwarf = elf.get_dwarf_info()
+        for cu in dwarf.iter_CUs():
+            lineprog = dwarf.line_program_for_CU(cu)
+            if lineprog is None:
+                continue
+            comp_dir = cu.get_top_DIE().attributes.get("DW_AT_comp_dir")
+            comp_dir = comp_dir.value.decode(errors="replace") if comp_dir is not None else ""
+            sources = {}  # file register -> source lines
+            previous = None  # (file, line) of the previous row of the sequence
+            for entry in lineprog.get_entries():
+                state = entry.state
+                if state is None:
+                    continue
+                if state.end_sequence:
+                    previous = None
+                    continue
+                if not state.is_stmt or state.line == 0 or (state.file, state.line) == previous:
+                    continue
+                previous = (state.file, state.line)
+                if state.file not in sources:
+                    try:
+                        sources[state.file] = table.setdefault(source_path(lineprog, state.file, comp_dir), {})
+                    except IndexError:
+                        sources[state.file] = {}  # invalid file register
+                sources[state.file].setdefault(state.line, []).append(state.address)
+    table.pop("<built-in>", None)
+    return table
+
 
 def parse_dwarf(binary):
-    """Parse the output of llvm-dwarfdump to extract a dict containing <source>:[<line>]
-    Only statement lines are considered.
+    """Return the statement lines of each source of a binary.
 
     Args:
         binary (Path): binary filepath
@@ -86,220 +166,221 @@ def parse_dwarf(binary):
     Returns:
         dict: <source>:[<line>]
     """
+    return {source: sorted(lines) for source, lines in line_table(binary).items() if lines}
 
-    # Split line tables
-    split_pattern = re.compile(r"debug_line\[0x[0-9a-fA-F]+\]")
-    output = re.split(split_pattern, run.run_cmd(DWARF % (binary), get_output=True))[1:]
-
-    # Get DWARF version
-    dwarf_version = re.search(r"[vV]ersion:\s+(\d)", output[0]).group(1)
-    start_idx = 1 if int(dwarf_version) < 5 else 0
-
-    # Define source and line number patterns:
-    # - source pattern has a group that matches the source code filename and a group that matches the directory index
-    # - directories pattern matches the directory table
-    # - line number pattern has two groups: (<line number>, <source index in the line table prologue>)
-    source_pattern = re.compile(r"file_names\[ *\d+\]:\n +name: \"(.*)\"\n +dir_index: (\d+)")
-    directories_pattern = re.compile(r"include_directories\[ *(\d+)\] = \"(.*)\"")
-    # CA NOTE: for some reason on my pc the llvm-dwarfdump is slighly different and breaks the regex
-    # we need to test which one is correct with the new llvm version in the docker
-    linenumber_pattern = re.compile(r"0x[0-9a-fA-F]+ +(\d+) +\d+ +(\d+)(?: +\d+){2,3} +is_stmt")
-
-    # Extract data
-    source_lines_dict = dict()
-    for table in output:
-        sources = re.findall(source_pattern, table)
-        lines = re.findall(linenumber_pattern, table)
-        directories = {int(direct[0]): direct[1] for direct in re.findall(directories_pattern, table)}
-
-        for i, source in enumerate(sources, start=start_idx):
-            if int(source[1]) in directories:
-                abs_source = f"{directories[int(source[1])]}/{source[0]}"
-            else:
-                abs_source = f"{source[0]}"
 
-            source_lines_dict[abs_source] = [int(l[0]) for l in lines if l[1] == str(i)]
+def binary_digest(binary):
+    """Return the sha256 of a binary, memoized by path, size and modification time."""
+    st = os.stat(binary)
+    key = (str(binary), st.st_size, st.st_mtime_ns)
+    with cache_lock:
+        digest = digests.get(key)
+    if digest is None:
+        digest = file_digest(binary)
+        with cache_lock:
+            digests[key] = digest
+    return digest
 
-    source_lines_dict.pop("<built-in>", None)
-    source_lines_dict = dict((source, list(set(lines))) for source, lines in source_lines_dict.items() if lines)
-    return source_lines_dict
 
-
-def run_dbg(binary, dbg_script, dbg, timeout):
-    """Run a dbg script on a binary and returns the debug trace.
+def cache_entry(binary):
+    """Return the cache entry of a binary, keyed by its content hash: line table and breakpoint locations.
+    Entries are kept in memory and in TRACER_CACHE, so repeated sessions on a binary skip the DWARF decoding.
 
     Args:
         binary (Path): binary filepath
-        dbg_script (str): dbg script
-        dbg (str): debugger
 
     Returns:
-        str: debug trace
+        dict: {"lines": {<source>: {<line>: [<address>]}}, "entry": <entry point file address>,
+            "breakpoints": {<debugger>: [<count>, <locations>]}}
     """
-    output = ""
+    digest = binary_digest(binary)
+    with cache_lock:
+        entry = entries.get(digest)
+    if entry is not None:
+        return entry
+
+    path = TRACER_CACHE / digest[:2] / f"{digest}.json"
+    try:
+        with open(path) as f:
+            entry = json.load(f)
+        if entry.get("version") != CACHE_VERSION:
+            entry = None
+        else:
+            # json keys are strings
+            entry["lines"] = {source: {int(line): addrs for line, addrs in lines.items()} for source, lines in entry["lines"].items()}
+    except (OSError, json.JSONDecodeError):
+        entry = None
+    if entry is None:
+        entry = {"version": CACHE_VERSION, "lines": line_table(binary), "entry": entry_point(binary), "breakpoints": {}}
+        save_entry(path, entry)
+    entry["path"] = path
+    with cache_lock:
+        entries[digest] = entry
+    return entry
 
-    cmd = [GDB, LLDB][dbg == "lldb"]
 
-    with tempfile.TemporaryDirectory() as tmpdir:
+def save_entry(path, entry):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_native_id()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump({key: value for key, value in entry.items() if key not in ("path", "addresses")}, f)
+    tmp.replace(path)
 
-        tmpfile = Path(tmpdir) / f"{str(random.randint(0, 2**32))}.dbg"
-        with open(tmpfile, "w") as f:
-            f.write(dbg_script)
 
-        output = run.run_cmd(cmd % (tmpfile, binary), timeout=timeout, get_output=True)
-    log.debug(output)
-    return output
+def breakpoint_mode():
+    """Return the breakpoint mode set by DT_BREAKPOINTS: "line" (file:line linespecs resolved by the debugger)
+    or "address" (addresses of the DWARF line table, the hits are attributed with address_map())."""
+    mode = os.environ.get("DT_BREAKPOINTS", "line")
+    return mode if mode in ("line", "address") else "line"
 
 
-def parse_trace(trace, dbg):
-    """Parse a debug trace and return variables info.
+def address_map(binary):
+    """Return the source line of each breakpoint address of a binary.
 
     Args:
-        trace (str): debug trace
-        dbg (str): debugger
+        binary (Path): binary filepath
 
     Returns:
-        dict: {<source>:[<line>:{status}]}
+        dict: {<address>: (<source>, <line>)}
     """
-    output = {}
-    functions = {}
-    current_line = None
-    trace_lines = trace.split("\n")
+    entry = cache_entry(binary)
+    with cache_lock:
+        addresses = entry.get("addresses")
+    if addresses is None:
+        addresses = {}
+        for source, lines in entry["lines"].items():
+            for line, line_addresses in lines.items():
+                for address in line_addresses:
+                    addresses.setdefault(address, (source, line))
+        with cache_lock:
+            entry["addresses"] = addresses
+    return addresses
 
-    for i, line in enumerate(trace_lines):
-        line = line.strip()
 
-        if dbg == "gdb":
+def entry_point(binary):
+    with open(binary, "rb") as f:
+        return ELFFile(f).header["e_entry"]
 
-            if line == "Program received signal SIGSEGV, Segmentation fault.":
-                return -1
-            if (
-                "No locals" in line
-                or "Inferior" in line
-                or "Temporary" in line
-                or "Reading" in line
-                or len(line.split()) == 0
-            ):
-                continue
 
-            # The first line/lines of info locals contains info about the tbreak, like "frame info" output in lldb
-            # Then there is a line containing the line number and the source code instruction in the form "<line_number> <instruction>"
-            # Finally, the last lines contain local variables names and value in the form "<name> = <value>"
+def breakpoints(binary, dbg, mode="line"):
+    """Return the breakpoint locations of the debugger collectors for a binary (cached with its line table).
 
-            # Parsing "<line_number> <instruction>"
-            if line.split()[0].isnumeric():
-                if len(line.split()) == 1:
-                    continue
+    Args:
+        binary (Path): binary filepath
+        dbg (str): debugger
+        mode (str): line (one breakpoint per line) or address (one breakpoint per line start address)
 
-                instruction = line.split(maxsplit=1)[1]
-                # skip lines containing only "{" or "}"
-                if instruction == "{" or instruction == "}":
-                    current_line = False
-                    continue
+    Returns:
+        tuple: (number of breakpoints, locations, one "<source>:<line>" or "*<address>" per line)
+    """
+    entry = cache_entry(binary)
+    key = dbg if mode == "line" else f"{dbg}-{mode}"
+    with cache_lock:
+        cached = entry["breakpoints"].get(key)
+    if cached is not None:
+        return tuple(cached)
+
+    bps = []
+    for source, lines in entry["lines"].items():
+        for line in sorted(lines):
+            if mode == "line":
+                bps.append("%s:%d\n" % (source, line))
+            else:
+                bps.extend("*0x%x\n" % address for address in sorted(lines[line]))
 
-                current_line = line.split()[0]
-                current_source = Path(
-                    trace_lines[i - 1].split()[-1].split(":")[0]
-                ).as_posix()  # read current source from preceding line
-                current_function = (
-                    trace_lines[i - 1].split(", ", maxsplit=1)[1].split()[0]
-                )  # read current function from preceding line
-
-                if current_source not in output:
-                    output[current_source] = {}
-                if current_line not in output[current_source]:
-                    output[current_source][current_line] = {
-                        "available": [],
-                        "optimized_out": [],
-                    }
-                output[current_source][current_line]["function"] = current_function
-                continue
+    with cache_lock:
+        entry["breakpoints"][key] = [len(bps), "".join(bps)]
+    save_entry(entry["path"], entry)
+    return len(bps), "".join(bps)
 
-            # Parsing local variables name and value in the form "<name> = <value>"
-            if current_line and " = " in line:
-                var_name = line.split(" = ", maxsplit=1)[0]
-                value = line.split(" = ", maxsplit=1)[-1]
-                if value == "<optimized out>":
-                    output[current_source][current_line]["optimized_out"].append(var_name)
-                else:
-                    if var_name not in output[current_source][current_line]["available"]:
-                        output[current_source][current_line]["available"].append(var_name)
-        else:
-            # in lldb the complete SIGSEGV message has some details that are not program independent
-            # so let's check only the messages that are certain to be found
 
-            if "stop reason = signal SIGSEGV" in line:
-                return -1
+def started_runs(records, position):
+    """Count the runs started in the records written by a collector since position.
 
-            if (
-                "lldb" in line
-                or "Current" in line
-                or "Breakpoint" in line
-                or "Process" in line
-                or "Command" in line
-                or len(line.split()) == 0
-            ):
-                continue
-            if (line.startswith("[") or line.startswith("*")) and not "[+] Locals type analysis: " in line:
-                continue
+    Args:
+        records (file): records file, opened for reading
+        position (int): offset of the first record not read yet
 
-            # After filtering out lines that are not relevant, there are only two possible cases: frame info or frame var
+    Returns:
+        tuple: (number of "input" records, offset of the first record not read yet)
+    """
+    count = 0
+    records.seek(position)
+    for line in iter(records.readline, ""):
+        if not line.endswith("\n"):
+            break  # record being written
+        position += len(line)
+        count += line.startswith('{"input":')
+    return count, position
 
-            # frame info
-            # frame #0: [...] at <source>:<line>:<n>
-            # if ":" in line.split()[-1] and not line.startswith("("):
-            if re.match(r"^frame #\d:.*", line):
-                # CA NOTE: this is not working because lldb prints "[inlined]"
-                # when a function has been inlined, so the split is different
-                if not "[inlined]" in line:
-                    try:
-                        current_line = line.split()[5].split(":")[-1]
-                    except:
-                        continue
-                    current_source = Path(line.split()[5].split(":")[-2]).as_posix()
 
-                else:
-                    current_line = line.split()[7].split(":")[-1]
-                    current_source = Path(line.split()[7].split(":")[-2]).as_posix()
-
-                current_function = line.split()[3].split("`")[1]
-
-                if trace_lines[i + 1].startswith("-> "):
-                    instruction = " ".join(trace_lines[i + 1].split()[2:])
-                    if instruction == "{" or instruction == "}":
-                        current_line = None
-                        continue
-
-                if current_source not in output:
-                    output[current_source] = {}
-                if current_line not in output[current_source]:
-                    output[current_source][current_line] = {
-                        "available": [],
-                        "optimized_out": [],
-                        "not_available": [],
-                    }
-                output[current_source][current_line]["function"] = current_function
-                continue
+def run_dbg(binary, dbg_script, dbg, timeout, records_path):
+    """Run a dbg script on a binary, killing the session when a run of the binary takes longer than timeout.
+    A run starts with the "input" record written by the collector, the first one also includes the start
+    of the debugger.
 
-            # frame var
-            if current_line and " = " in line and line.startswith("("):
-                var_name = line.split(" = ")[0]
-                if var_name.startswith("("):
-                    var_name = var_name.split()[-1].strip()
-
-                # CA NOTE: here this is wrong in case of multiline value definition.
-                # But actually, it's not a problem since we kinda dropped the usage of values
-                # https://stackoverflow.com/questions/31328204/lldb-one-line-output-for-print-and-display
-                # see the link for a potential solution (not general)
-                value = line.split(" = ")[-1].strip()
-                if "optimized out" in value:
-                    output[current_source][current_line]["optimized_out"].append(var_name)
-                # "empty constant data" was not a message back in the day, let's work with it as if it is a not available variable
-                elif "not available" in value or "empty constant data" in value or "could not evaluate" in value:
-                    output[current_source][current_line]["not_available"].append(var_name)
-                else:
-                    output[current_source][current_line]["available"].append(var_name)
+    Args:
+        binary (Path): binary filepath
+        dbg_script (str): dbg script
+        dbg (str): debugger
+        timeout (int): timeout of each run
+        records_path (Path): records file written by the collector
+
+    Returns:
+        bool: False if a run timed out
+    """
+    cmd = [GDB, LLDB][dbg == "lldb"]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+
+        tmpfile = Path(tmpdir) / f"{str(random.randint(0, 2**32))}.dbg"
+        with open(tmpfile, "w") as f:
+            f.write(dbg_script)
+
+        completed = True
+        records = None
+        position = 0
+        deadline = time.monotonic() + timeout
+        with open(Path(tmpdir) / "output", "w+") as output:
+            # own session, so that the debugger and the inferior are killed together
+            process = subprocess.Popen(
+                (cmd % (tmpfile, binary)).split(), stdout=output, stderr=output, start_new_session=True
+            )
+            while True:
+                try:
+                    process.wait(RUN_POLL)
+                    break
+                except subprocess.TimeoutExpired:
+                    pass
+                if records is None and Path(records_path).is_file():
+                    records = open(records_path, errors="replace")
+                started = 0
+                if records is not None:
+                    started, position = started_runs(records, position)
+                if started:
+                    deadline = time.monotonic() + timeout
+                elif time.monotonic() > deadline:
+                    try:
+                        os.killpg(process.pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+                    process.wait()
+                    completed = False
+                    break
+            if records is not None:
+                records.close()
+            output.seek(0)
+            log.debug(output.read())
+    return completed
+
+
+def sort_variables(output):
+    """Sort the variables of each line for reproducibility and remove the inconsistencies
+    (variables available at a hit of the line and not at another one are available).
 
+    Args:
+        output (dict): {<source>:[<line>:{status}]}, updated in place
+    """
     for source, lines in output.items():
         for line in lines:
             # Sort each item for reproducibility
@@ -308,7 +389,7 @@ def parse_trace(trace, dbg):
 
             output[source][line]["optimized_out"] = list(set(output[source][line]["optimized_out"]))
             output[source][line]["optimized_out"].sort()
-            if dbg == "lldb":
+            if "not_available" in output[source][line]:
                 output[source][line]["not_available"] = list(set(output[source][line]["not_available"]))
                 output[source][line]["not_available"].sort()
 
@@ -316,48 +397,241 @@ def parse_trace(trace, dbg):
             for var in output[source][line]["available"]:
                 if var in output[source][line]["optimized_out"]:
                     output[source][line]["optimized_out"].remove(var)
-                if dbg == "lldb" and var in output[source][line]["not_available"]:
+                if var in output[source][line].get("not_available", ()):
                     output[source][line]["not_available"].remove(var)
-    functions = {key: functions[key] for key in sorted(functions.keys())}
 
+
+def read_records(records_path, count):
+    """Read the records written by a collector (gdb_collector.py, lldb_collector.py) and split them by input.
+
+    Args:
+        records_path (Path): records filepath
+        count (int): number of inputs
+
+    Returns:
+        list: records of each input, None if its run did not start
+    """
+    runs = [None] * count
+    current = None
+    try:
+        with open(records_path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # truncated record
+                if "input" in record:
+                    current = record["input"] if record["input"] < count else None
+                    if current is not None:
+                        runs[current] = []
+                elif current is not None:
+                    runs[current].append(record)
+    except OSError:
+        pass
+    return runs
+
+
+def parse_records(records, dbg, addresses=None):
+    """Parse the records of a run and return variables info.
+
+    Args:
+        records (list): records written by the collector
+        dbg (str): debugger
+        addresses (dict): source line of each breakpoint address (address_map()), for address breakpoints
+
+    Returns:
+        tuple: ({<source>:[<line>:{status}]}, {} (no function types, as the text scripts)),
+            -1 if the run was stopped by SIGSEGV
+    """
+    output = {}
+    functions = {}
+    statuses = ["available", "optimized_out", "not_available"]
+    for record in records:
+        if "signal" in record:
+            if record["signal"] == "SIGSEGV":
+                return -1
+            continue
+
+        if addresses is not None:
+            location = addresses.get(record.get("pc"))
+        else:
+            location = (record["s"], record["l"]) if record["s"] and record["l"] else None
+        # skip lines containing only "{" or "}"
+        if location is None or linecache.getline(location[0], location[1]).strip() in ("{", "}"):
+            continue
+
+        variables = output.setdefault(Path(location[0]).as_posix(), {}).setdefault(
+            str(location[1]), {"available": [], "optimized_out": []}
+        )
+        if dbg == "lldb":
+            variables.setdefault("not_available", [])
+        variables["function"] = record["f"]
+        for var_name, status in record["v"].items():
+            variables[statuses[status]].append(var_name)
+
+    sort_variables(output)
+    functions = {key: functions[key] for key in sorted(functions.keys())}
     return output, functions
 
 
-def get_variables(binary, input_filepath, dbg, timeout=TIMEOUT):
-    """Prepare dbg script, get the debug trace calling run_dbg(),
-    parse it through parse_trace() and return variables info.
+def missed_breakpoints(records):
+    """Return True if a run completed without hitting any breakpoint. Every run of a fuzz target executes
+    lines of the binary (at least the fuzzer main), so the address breakpoints were not set at the addresses
+    where the binary is loaded.
+
+    Args:
+        records (list): records of the run
+    """
+    return not any("f" in record for record in records)
+
+
+def run_collector(binary, input_args, dbg, mode, timeout):
+    """Run the binary once per input in a debugger session with the breakpoint collector of the debugger.
+
+    Args:
+        binary (Path): binary filepath
+        input_args (list): arguments of each run of the binary
+        dbg (str): debugger
+        mode (str): breakpoint mode (see breakpoint_mode())
+        timeout (int): timeout of each run
+
+    Returns:
+        tuple: (number of breakpoints, records of each run (None if it did not start), timeout expired)
+            On timeout, the session is stopped and the records of the runs completed before the one
+            that timed out are still returned.
+    """
+    count, locations = breakpoints(binary, dbg, mode)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        locations_file = Path(tmpdir) / "locations"
+        locations_file.write_text(locations)
+        records_file = Path(tmpdir) / "records.ndjson"
+        if dbg == "lldb":
+            runs = [LLDB_RUN_TEMPLATE % (i, args) for i, args in enumerate(input_args)]
+            dbg_script = LLDB_SCRIPT_TEMPLATE % (
+                LLDB_COLLECTOR,
+                str(locations_file),
+                str(records_file),
+                mode == "address",
+                "".join(runs),
+            )
+        else:
+            run_template = GDB_ADDRESS_RUN_TEMPLATE if mode == "address" else GDB_RUN_TEMPLATE
+            runs = [run_template % (i, args) for i, args in enumerate(input_args)]
+            dbg_script = GDB_SCRIPT_TEMPLATE % (
+                str(GDB_COLLECTOR.parent),
+                str(locations_file),
+                str(records_file),
+                cache_entry(binary)["entry"] if mode == "address" else None,
+                "".join(runs),
+            )
+        completed = run_dbg(binary, dbg_script, dbg, timeout, records_file)
+        return count, read_records(records_file, len(input_args)), not completed
+
+
+def get_variables(binary, input_filepath, dbg, timeout=TIMEOUT, mode=None):
+    """Run the binary in a debugger session calling run_collector(),
+    parse the records through parse_records() and return variables info.
 
     Args:
         binary (Path): binary filepath
         input_filepath (Path): passed as argv[1] to the binary
         dbg (str): debugger
+        mode (str): breakpoint mode, breakpoint_mode() if None
 
     Returns:
         dict: {<source>:[<line>:{status}]}
     """
-    log.debug(f"[{binary}] live variables computation: STARTED")
-    lines_dict = parse_dwarf(binary)
-    script_template = [GDB_SCRIPT_TEMPLATE, LLDB_SCRIPT_TEMPLATE][dbg == "lldb"]
-    bps = []  # breakpoints
-
-    for source, lines in lines_dict.items():
-        if dbg == "lldb":
-            start = len(bps)
-            bps += [LLDB_BP_TEMPLATE % ("break", source, line, i + 1, i + 1) for i, line in enumerate(lines, start)]
+    binary_name = f"{Path(binary).parent.name}/{Path(binary).name}"
+    with telemetry.span(binary_name, "debugger", inputs=len(str(input_filepath).split())) as counters:
+        log.debug(f"[{binary}] live variables computation: STARTED")
+        mode = mode or breakpoint_mode()
+        counters["breakpoints"], runs, timed_out = run_collector(binary, [input_filepath], dbg, mode, timeout)
+        if timed_out:
+            log.info(f"[{binary}] TIMEOUT EXPIRED")
+            counters["status"] = "timeout"
+            return {}, {}
+        if mode == "address" and runs[0] is not None and missed_breakpoints(runs[0]):
+            log.error(f"[{binary}] no address breakpoint hit, the breakpoints do not match the load address of the binary")
+            counters["status"] = "missed"
+            return {}, {}
+        parsing_result = parse_records(runs[0] or [], dbg, address_map(binary) if mode == "address" else None)
+        if parsing_result != -1:
+            variables, functions = parsing_result
         else:
-            bps += [GDB_BP_TEMPLATE % ("tbreak", source, line) for line in lines]
-
-    dbg_script = script_template % ("".join(bps), input_filepath)
-    trace = run_dbg(binary, dbg_script, dbg, timeout)
-    if not isinstance(trace, str):
-        log.info(f"[{binary}] TIMEOUT EXPIRED")
-        return {}, {}, {}
-    parsing_result = parse_trace(trace, dbg)
-    if parsing_result != -1:
-        variables, functions = parsing_result
-    else:
-        log.info(f"[{binary}] SIGSEGV")
-        return {}, {}, {}
+            log.info(f"[{binary}] SIGSEGV")
+            counters["status"] = "sigsegv"
+            return {}, {}
 
-    log.debug(f"[{binary}] live variables computation: COMPLETED")
-    return variables, functions
+        counters["status"] = "ok"
+        counters["lines"] = sum(len(lines) for lines in variables.values())
+        log.debug(f"[{binary}] live variables computation: COMPLETED")
+        return variables, functions
+
+
+def get_variables_batch(binary, input_filepaths, dbg, timeout=TIMEOUT, mode=None):
+    """Run the binary on each input in a single debugger session (the breakpoints are re-armed
+    before each run) and return the variables info of each input.
+    If a run times out, the session is stopped: the runs completed before the one that hung are kept
+    and the following inputs are run again in a new session.
+
+    Args:
+        binary (Path): binary filepath
+        input_filepaths (list): input filepaths, each passed as argv[1] to a run of the binary
+        dbg (str): debugger
+        timeout (int): timeout of each run
+        mode (str): breakpoint mode, breakpoint_mode() if None
+
+    Returns:
+        dict: {<input filename>: (variables, functions)}, None for the inputs that failed
+            (timeout, SIGSEGV, run not started or no address breakpoint hit)
+    """
+    binary_name = f"{Path(binary).parent.name}/{Path(binary).name}"
+    with telemetry.span(binary_name, "debugger", inputs=len(input_filepaths)) as counters:
+        log.debug(f"[{binary}] live variables computation ({len(input_filepaths)} inputs): STARTED")
+        results = {Path(input_filepath).name: None for input_filepath in input_filepaths}
+        mode = mode or breakpoint_mode()
+        addresses = address_map(binary) if mode == "address" else None
+        failed = 0
+        sessions = 0
+
+        pending = list(input_filepaths)
+        while pending:
+            sessions += 1
+            counters["breakpoints"], runs, timed_out = run_collector(binary, pending, dbg, mode, timeout)
+            remaining = []
+            if timed_out:
+                # the last run started is the one that hung, the previous ones are complete
+                started = [i for i, input_run in enumerate(runs) if input_run is not None]
+                if started:
+                    hung = started[-1]
+                    log.info(f"[{binary}] {Path(pending[hung]).name}: TIMEOUT EXPIRED")
+                    remaining = pending[hung + 1 :]
+                    runs = runs[:hung] + [None] * (len(pending) - hung)
+                else:
+                    log.info(f"[{binary}] TIMEOUT EXPIRED ({len(pending)} inputs, no run started)")
+
+            for input_filepath, input_run in zip(pending[: len(pending) - len(remaining)], runs):
+                if addresses is not None and input_run is not None and missed_breakpoints(input_run):
+                    log.error(
+                        f"[{binary}] {Path(input_filepath).name}: no address breakpoint hit, "
+                        "the breakpoints do not match the load address of the binary"
+                    )
+                    failed += 1
+                    continue
+                parsing_result = -1 if input_run is None else parse_records(input_run, dbg, addresses)
+                if parsing_result == -1:
+                    if not timed_out:
+                        log.info(f"[{binary}] {Path(input_filepath).name}: SIGSEGV or run not started")
+                    failed += 1
+                    continue
+                results[Path(input_filepath).name] = parsing_result
+            pending = remaining
+
+        counters["status"] = "ok" if not failed else "partial"
+        counters["failed"] = failed
+        counters["sessions"] = sessions
+        counters["lines"] = sum(
+            len(lines) for result in results.values() if result is not None for lines in result[0].values()
+        )
+        log.debug(f"[{binary}] live variables computation ({len(input_filepaths)} inputs): COMPLETED")
+        return results